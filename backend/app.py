@@ -1,14 +1,30 @@
 import os
 import json
+import time
+import atexit
+import functools
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from modules.nlp import extract_infrastructure
-from modules.terraform_gen import generate_terraform
-from modules.security import validate_infrastructure
+from modules.artifacts import TerraformStore
+from modules.audit import audit_tree
+from modules.nlp import AI_MODE, extract_infrastructure, extraction_cache, is_extraction_cached
+from modules.terraform_gen import generate_terraform, generate_terraform_archive, iter_terraform
+from modules.compliance import compliance_table
+from modules.history import RunHistory, SQLiteRunHistory, run_providers
+from modules.idempotency import IdempotencyKeys, IdempotencyStore, SQLiteIdempotencyStore, request_fingerprint
+from modules.jobs import JobQueue, JobStore, SQLiteJobStore
+from modules.journal import RunJournal
+from modules.rate_limit import MemoryBucketStore, SQLiteBucketStore, TokenBucketLimiter
+from modules.security import validate_infrastructure, validate_infrastructure_stream, verdict_cache
+from modules.metrics import rule_metrics
+from modules.run_stats import RunStats
+from modules.security_rules import block_cache
 from pydantic import ValidationError
 
 # Configuration logging
@@ -22,20 +38,91 @@ app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False  # Force UTF-8 pour les accents
 CORS(app)
 
-# Rate limiting: 10 requêtes par minute par IP
+# Rate limiting par IP (RATELIMIT_ENABLED=0 pour les tests de charge) : 10 requêtes
+# par minute sur les routes sans quota. Les routes de generation en sont exemptees :
+# seul le quota ci-dessous, qui compte le travail fait, les limite (un succes du
+# cache ne coute rien).
+# Compteurs dans une base SQLite partagee par les workers (RATELIMIT_STORAGE_URI,
+# ou redis://... entre plusieurs hotes ; memory:// : par worker)
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") != "0"
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["10 per minute"],
-    storage_uri="memory://"
+    storage_uri=os.getenv("RATELIMIT_STORAGE_URI", "sqlite:///logs/ratelimit.db"),
+    enabled=RATELIMIT_ENABLED
 )
 
-# Journal des runs (in-memory, peut être remplacé par Redis/DB en production)
-runs_history = []
-MAX_HISTORY_SIZE = 100
+# Quota de generation par IP : seau a jetons debite du travail reellement fait
+# (extraction en cache : gratuite, extraction locale, appel Gemini et tokens),
+# soldes dans une base SQLite partagee par les workers (en memoire si QUOTA_DB est vide)
+QUOTA_COST_LOCAL = float(os.getenv("QUOTA_COST_LOCAL", "1"))
+QUOTA_COST_MODEL_CALL = float(os.getenv("QUOTA_COST_MODEL_CALL", "8"))
+QUOTA_COST_PER_1K_TOKENS = float(os.getenv("QUOTA_COST_PER_1K_TOKENS", "1"))
+QUOTA_DB = os.getenv("QUOTA_DB", "logs/quota.db")
+quota = TokenBucketLimiter(
+    capacity=float(os.getenv("QUOTA_CAPACITY", "100")),
+    refill_per_second=float(os.getenv("QUOTA_REFILL_PER_MINUTE", "100")) / 60,
+    store=SQLiteBucketStore(QUOTA_DB) if QUOTA_DB else MemoryBucketStore()
+)
+
+# Verdicts de la sortie du generateur precalcules au demarrage
+compliance_table.warm()
+
+# Journal des runs sur disque (JSONL en ajout seul, ecrit par un thread dedie,
+# partage par les workers sous verrou flock)
+run_journal = RunJournal(
+    os.getenv("JOURNAL_DIR", "logs/journal"),
+    segment_bytes=int(os.getenv("JOURNAL_SEGMENT_BYTES", str(8 * 1024 * 1024))),
+    compress=os.getenv("JOURNAL_COMPRESS", "0") == "1",
+    max_segments=int(os.getenv("JOURNAL_MAX_SEGMENTS", "20")),
+    queue_size=int(os.getenv("JOURNAL_QUEUE_SIZE", "10000")),
+    fsync_interval=float(os.getenv("JOURNAL_FSYNC_INTERVAL", "1.0"))
+)
+
+# Historique des runs: base SQLite (WAL) partagee par les workers, runs en JSON
+# compact, ou a defaut tampon circulaire en memoire (HISTORY_DB vide) de runs
+# compacts (CompactRun), reconstruit depuis le journal
+MAX_HISTORY_SIZE = int(os.getenv("HISTORY_SIZE", "50000"))
+MAX_HISTORY_PAGE = 1000
+HISTORY_DB = os.getenv("HISTORY_DB", "logs/history.db")
+# Historique de l'ancien format (JSON), relu si le journal est vide
+HISTORY_LEGACY_FILE = os.getenv("HISTORY_LEGACY_FILE", "logs/history.json")
+if HISTORY_DB:
+    runs_history = SQLiteRunHistory(
+        HISTORY_DB,
+        max_runs=int(os.getenv("HISTORY_DB_MAX_RUNS", "1000000")),
+        queue_size=int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+    )
+    # Premier demarrage: reprise des runs deja journalises (un seul worker importe)
+    if runs_history.seed(run_journal.load(MAX_HISTORY_SIZE, legacy_file=HISTORY_LEGACY_FILE)):
+        logger.info("Historique SQLite initialise depuis le journal des runs")
+    runs_history.start()
+    atexit.register(runs_history.close)
+else:
+    runs_history = RunHistory(MAX_HISTORY_SIZE)
+    runs_history.extend(run_journal.load(MAX_HISTORY_SIZE, legacy_file=HISTORY_LEGACY_FILE))
+run_journal.start()
+atexit.register(run_journal.close)
+
+# Agregats des runs pour /api/stats, mis a jour a chaque run (par worker)
+run_stats = RunStats(
+    bucket_seconds=int(os.getenv("STATS_BUCKET_SECONDS", "60")),
+    buckets=int(os.getenv("STATS_BUCKETS", "60"))
+)
 
-def log_run(phrase: str, infra: dict, security: dict, terraform_status: str):
-    """Enregistre un run dans l'historique"""
+# Terraform des reponses /generate?format=ref, servi par GET /terraform/<sha256> :
+# stockage sur disque adresse par contenu, partage par les workers
+terraform_store = TerraformStore(
+    os.getenv("TERRAFORM_STORE_DIR", "logs/terraform"),
+    max_bytes=int(os.getenv("TERRAFORM_STORE_MAX_BYTES", str(1024 ** 3)))
+)
+
+def log_run(phrase: str, infra: dict, security: dict, terraform_status: str, timings: dict = None):
+    """
+    Enregistre un run dans l'historique (aucune E/S disque sur le thread de la requete)
+    timings: duree de chaque etape en ms (extraction, generation, validation, total)
+    """
     run = {
         "timestamp": datetime.now().isoformat(),
         "phrase": phrase[:200],  # Limite taille
@@ -44,22 +131,375 @@ def log_run(phrase: str, infra: dict, security: dict, terraform_status: str):
         "terraform_status": terraform_status,
         "security_score": security.get("score", 0)
     }
-    runs_history.append(run)
-    # Garder seulement les N derniers runs
-    if len(runs_history) > MAX_HISTORY_SIZE:
-        runs_history.pop(0)
-    
-    # Sauvegarder dans fichier (optionnel)
+    run_stats.record(run_providers(run), run["security_status"], terraform_status, run["security_score"], timings)
+
+    # Historique: tampon en memoire ou file du thread d'ecriture SQLite
+    if runs_history.add(run) is False:
+        logger.warning("Historique des runs sature, run non enregistre")
+
+    # Persistance : depose dans la file du journal, ecrit en arriere-plan
+    if not run_journal.append(run):
+        logger.warning("Journal des runs sature, run non persiste")
+
+
+class GenerateError(Exception):
+    """Reponse d'erreur de /generate (corps JSON et code HTTP), commune aux modes WSGI et ASGI"""
+
+    def __init__(self, status: int, payload: dict):
+        super().__init__(payload.get("message"))
+        self.status = status
+        self.payload = payload
+
+
+def parse_generate_request(data) -> tuple:
+    """Corps JSON de /generate -> (phrase, large_scale); GenerateError si invalide"""
+    if not isinstance(data, dict):
+        raise GenerateError(400, {
+            "error": "JSON invalide",
+            "message": "Le corps de la requête doit être un objet JSON"
+        })
+
+    phrase = data.get("description")
+    if phrase is None:
+        phrase = ""
+    elif not isinstance(phrase, str):
+        raise GenerateError(400, {
+            "error": "Description invalide",
+            "message": "La description doit être une chaîne de caractères"
+        })
+    phrase = phrase.strip()
+    large_scale = bool(data.get("large_scale", False))
+
+    # Validation : phrase non vide
+    if not phrase:
+        raise GenerateError(400, {
+            "error": "Description vide",
+            "message": "Veuillez fournir une description d'infrastructure"
+        })
+
+    logger.info(f"Génération demandée: '{phrase[:100]}...'")
+    return phrase, large_scale
+
+
+def extraction_error(e: Exception) -> GenerateError:
+    """Erreur d'extraction (Gemini ou mock) -> reponse d'erreur de /generate"""
+    if isinstance(e, ValidationError):
+        # Message pédagogique pour limites dépassées
+        error_msg = str(e)
+        if "le=50" in error_msg or "servers" in error_msg.lower():
+            return GenerateError(422, {
+                "error": "Limite dépassée",
+                "message": "Limite pédagogique : maximum 50 serveurs par provider. Pour des infrastructures plus grandes, utilisez des boucles Terraform (count ou for_each) au lieu de répéter N blocs.",
+                "recommendation": "Exemple Terraform: resource \"aws_instance\" \"servers\" { count = var.server_count }"
+            })
+        elif "le=10" in error_msg or "databases" in error_msg.lower():
+            return GenerateError(422, {
+                "error": "Limite dépassée",
+                "message": "Limite pédagogique : maximum 10 databases par provider. Pour des infrastructures plus grandes, utilisez des boucles Terraform.",
+                "recommendation": "Exemple Terraform: resource \"aws_db_instance\" \"dbs\" { count = var.db_count }"
+            })
+        elif "le=5" in error_msg or "load_balancers" in error_msg.lower():
+            return GenerateError(422, {
+                "error": "Limite dépassée",
+                "message": "Limite pédagogique : maximum 5 load balancers par provider. Pour des infrastructures plus grandes, utilisez des boucles Terraform.",
+                "recommendation": "Exemple Terraform: resource \"aws_lb\" \"lbs\" { count = var.lb_count }"
+            })
+        return GenerateError(422, {
+            "error": "Validation error",
+            "message": str(e)
+        })
+    if isinstance(e, ValueError):
+        logger.error(f"Erreur extraction infrastructure: {e}")
+        return GenerateError(422, {
+            "error": "Erreur extraction infrastructure",
+            "message": str(e)
+        })
+    logger.error(f"Erreur inattendue extraction: {e}")
+    return GenerateError(500, {
+        "error": "Erreur serveur",
+        "message": "Erreur lors de l'extraction de l'infrastructure"
+    })
+
+
+def finish_generate(phrase: str, infra: dict, large_scale: bool, output_format: str,
+                    started: float, timings: dict) -> tuple:
+    """
+    Suite de /generate apres l'extraction : generation, validation de securite,
+    journalisation (calcul seul, sans appel reseau). Partagee par la vue Flask et
+    l'entree ASGI, qui l'execute dans un pool borne.
+
+    Returns:
+        (kind, value) : ("json", corps), ("zip", archive) ou
+        ("stream", rapport de securite) pour le mode grande echelle
+        Avec output_format "ref" et un verdict OK, le corps reference le
+        Terraform stocke (terraform_sha256, terraform_url) au lieu de l'inclure
+        GenerateError pour une reponse d'erreur
+    """
+    # Mode grande échelle: validation puis sortie en flux
+    if large_scale:
+        return _validate_large_scale(phrase, infra, started, timings)
+
+    # Génération Terraform sécurisée
     try:
-        os.makedirs("logs", exist_ok=True)
-        with open("logs/history.json", "w") as f:
-            json.dump(runs_history[-50:], f, indent=2)  # Garder 50 derniers
+        stage_start = time.perf_counter()
+        terraform = generate_terraform(infra)
+        timings["generation"] = (time.perf_counter() - stage_start) * 1000
     except Exception as e:
-        logger.warning(f"Impossible de sauvegarder l'historique: {e}")
+        logger.error(f"Erreur génération Terraform: {e}")
+        raise GenerateError(500, {
+            "error": "Erreur génération Terraform",
+            "message": f"Impossible de générer le code Terraform: {str(e)}"
+        })
+
+    # Validation sécurité complète
+    try:
+        stage_start = time.perf_counter()
+        security = validate_infrastructure(phrase, terraform, infra=infra)
+        timings["validation"] = (time.perf_counter() - stage_start) * 1000
+    except Exception as e:
+        logger.error(f"Erreur validation sécurité: {e}")
+        raise GenerateError(500, {
+            "error": "Erreur validation sécurité",
+            "message": f"Erreur lors de la validation: {str(e)}"
+        })
+
+    # Journalisation
+    terraform_status = "BLOCKED" if security["status"] == "NOT_OK" else "GENERATED"
+    timings["total"] = (time.perf_counter() - started) * 1000
+    log_run(phrase, infra, security, terraform_status, timings)
+
+    # Décision finale
+    if security["status"] == "NOT_OK":
+        return "json", {
+            "json": infra,
+            "security": "NOT_OK",
+            "terraform": "BLOCKED",
+            "security_report": security
+        }
+
+    # Archive zip: un module par provider pour plan/apply en parallèle
+    if output_format == "zip":
+        return "zip", generate_terraform_archive(infra)
+
+    # Réponse allégée: Terraform servi par GET /terraform/<sha256>
+    if output_format == "ref":
+        digest = terraform_store.put(terraform)
+        return "json", {
+            "json": infra,
+            "security": "OK",
+            "terraform_sha256": digest,
+            "terraform_url": f"/terraform/{digest}",
+            "terraform_size": len(terraform.encode("utf-8")),
+            "security_report": security
+        }
+
+    return "json", {
+        "json": infra,
+        "security": "OK",
+        "terraform": terraform,
+        "security_report": security
+    }
+
+
+def _validate_large_scale(phrase: str, infra: dict, started: float, timings: dict) -> tuple:
+    """
+    Variante grande échelle de /generate : le verdict vient de la table de
+    conformité (à défaut, la validation consomme un premier flux de
+    génération), puis le Terraform est streamé au client. Mémoire bornée quel
+    que soit le nombre de ressources. La génération streamée n'est pas chronométrée.
+    """
+    try:
+        stage_start = time.perf_counter()
+        security = validate_infrastructure_stream(phrase, iter_terraform(infra), infra=infra)
+        timings["validation"] = (time.perf_counter() - stage_start) * 1000
+    except Exception as e:
+        logger.error(f"Erreur validation sécurité (grande échelle): {e}")
+        raise GenerateError(500, {
+            "error": "Erreur validation sécurité",
+            "message": f"Erreur lors de la validation: {str(e)}"
+        })
+    
+    terraform_status = "BLOCKED" if security["status"] == "NOT_OK" else "GENERATED"
+    timings["total"] = (time.perf_counter() - started) * 1000
+    log_run(phrase, infra, security, terraform_status, timings)
+    
+    if security["status"] == "NOT_OK":
+        return "json", {
+            "json": infra,
+            "security": "NOT_OK",
+            "terraform": "BLOCKED",
+            "security_report": security
+        }
+    return "stream", security
+
+
+def stream_headers(security: dict) -> dict:
+    """En-têtes du mode grande échelle (verdict, le corps étant streamé)"""
+    return {
+        "X-Security-Status": "OK",
+        "X-Security-Score": str(security["score"]),
+        "X-Security-Grade": security["grade"]
+    }
+
+
+GENERATE_SERVER_ERROR = {
+    "error": "Erreur serveur",
+    "message": "Une erreur inattendue s'est produite"
+}
+
+
+def extraction_cost(usage: dict) -> float:
+    """Cout d'une extraction en unites de quota, d'apres le travail rapporte par extract_infrastructure"""
+    source = usage.get("source")
+    if source in ("gemini", "fallback"):
+        return QUOTA_COST_MODEL_CALL + usage.get("tokens", 0) / 1000 * QUOTA_COST_PER_1K_TOKENS
+    if source == "mock":
+        return QUOTA_COST_LOCAL
+    # Extraction servie par le cache, ou requete rejetee avant tout appel
+    return 0.0
+
+
+def estimated_quota_cost(phrases, large_scale: bool = False) -> float:
+    """
+    Cout estime des extractions a faire (hors cache), avant de connaitre les
+    tokens consommes : extraction locale en mode mock, appel Gemini sinon
+    """
+    uncached = sum(1 for phrase in phrases if not is_extraction_cached(phrase, large_scale))
+    return uncached * (QUOTA_COST_LOCAL if AI_MODE == "mock" else QUOTA_COST_MODEL_CALL)
+
+
+def quota_retry_after(client: str, phrases, large_scale: bool = False) -> int:
+    """
+    0 si le client peut lancer ces extractions (toutes deja en cache, donc
+    gratuites, ou solde couvrant leur cout estime), sinon secondes avant que
+    son solde le permette
+    """
+    if not RATELIMIT_ENABLED:
+        return 0
+    cost = estimated_quota_cost(phrases, large_scale)
+    if not cost:
+        return 0
+    return quota.retry_after(client, cost)
+
+
+def charge_quota(client: str, usage: dict):
+    """Debite le quota du client du cout de l'extraction faite (le solde peut devenir negatif)"""
+    if RATELIMIT_ENABLED and client is not None:
+        quota.charge(client, extraction_cost(usage))
+
+
+def quota_exceeded(retry_after: int) -> dict:
+    """Corps de la reponse 429 (quota epuise), accompagnee de Retry-After"""
+    return {
+        "error": "Quota dépassé",
+        "message": f"Quota de génération épuisé, réessayez dans {retry_after} s",
+        "retry_after": retry_after
+    }
+
+
+def retry_later(payload: dict, status: int):
+    """Reponse d'erreur avec l'en-tete Retry-After (payload["retry_after"])"""
+    response = jsonify(payload)
+    response.status_code = status
+    response.headers["Retry-After"] = str(payload["retry_after"])
+    return response
+
+
+# Cles d'idempotence (en-tete Idempotency-Key) sur /generate et /jobs : reponse de la
+# premiere requete conservee IDEMPOTENCY_TTL secondes et rejouee aux copies, reservations
+# et reponses dans une base SQLite partagee par les workers (en memoire si IDEMPOTENCY_DB est vide)
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "120"))
+IDEMPOTENCY_DB = os.getenv("IDEMPOTENCY_DB", "logs/idempotency.db")
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Retry-After conseille quand la requete d'origine n'a pas fini dans IDEMPOTENCY_WAIT
+IDEMPOTENCY_RETRY_AFTER = 5
+idempotency_keys = IdempotencyKeys(
+    SQLiteIdempotencyStore(IDEMPOTENCY_DB, IDEMPOTENCY_TTL, IDEMPOTENCY_PENDING_TTL) if IDEMPOTENCY_DB
+    else IdempotencyStore(IDEMPOTENCY_TTL, IDEMPOTENCY_PENDING_TTL, int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))),
+    wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT", "60"))
+)
+
+
+def _stored_error(status: int, payload: dict, headers: list = ()) -> tuple:
+    body = (app.json.dumps(payload) + "\n").encode("utf-8")
+    return status, [["Content-Type", "application/json"], *headers], body
+
+
+def claim_idempotency_key(client: str, key: str, method: str, path: str, body: bytes) -> tuple:
+    """
+    Reserve la cle d'idempotence du client pour cette requete, ou attend la
+    reponse d'une copie en cours. Commun aux modes WSGI et ASGI.
+
+    Returns:
+        (cle reservee, None) : requete a traiter, puis finish_idempotent()
+        (None, (code HTTP, en-tetes, corps)) : reponse a renvoyer telle quelle,
+        rejouee (en-tete Idempotent-Replayed) ou erreur 400, 409 ou 422
+    """
+    if not key.strip() or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return None, _stored_error(400, {
+            "error": "Clé d'idempotence invalide",
+            "message": f"Idempotency-Key doit compter de 1 à {IDEMPOTENCY_KEY_MAX_LENGTH} caractères"
+        })
+    scoped = f"{client} {key}"
+    outcome, response = idempotency_keys.claim(scoped, request_fingerprint(method, path, body))
+    if outcome == "execute":
+        return scoped, None
+    if outcome == "replay":
+        return None, (response["status"], response["headers"] + [["Idempotent-Replayed", "true"]], response["body"])
+    if outcome == "mismatch":
+        return None, _stored_error(422, {
+            "error": "Clé d'idempotence réutilisée",
+            "message": "Cette Idempotency-Key a déjà servi pour une autre requête"
+        })
+    return None, _stored_error(409, {
+        "error": "Requête en cours",
+        "message": f"La requête d'origine est toujours en cours, réessayez dans {IDEMPOTENCY_RETRY_AFTER} s",
+        "retry_after": IDEMPOTENCY_RETRY_AFTER
+    }, [["Retry-After", str(IDEMPOTENCY_RETRY_AFTER)]])
+
+
+def finish_idempotent(scoped: str, status: int, headers, body: bytes = None):
+    """
+    Conserve la reponse d'une requete a cle d'idempotence, sauf erreur
+    transitoire (429, 5xx) ou reponse en flux (body None) : la cle est alors
+    liberee et la copie suivante traitee normalement
+    """
+    if body is None or status == 429 or status >= 500:
+        idempotency_keys.release(scoped)
+        return
+    kept = [[name, value] for name, value in headers
+            if name.lower() in ("content-type", "content-disposition", "location")
+            or name.lower().startswith("x-security-")]
+    idempotency_keys.complete(scoped, {"status": status, "headers": kept, "body": body})
+
+
+def idempotent(view):
+    """Vue Flask avec prise en charge de l'en-tete Idempotency-Key (voir modules/idempotency.py)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return view(*args, **kwargs)
+        path = request.path + (f"?{request.query_string.decode()}" if request.query_string else "")
+        scoped, stored = claim_idempotency_key(get_remote_address(), key, request.method, path, request.get_data())
+        if stored is not None:
+            status, headers, body = stored
+            return Response(body, status=status, headers=headers)
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            idempotency_keys.release(scoped)
+            raise
+        finish_idempotent(scoped, response.status_code, response.headers.items(),
+                          None if response.is_streamed else response.get_data())
+        return response
+    return wrapper
 
 
 @app.route("/generate", methods=["POST"])
-@limiter.limit("10 per minute")
+@limiter.exempt
+@idempotent
 def generate():
     """
     Génère une infrastructure Terraform sécurisée à partir d'une description.
@@ -70,122 +510,301 @@ def generate():
         - security: "OK" ou "NOT_OK"
         - terraform: Code Terraform ou "BLOCKED"
         - security_report: Rapport détaillé de sécurité
+    
+    Avec ?format=zip et un verdict OK, renvoie à la place une archive zip
+    (un dossier/module par provider, générés en parallèle).
+    
+    Avec ?format=ref et un verdict OK, le Terraform n'est pas inclus :
+    terraform_sha256 et terraform_url (GET /terraform/<sha256>) le désignent.
+    
+    Avec "large_scale": true dans le corps, les limites grande échelle
+    s'appliquent et le Terraform est streamé en text/plain (verdict dans les
+    en-têtes X-Security-*), sans jamais construire le fichier complet.
+    
+    Quota du client épuisé : 429 avec Retry-After, sauf pour une description
+    dont l'extraction est déjà en cache (elle ne coûte rien).
+    
+    Avec un en-tête Idempotency-Key, une copie de la requête (nouvel envoi du
+    client ou du proxy) reçoit la réponse de la première sans nouveau calcul
+    ni run journalisé en double (hors mode grande échelle, servi en flux).
+    
+    Même contrat en mode ASGI (asgi.py), où l'extraction est asynchrone.
     """
+    started = time.perf_counter()
+    timings = {}
     try:
         # Récupère le JSON de la requête
         try:
             data = request.get_json()
-            if data is None:
-                return jsonify({
-                    "error": "JSON invalide",
-                    "message": "Le corps de la requête doit être un JSON valide"
-                }), 400
         except Exception as e:
             logger.error(f"Erreur parsing JSON: {e}")
             return jsonify({
                 "error": "JSON invalide",
                 "message": f"Erreur de parsing: {str(e)}"
             }), 400
-        
-        phrase = data.get("description", "").strip()
 
-        # Validation : phrase non vide
-        if not phrase:
-            return jsonify({
-                "error": "Description vide",
-                "message": "Veuillez fournir une description d'infrastructure"
-            }), 400
-        
-        logger.info(f"Génération demandée: '{phrase[:100]}...'")
-        
-        # Extraction via Gemini (ou mock)
-        try:
-            infra = extract_infrastructure(phrase)
-        except ValidationError as e:
-            # Message pédagogique pour limites dépassées
-            error_msg = str(e)
-            if "le=50" in error_msg or "servers" in error_msg.lower():
-                return jsonify({
-                    "error": "Limite dépassée",
-                    "message": "Limite pédagogique : maximum 50 serveurs par provider. Pour des infrastructures plus grandes, utilisez des boucles Terraform (count ou for_each) au lieu de répéter N blocs.",
-                    "recommendation": "Exemple Terraform: resource \"aws_instance\" \"servers\" { count = var.server_count }"
-                }), 422
-            elif "le=10" in error_msg or "databases" in error_msg.lower():
-                return jsonify({
-                    "error": "Limite dépassée",
-                    "message": "Limite pédagogique : maximum 10 databases par provider. Pour des infrastructures plus grandes, utilisez des boucles Terraform.",
-                    "recommendation": "Exemple Terraform: resource \"aws_db_instance\" \"dbs\" { count = var.db_count }"
-                }), 422
-            elif "le=5" in error_msg or "load_balancers" in error_msg.lower():
-                return jsonify({
-                    "error": "Limite dépassée",
-                    "message": "Limite pédagogique : maximum 5 load balancers par provider. Pour des infrastructures plus grandes, utilisez des boucles Terraform.",
-                    "recommendation": "Exemple Terraform: resource \"aws_lb\" \"lbs\" { count = var.lb_count }"
-                }), 422
-            else:
-                return jsonify({
-                    "error": "Validation error",
-                    "message": str(e)
-                }), 422
-        except ValueError as e:
-            logger.error(f"Erreur extraction infrastructure: {e}")
-            return jsonify({
-                "error": "Erreur extraction infrastructure",
-                "message": str(e)
-            }), 422
-        except Exception as e:
-            logger.error(f"Erreur inattendue extraction: {e}")
-            return jsonify({
-                "error": "Erreur serveur",
-                "message": "Erreur lors de l'extraction de l'infrastructure"
-            }), 500
+        phrase, large_scale = parse_generate_request(data)
+        client = get_remote_address()
+        retry_after = quota_retry_after(client, [phrase], large_scale)
+        if retry_after:
+            return retry_later(quota_exceeded(retry_after), 429)
 
-        # Génération Terraform sécurisée
+        # Extraction via Gemini (ou mock), debitee du quota meme en cas d'erreur
+        usage = {}
         try:
-            terraform = generate_terraform(infra)
+            stage_start = time.perf_counter()
+            infra = extract_infrastructure(phrase, large_scale=large_scale, usage=usage)
+            timings["extraction"] = (time.perf_counter() - stage_start) * 1000
         except Exception as e:
-            logger.error(f"Erreur génération Terraform: {e}")
-            return jsonify({
-                "error": "Erreur génération Terraform",
-                "message": f"Impossible de générer le code Terraform: {str(e)}"
-            }), 500
+            raise extraction_error(e)
+        finally:
+            charge_quota(client, usage)
+
+        kind, value = finish_generate(phrase, infra, large_scale, request.args.get("format"), started, timings)
+        if kind == "zip":
+            return Response(value, mimetype="application/zip",
+                            headers={"Content-Disposition": "attachment; filename=infrastructure.zip"})
+        if kind == "stream":
+            return Response(iter_terraform(infra), mimetype="text/plain", headers=stream_headers(value))
+        return jsonify(value)
 
-        # Validation sécurité complète
+    except GenerateError as e:
+        return jsonify(e.payload), e.status
+    except Exception as e:
+        logger.exception(f"Erreur inattendue dans /generate: {e}")
+        return jsonify(GENERATE_SERVER_ERROR), 500
+
+
+def generate_json(phrase: str, client: str = None) -> tuple:
+    """
+    Pipeline de /generate en reponse JSON (jobs, lots) -> (code HTTP, corps)
+    Extraction, generation, validation et journalisation, erreurs comprises
+    L'extraction est debitee du quota de `client` s'il est donne
+    """
+    started = time.perf_counter()
+    timings = {}
+    try:
+        usage = {}
         try:
-            security = validate_infrastructure(phrase, terraform)
+            stage_start = time.perf_counter()
+            infra = extract_infrastructure(phrase, usage=usage)
+            timings["extraction"] = (time.perf_counter() - stage_start) * 1000
         except Exception as e:
-            logger.error(f"Erreur validation sécurité: {e}")
-            return jsonify({
-                "error": "Erreur validation sécurité",
-                "message": f"Erreur lors de la validation: {str(e)}"
-            }), 500
+            raise extraction_error(e)
+        finally:
+            charge_quota(client, usage)
+        _, payload = finish_generate(phrase, infra, False, None, started, timings)
+        return 200, payload
+    except GenerateError as e:
+        return e.status, e.payload
+    except Exception as e:
+        logger.exception(f"Erreur inattendue pendant la generation: {e}")
+        return 500, GENERATE_SERVER_ERROR
 
-        # Journalisation
-        terraform_status = "BLOCKED" if security["status"] == "NOT_OK" else "GENERATED"
-        log_run(phrase, infra, security, terraform_status)
 
-        # Décision finale
-        if security["status"] == "NOT_OK":
-            return jsonify({
-                "json": infra,
-                "security": "NOT_OK",
-                "terraform": "BLOCKED",
-                "security_report": security
-            })
-        
+# Jobs de generation asynchrones: file bornee traitee par un pool de threads (par worker),
+# etats partages par les workers dans une base SQLite (en memoire si JOBS_DB est vide)
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+JOBS_DB = os.getenv("JOBS_DB", "logs/jobs.db")
+job_queue = JobQueue(
+    generate_json,
+    SQLiteJobStore(JOBS_DB, ttl=JOB_TTL) if JOBS_DB else JobStore(JOB_TTL, int(os.getenv("JOB_MAX_JOBS", "10000"))),
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    queue_size=int(os.getenv("JOB_QUEUE_SIZE", "100"))
+).start()
+atexit.register(job_queue.close)
+
+
+@app.route("/jobs", methods=["POST"])
+@limiter.exempt
+@idempotent
+def create_job():
+    """
+    Soumet une generation en arriere-plan (meme corps que /generate, hors mode
+    grande echelle). Reponse immediate 202 avec l'identifiant du job, a suivre
+    sur GET /jobs/<id>. File pleine : 503 avec Retry-After. Quota epuise : 429
+    avec Retry-After (l'extraction est debitee une fois le job traite).
+    Idempotency-Key : une copie de la requete recoit le meme job
+    """
+    try:
+        phrase, large_scale = parse_generate_request(request.get_json(silent=True))
+    except GenerateError as e:
+        return jsonify(e.payload), e.status
+    if large_scale:
         return jsonify({
-            "json": infra,
-            "security": "OK",
-            "terraform": terraform,
-            "security_report": security
+            "error": "Mode non supporte",
+            "message": "Le mode grande echelle est servi en flux par POST /generate"
+        }), 400
+
+    client = get_remote_address()
+    retry_after = quota_retry_after(client, [phrase])
+    if retry_after:
+        return retry_later(quota_exceeded(retry_after), 429)
+
+    job = job_queue.submit(phrase, client)
+    if job is None:
+        retry_after = job_queue.retry_after()
+        return retry_later({
+            "error": "File pleine",
+            "message": f"Trop de generations en attente, reessayez dans {retry_after} s",
+            "retry_after": retry_after
+        }, 503)
+
+    status_url = f"/jobs/{job['job_id']}"
+    return jsonify(dict(job, status_url=status_url)), 202, {"Location": status_url}
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+@limiter.exempt
+def get_job(job_id):
+    """
+    Etat d'un job : queued, running, done (result : corps de /generate) ou
+    failed (error et http_status : reponse d'erreur de /generate)
+    Pas de limite de debit (suivi par sondage)
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            "error": "Job introuvable",
+            "message": f"Identifiant inconnu ou expire (jobs conserves {JOB_TTL} s)"
+        }), 404
+    return jsonify(job)
+
+
+TERRAFORM_NOT_FOUND = {
+    "error": "Terraform introuvable",
+    "message": "Empreinte inconnue ou expiree, relancez /generate?format=ref"
+}
+
+
+@app.route("/terraform/<digest>", methods=["GET"])
+@limiter.exempt
+def get_terraform(digest):
+    """
+    Terraform d'une reponse /generate?format=ref, par empreinte sha256
+    Contenu immuable : ETag (304 si If-None-Match correspond), cache longue
+    duree, variante gzip si le client l'accepte. Pas de limite de debit.
+    """
+    artifact = terraform_store.locate(digest, accept_gzip=request.accept_encodings["gzip"] > 0)
+    if artifact is None:
+        return jsonify(TERRAFORM_NOT_FOUND), 404
+
+    path, size, encoding = artifact
+    etag = f"{digest}-gzip" if encoding else digest
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding"
+    }
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    try:
+        chunks = terraform_store.read(path)
+    except OSError:
+        # Supprime par la purge entre-temps
+        return jsonify(TERRAFORM_NOT_FOUND), 404
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    headers["Content-Length"] = str(size)
+    return Response(chunks, mimetype="text/plain", headers=headers)
+
+
+# Lots de descriptions (/generate/batch): chaque description distincte est debitee du quota
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+# Descriptions traitees en parallele, tous lots confondus (par worker)
+batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BATCH_CONCURRENCY", "4")),
+                                    thread_name_prefix="batch")
+
+
+def parse_batch_request(data) -> tuple:
+    """
+    Corps de /generate/batch -> (descriptions, {description normalisee: indices})
+    Les doublons (aux espaces pres) ne sont traites qu'une fois; GenerateError si invalide
+    """
+    descriptions = data.get("descriptions") if isinstance(data, dict) else None
+    if not isinstance(descriptions, list) or not descriptions:
+        raise GenerateError(400, {
+            "error": "Lot invalide",
+            "message": "Le corps doit contenir \"descriptions\" : une liste non vide de descriptions"
         })
-    
-    except Exception as e:
-        logger.exception(f"Erreur inattendue dans /generate: {e}")
+    if len(descriptions) > BATCH_MAX_ITEMS:
+        raise GenerateError(413, {
+            "error": "Lot trop grand",
+            "message": f"{BATCH_MAX_ITEMS} descriptions au plus par lot"
+        })
+    if data.get("large_scale"):
+        raise GenerateError(400, {
+            "error": "Mode non supporte",
+            "message": "Le mode grande echelle est servi en flux par POST /generate"
+        })
+
+    unique = {}
+    for index, description in enumerate(descriptions):
+        phrase = " ".join(description.split()) if isinstance(description, str) else ""
+        if not phrase:
+            raise GenerateError(400, {
+                "error": "Description vide",
+                "message": f"La description {index} est vide ou n'est pas une chaine"
+            })
+        unique.setdefault(phrase, []).append(index)
+    return descriptions, unique
+
+
+@app.route("/generate/batch", methods=["POST"])
+@limiter.exempt
+def generate_batch():
+    """
+    Genere plusieurs infrastructures en parallele
+    Body: {"descriptions": ["...", "..."]}
+    Reponse NDJSON en flux, dans l'ordre de fin de traitement : une ligne par
+    description (index, description, http_status et les champs de /generate,
+    ou ceux de son erreur ; un doublon porte duplicate_of), puis une ligne summary
+    Le lot est admis si le solde du client couvre le cout estime de ses
+    descriptions hors cache (413 si ce cout depasse la capacite du quota) ;
+    chaque extraction faite est ensuite debitee
+    """
+    try:
+        descriptions, unique = parse_batch_request(request.get_json(silent=True))
+    except GenerateError as e:
+        return jsonify(e.payload), e.status
+    if RATELIMIT_ENABLED and estimated_quota_cost(unique) > quota.capacity:
         return jsonify({
-            "error": "Erreur serveur",
-            "message": "Une erreur inattendue s'est produite"
-        }), 500
+            "error": "Lot trop couteux",
+            "message": f"Le cout estime du lot depasse le quota ({quota.capacity:g} unites) : "
+                       "decoupez-le en lots plus petits"
+        }), 413
+    client = get_remote_address()
+    retry_after = quota_retry_after(client, unique)
+    if retry_after:
+        return retry_later(quota_exceeded(retry_after), 429)
+    logger.info(f"Lot demande: {len(descriptions)} descriptions, {len(unique)} distinctes")
+
+    def lines():
+        futures = {batch_executor.submit(generate_json, phrase, client): phrase for phrase in unique}
+        outcomes = Counter()
+        try:
+            for future in as_completed(futures):
+                status, payload = future.result()
+                indices = unique[futures[future]]
+                for index in indices:
+                    item = {"index": index, "description": descriptions[index], "http_status": status}
+                    if index != indices[0]:
+                        item["duplicate_of"] = indices[0]
+                    outcomes[payload.get("security", "ERROR")] += 1
+                    yield app.json.dumps(dict(item, **payload)) + "\n"
+        finally:
+            # Client deconnecte: descriptions pas encore commencees abandonnees
+            for future in futures:
+                future.cancel()
+        yield app.json.dumps({"summary": {
+            "items": len(descriptions),
+            "unique": len(unique),
+            "ok": outcomes["OK"],
+            "not_ok": outcomes["NOT_OK"],
+            "errors": outcomes["ERROR"]
+        }}) + "\n"
+
+    return Response(lines(), mimetype="application/x-ndjson")
 
 
 @app.route("/health", methods=["GET"])
@@ -200,21 +819,135 @@ def health():
 
 @app.route("/api/history", methods=["GET"])
 def get_history():
-    """Retourne l'historique des derniers runs"""
+    """
+    Retourne l'historique des derniers runs
+    Filtres: provider, security_status, terraform_status, since / until (ISO 8601)
+    Pagination: limit, cursor (next_cursor de la page precedente, runs plus anciens)
+    """
     limit = request.args.get("limit", 10, type=int)
+    cursor = request.args.get("cursor", type=int)
+    since = request.args.get("since")
+    until = request.args.get("until")
+    for value in (since, until):
+        if value is not None:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                return jsonify({"error": f"Horodatage invalide: {value}"}), 400
+
+    page = runs_history.query(
+        limit=max(1, min(limit, MAX_HISTORY_PAGE)),
+        cursor=cursor,
+        since=since,
+        until=until,
+        provider=request.args.get("provider"),
+        security_status=request.args.get("security_status"),
+        terraform_status=request.args.get("terraform_status")
+    )
+    return jsonify({
+        "runs": page["runs"],
+        "total": len(runs_history),
+        "next_cursor": page["next_cursor"]
+    })
+
+
+@app.route("/api/stats", methods=["GET"])
+def get_stats():
+    """
+    Statistiques des runs sans parcourir l'historique (agregats incrementaux)
+    Sans parametre : depuis le demarrage du worker
+    ?window=300 : sur les 300 dernieres secondes (arrondies a la tranche), avec
+    le nombre de runs et de runs bloques par tranche
+    """
+    window = request.args.get("window", type=int)
+    if window is None:
+        return jsonify(run_stats.snapshot())
+    if window <= 0 or window > run_stats.max_window:
+        return jsonify({
+            "error": "Fenetre invalide",
+            "message": f"window doit etre compris entre 1 et {run_stats.max_window} secondes"
+        }), 400
+    stats = run_stats.snapshot(window)
+    stats["timeline"] = run_stats.timeline(window)
+    return jsonify(stats)
+
+
+@app.route("/api/audit", methods=["POST"])
+def audit():
+    """
+    Audit de securite de fichiers .tf existants sous AUDIT_ROOT
+    Body: {"path": "dossier/relatif", "provider": "aws" (optionnel),
+           "fail_fast": true (optionnel, verdict seul: arret des que NOT_OK),
+           "debug": true (optionnel, duree de chaque regle par fichier)}
+    Reponse NDJSON en flux : une ligne par fichier termine, puis le resume
+    """
+    audit_root = os.getenv("AUDIT_ROOT")
+    if not audit_root:
+        return jsonify({
+            "error": "Audit desactive",
+            "message": "Definir AUDIT_ROOT pour autoriser l'audit de fichiers du serveur"
+        }), 403
+
+    data = request.get_json(silent=True) or {}
+    root = os.path.realpath(audit_root)
+    target = os.path.realpath(os.path.join(root, data.get("path", ".")))
+    # Jamais en dehors de AUDIT_ROOT (../, liens symboliques)
+    if os.path.commonpath([root, target]) != root:
+        return jsonify({"error": "Chemin invalide", "message": "Le chemin doit rester sous AUDIT_ROOT"}), 400
+    if not os.path.exists(target):
+        return jsonify({"error": "Chemin introuvable", "message": data.get("path")}), 404
+
+    provider = data.get("provider")
+    if provider not in (None, "aws", "azure", "gcp", "openstack"):
+        return jsonify({"error": "Provider invalide", "message": provider}), 400
+
+    def lines():
+        for result in audit_tree(target, provider=provider, fail_fast=bool(data.get("fail_fast")),
+                                 debug=bool(data.get("debug"))):
+            if "file" in result:
+                # Chemins relatifs: ne pas exposer l'arborescence du serveur
+                result["file"] = os.path.relpath(result["file"], root)
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return Response(lines(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Metriques internes : caches des verdicts et des blocs, table de conformite,
+    latence de chaque regle par provider (histogrammes, regles les plus couteuses),
+    journal des runs (ecrits, abandonnes, en attente), historique des runs,
+    jobs (profondeur de la file, temps d'attente et de service), cache des
+    extractions, quota de generation (admissions, refus, unites debitees),
+    cles d'idempotence (requetes traitees, rejouees, en attente d'une copie)
+    et stockage du Terraform (ecritures, purges)
+    """
     return jsonify({
-        "runs": runs_history[-limit:],
-        "total": len(runs_history)
+        "verdict_cache": verdict_cache.stats(),
+        "block_cache": block_cache.stats(),
+        "compliance_table": compliance_table.stats(),
+        "rules": rule_metrics.stats(),
+        "journal": run_journal.stats(),
+        "history": runs_history.stats(),
+        "jobs": job_queue.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "quota": quota.stats(),
+        "idempotency": idempotency_keys.stats(),
+        "terraform_store": terraform_store.stats()
     })
 
 
+RATE_LIMIT_ERROR = {
+    "error": "Trop de requêtes",
+    "message": "Limite de requêtes par minute atteinte. Veuillez réessayer plus tard."
+}
+
+
 @app.errorhandler(429)
 def ratelimit_handler(e):
     """Gestion des erreurs de rate limiting"""
-    return jsonify({
-        "error": "Trop de requêtes",
-        "message": "Limite de 10 requêtes par minute atteinte. Veuillez réessayer plus tard."
-    }), 429
+    return jsonify(RATE_LIMIT_ERROR), 429
 
 
 if __name__ == "__main__":
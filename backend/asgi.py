@@ -0,0 +1,250 @@
+"""
+Point d'entrée ASGI du backend
+
+POST /generate est servi de façon asynchrone : l'appel Gemini est attendu
+sans occuper de thread, la génération et la validation (calcul) passent par
+un pool de threads borné (ASGI_CPU_WORKERS). Même contrat que la vue Flask
+(corps, codes, en-têtes, quota de génération par IP et clés d'idempotence).
+Toutes les autres routes sont servies par l'application Flask.
+
+Usage (depuis backend/):
+    uvicorn asgi:application --port 5000
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    GENERATE_SERVER_ERROR, GenerateError, app, charge_quota, claim_idempotency_key, extraction_error,
+    finish_generate, finish_idempotent, idempotency_keys, job_queue, logger, parse_generate_request,
+    quota_exceeded, quota_retry_after, run_journal, runs_history, stream_headers,
+)
+from modules.nlp import extract_infrastructure_async
+from modules.security_rules import shutdown_process_pool
+from modules.terraform_gen import iter_terraform
+
+# Pool borné pour la génération et la validation (calcul, hors boucle d'événements)
+CPU_WORKERS = int(os.getenv("ASGI_CPU_WORKERS") or os.cpu_count() or 1)
+executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="generate")
+
+# Appels Gemini simultanés (le pool de connexions du client async se dégrade
+# au-delà de quelques dizaines de requêtes en vol); les autres attendent leur tour
+GEMINI_CONCURRENCY = int(os.getenv("ASGI_GEMINI_CONCURRENCY", "32"))
+
+# Morceaux de Terraform envoyés par écriture en mode grande échelle
+STREAM_CHUNKS = 64
+
+_wsgi = WsgiToAsgi(app)
+_gemini_slots = None
+
+
+def _gemini_semaphore() -> asyncio.Semaphore:
+    # Créé à la première requête, dans la boucle du serveur
+    global _gemini_slots
+    if _gemini_slots is None:
+        _gemini_slots = asyncio.Semaphore(GEMINI_CONCURRENCY)
+    return _gemini_slots
+
+
+def _json_body(payload: dict) -> bytes:
+    # Même encodage que jsonify (clés triées, UTF-8, retour à la ligne final)
+    return (app.json.dumps(payload) + "\n").encode("utf-8")
+
+
+async def _send(send, status: int, body: bytes, content_type: str, headers: dict = None):
+    raw_headers = [
+        (b"content-type", content_type.encode()),
+        (b"content-length", str(len(body)).encode()),
+        (b"access-control-allow-origin", b"*"),
+    ]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, payload: dict):
+    await _send(send, status, _json_body(payload), "application/json")
+
+
+async def _send_stored(send, status: int, headers: list, body: bytes):
+    # Réponse conservée (clé d'idempotence) ou erreur construite par l'application
+    raw_headers = [(b"content-length", str(len(body)).encode()), (b"access-control-allow-origin", b"*")]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in headers]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class _ResponseRecorder:
+    """Transmet la réponse au client et en garde une copie (None si elle est envoyée en flux)"""
+
+    def __init__(self, send):
+        self._send = send
+        self.status = 500
+        self.headers = []
+        self._chunks = []
+        self.streamed = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            self.headers = [(name.decode("latin-1"), value.decode("latin-1"))
+                            for name, value in message.get("headers", [])]
+        elif message["type"] == "http.response.body":
+            self.streamed = self.streamed or message.get("more_body", False)
+            self._chunks.append(message.get("body", b""))
+        await self._send(message)
+
+    @property
+    def body(self):
+        return None if self.streamed else b"".join(self._chunks)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _next_chunks(iterator) -> str:
+    """Jusqu'à STREAM_CHUNKS morceaux du générateur (None une fois épuisé)"""
+    chunks = []
+    for chunk in iterator:
+        chunks.append(chunk)
+        if len(chunks) == STREAM_CHUNKS:
+            break
+    return "".join(chunks) if chunks else None
+
+
+async def _stream_terraform(send, infra: dict, security: dict):
+    loop = asyncio.get_running_loop()
+    headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"access-control-allow-origin", b"*")]
+    headers += [(name.lower().encode(), value.encode()) for name, value in stream_headers(security).items()]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    iterator = iter_terraform(infra)
+    while True:
+        text = await loop.run_in_executor(executor, _next_chunks, iterator)
+        if text is None:
+            break
+        await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def generate(scope, receive, send):
+    """POST /generate asynchrone (voir app.generate pour le contrat)"""
+    client = scope.get("client") or ("127.0.0.1", 0)
+    body = await _read_body(receive)
+    key = dict(scope.get("headers", [])).get(b"idempotency-key")
+    if key is None:
+        await _generate(scope, client, body, send)
+        return
+
+    # Réservation de la clé, ou attente d'une copie en cours: dans le pool par
+    # défaut de la boucle, pour ne pas occuper le pool de génération
+    loop = asyncio.get_running_loop()
+    query = scope.get("query_string", b"").decode()
+    path = scope["path"] + (f"?{query}" if query else "")
+    scoped, stored = await loop.run_in_executor(
+        None, claim_idempotency_key, client[0], key.decode("latin-1"), "POST", path, body
+    )
+    if stored is not None:
+        await _send_stored(send, *stored)
+        return
+    recorder = _ResponseRecorder(send)
+    try:
+        await _generate(scope, client, body, recorder)
+    except BaseException:
+        await loop.run_in_executor(None, idempotency_keys.release, scoped)
+        raise
+    await loop.run_in_executor(None, finish_idempotent, scoped, recorder.status, recorder.headers, recorder.body)
+
+
+async def _generate(scope, client: tuple, body: bytes, send):
+    started = time.perf_counter()
+    timings = {}
+    try:
+        try:
+            data = app.json.loads(body) if body else None
+        except ValueError as e:
+            logger.error(f"Erreur parsing JSON: {e}")
+            await _send_json(send, 400, {
+                "error": "JSON invalide",
+                "message": f"Erreur de parsing: {str(e)}"
+            })
+            return
+
+        phrase, large_scale = parse_generate_request(data)
+
+        # Quota du client (base SQLite partagée: lu et débité hors boucle d'événements)
+        loop = asyncio.get_running_loop()
+        retry_after = await loop.run_in_executor(executor, quota_retry_after, client[0], [phrase], large_scale)
+        if retry_after:
+            await _send(send, 429, _json_body(quota_exceeded(retry_after)), "application/json",
+                        {"Retry-After": str(retry_after)})
+            return
+
+        # Extraction via Gemini (ou mock), attendue sans bloquer de thread
+        usage = {}
+        try:
+            stage_start = time.perf_counter()
+            async with _gemini_semaphore():
+                infra = await extract_infrastructure_async(phrase, large_scale=large_scale, usage=usage)
+            timings["extraction"] = (time.perf_counter() - stage_start) * 1000
+        except Exception as e:
+            raise extraction_error(e)
+        finally:
+            await loop.run_in_executor(executor, charge_quota, client[0], usage)
+
+        output_format = parse_qs(scope.get("query_string", b"").decode()).get("format", [None])[0]
+        kind, value = await loop.run_in_executor(
+            executor, finish_generate, phrase, infra, large_scale, output_format, started, timings
+        )
+    except GenerateError as e:
+        await _send_json(send, e.status, e.payload)
+        return
+    except Exception as e:
+        logger.exception(f"Erreur inattendue dans /generate: {e}")
+        await _send_json(send, 500, GENERATE_SERVER_ERROR)
+        return
+
+    if kind == "zip":
+        await _send(send, 200, value, "application/zip",
+                    {"Content-Disposition": "attachment; filename=infrastructure.zip"})
+    elif kind == "stream":
+        await _stream_terraform(send, infra, value)
+    else:
+        await _send_json(send, 200, value)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Jobs en cours terminés, puis runs en attente écrits avant l'arrêt
+            job_queue.close()
+            run_journal.flush()
+            runs_history.flush()
+            executor.shutdown(wait=True)
+            shutdown_process_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/generate" and scope["method"] == "POST":
+        await generate(scope, receive, send)
+    else:
+        await _wsgi(scope, receive, send)
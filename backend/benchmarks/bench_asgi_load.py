@@ -0,0 +1,176 @@
+"""
+Test de charge: /generate en ASGI (uvicorn, extraction asynchrone) vs serveur
+Flask actuel (Werkzeug, un thread par requete)
+Un faux serveur Gemini local repond apres GEMINI_LATENCY secondes; les deux
+serveurs tournent en AI_MODE=real contre lui, limite de debit et cache des
+extractions desactives (chaque requete appelle le faux Gemini).
+Debit et latences pour plusieurs niveaux de concurrence.
+
+Usage (depuis backend/):
+    python benchmarks/bench_asgi_load.py
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+GEMINI_LATENCY = 0.3
+CONCURRENCY = (16, 64, 256)
+REQUESTS_PER_CLIENT = 4
+
+FAKE_INFRA = {"providers": [{"provider": "aws", "servers": 3, "databases": 1, "database_type": "postgresql",
+                             "networks": 1, "load_balancers": 1, "security_groups": 1}]}
+FAKE_RESPONSE = json.dumps({
+    "candidates": [{"content": {"role": "model", "parts": [{"text": json.dumps(FAKE_INFRA)}]},
+                    "finishReason": "STOP", "index": 0}],
+    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 10, "totalTokenCount": 20}
+}).encode()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fake_gemini_connection(reader, writer):
+    """Faux generateContent: HTTP/1.1 keep-alive, reponse apres GEMINI_LATENCY"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(GEMINI_LATENCY)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(FAKE_RESPONSE)).encode() + b"\r\n\r\n" + FAKE_RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_fake_gemini(port: int):
+    server = await asyncio.start_server(fake_gemini_connection, "127.0.0.1", port, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+
+def start_fake_gemini(port: int) -> subprocess.Popen:
+    """Faux Gemini dans son propre processus (ne partage pas le GIL du generateur de charge)"""
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--fake-gemini", str(port)])
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Faux Gemini non demarre")
+
+
+def start_server(command: list, port: int, gemini_port: int, directory: str) -> subprocess.Popen:
+    env = dict(os.environ, AI_MODE="real", GEMINI_API_KEY="fake", GEMINI_BASE_URL=f"http://127.0.0.1:{gemini_port}",
+               RATELIMIT_ENABLED="0", EXTRACTION_CACHE_SIZE="0", QUOTA_DB="",
+               RATELIMIT_STORAGE_URI="sqlite:///" + os.path.join(directory, f"ratelimit-{port}.db"),
+               HISTORY_DB=os.path.join(directory, f"history-{port}.db"),
+               JOURNAL_DIR=os.path.join(directory, f"journal-{port}"))
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Serveur non demarre")
+
+
+async def post_generate(port: int, body: bytes) -> tuple:
+    """
+    POST /generate sur une connexion brute (Connection: close, lue jusqu'a EOF):
+    un client HTTP complet sature avant les serveurs mesures sur une machine
+    a peu de coeurs
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(b"POST /generate HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n"
+                     b"Content-Type: application/json\r\nContent-Length: " + str(len(body)).encode()
+                     + b"\r\n\r\n" + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), payload
+
+
+async def load(port: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    body = json.dumps({"description": "3 serveurs AWS et une base"}).encode()
+
+    async def worker():
+        nonlocal errors
+        for _ in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            try:
+                status, payload = await post_generate(port, body)
+                if status != 200 or json.loads(payload)["security"] != "OK":
+                    errors += 1
+            except (OSError, ValueError, IndexError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "errors": errors
+    }
+
+
+def main():
+    gemini_port = free_port()
+    gemini = start_fake_gemini(gemini_port)
+    servers = (
+        ("Flask (Werkzeug threaded)", lambda port: [sys.executable, "-c",
+                                                    f"from app import app; app.run(port={port}, threaded=True)"]),
+        ("ASGI (uvicorn)", lambda port: [sys.executable, "-m", "uvicorn", "asgi:application",
+                                         "--port", str(port), "--log-level", "warning"]),
+    )
+    print(f"Faux Gemini: {GEMINI_LATENCY * 1000:.0f} ms par appel, {REQUESTS_PER_CLIENT} requetes par client")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, command in servers:
+            port = free_port()
+            process = start_server(command(port), port, gemini_port, directory)
+            try:
+                for concurrency in CONCURRENCY:
+                    result = asyncio.run(load(port, concurrency))
+                    print(f"{label:<26} concurrence {concurrency:>3} : {result['rps']:6.1f} req/s, "
+                          f"p50 {result['p50']:6.0f} ms, p95 {result['p95']:6.0f} ms, erreurs {result['errors']}")
+            finally:
+                process.terminate()
+                process.wait()
+    gemini.terminate()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--fake-gemini"]:
+        asyncio.run(serve_fake_gemini(int(sys.argv[2])))
+    else:
+        main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: audit d'arborescences de milliers de fichiers .tf
+Debit (fichiers/s) selon le nombre de processus (pool dedie, puis pool
+partage de l'endpoint), et pic memoire du processus
+principal (doit rester stable quand le nombre de fichiers augmente).
+
+Usage (depuis backend/):
+    python benchmarks/bench_audit.py
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.audit import audit_tree
+from modules.terraform_gen import generate_terraform_single_provider
+
+PROVIDERS = ["aws", "azure", "gcp", "openstack"]
+
+
+def make_tree(root: str, files: int):
+    # Modules de 10 fichiers, contenus varies (provider, serveurs, bases)
+    for index in range(files):
+        directory = os.path.join(root, f"module_{index // 10:04d}")
+        os.makedirs(directory, exist_ok=True)
+        config = {"provider": PROVIDERS[index % 4], "servers": 1 + index % 5, "databases": index % 2}
+        with open(os.path.join(directory, f"file_{index % 10}.tf"), "w") as f:
+            f.write(generate_terraform_single_provider(config))
+
+
+def run(root: str, workers: int) -> tuple:
+    tracemalloc.start()
+    summary = None
+    for result in audit_tree(root, max_workers=workers):
+        summary = result.get("summary", summary)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summary, peak
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    print(f"CPU disponibles: {cpus}")
+    peaks = []
+    for files in (1000, 4000):
+        with tempfile.TemporaryDirectory() as root:
+            make_tree(root, files)
+            print(f"{files} fichiers")
+            for workers in sorted({1, cpus}) + [None]:
+                summary, peak = run(root, workers)
+                assert summary["files"] == files and summary["errors"] == 0
+                label = f"{workers} processus" if workers else "pool partage"
+                print(f"  {label:>12} : {summary['files_per_sec']:8.1f} fichiers/s, "
+                      f"pic memoire {peak / 1024:8.1f} KiB")
+            peaks.append(peak)
+
+    # Memoire bornee: 4x plus de fichiers ne doit pas multiplier le pic
+    print(f"Rapport des pics 4000/1000 fichiers: {peaks[1] / peaks[0]:.2f}")
+    assert peaks[1] < 2 * peaks[0], "la memoire croit avec le nombre de fichiers"
+
+
+if __name__ == "__main__":
+    main()
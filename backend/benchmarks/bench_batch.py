@@ -0,0 +1,61 @@
+"""
+Benchmark de /generate/batch: un lot de descriptions distinctes traite en
+parallele vs les memes descriptions envoyees une par une a /generate
+Faux Gemini local (voir bench_asgi_load.py) a GEMINI_LATENCY secondes par
+appel, AI_MODE=real, limite de debit et cache des extractions desactives
+(chaque passe rappelle le faux Gemini pour chaque description).
+
+Usage (depuis backend/):
+    python benchmarks/bench_batch.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_asgi_load import GEMINI_LATENCY, free_port, start_fake_gemini
+
+DESCRIPTIONS = 32
+CONCURRENCY = (1, 4, 8, 16)
+
+
+def main():
+    gemini_port = free_port()
+    gemini = start_fake_gemini(gemini_port)
+    directory = tempfile.mkdtemp()
+    os.environ.update(AI_MODE="real", GEMINI_API_KEY="fake", GEMINI_BASE_URL=f"http://127.0.0.1:{gemini_port}",
+                      RATELIMIT_ENABLED="0", EXTRACTION_CACHE_SIZE="0", QUOTA_DB="",
+                      HISTORY_DB=os.path.join(directory, "history.db"),
+                      JOURNAL_DIR=os.path.join(directory, "journal"), JOBS_DB="")
+    import app as app_module
+
+    descriptions = [f"Je veux {n} serveurs AWS et une base postgresql" for n in range(1, DESCRIPTIONS + 1)]
+    client = app_module.app.test_client()
+    print(f"{DESCRIPTIONS} descriptions distinctes, faux Gemini a {GEMINI_LATENCY * 1000:.0f} ms par appel")
+    try:
+        start = time.perf_counter()
+        for description in descriptions:
+            assert client.post("/generate", json={"description": description}).status_code == 200
+        sequential = time.perf_counter() - start
+        print(f"/generate une par une      : {sequential:6.2f} s ({DESCRIPTIONS / sequential:5.1f} descriptions/s)")
+
+        for concurrency in CONCURRENCY:
+            app_module.batch_executor = ThreadPoolExecutor(max_workers=concurrency)
+            start = time.perf_counter()
+            response = client.post("/generate/batch", json={"descriptions": descriptions})
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+            elapsed = time.perf_counter() - start
+            app_module.batch_executor.shutdown()
+            assert lines[-1]["summary"]["ok"] == DESCRIPTIONS
+            print(f"/generate/batch parallele {concurrency:>2}: {elapsed:6.2f} s "
+                  f"({DESCRIPTIONS / elapsed:5.1f} descriptions/s, x{sequential / elapsed:.1f})")
+    finally:
+        gemini.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: notation de lots de configurations candidates
+Lot vectorise (NumPy) vs une recherche dans la table de conformite par
+configuration vs generation + analyse du Terraform (sur un echantillon).
+
+Usage (depuis backend/):
+    python benchmarks/bench_batch_scoring.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.batch_scoring import score_batch
+from modules.compliance import compliance_table
+from modules.security_rules import check_terraform_security_sections
+from modules.terraform_gen import generate_terraform
+
+PROVIDERS = ["aws", "azure", "gcp", "openstack"]
+DATABASE_TYPES = ["mysql", "postgresql", "mariadb", "mongodb"]
+SAMPLE = 200
+
+
+def make_specs(count: int) -> list:
+    rng = random.Random(42)
+    return [
+        {"providers": [
+            {"provider": rng.choice(PROVIDERS), "servers": rng.randint(0, 50), "databases": rng.randint(0, 5),
+             "database_type": rng.choice(DATABASE_TYPES), "load_balancers": rng.randint(0, 2),
+             "networks": rng.randint(0, 1), "security_groups": rng.randint(0, 1)}
+            for _ in range(rng.randint(1, 3))
+        ]}
+        for _ in range(count)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    compliance_table.warm()
+    score_batch(make_specs(1))  # predicats precalcules
+
+    for count in (10_000, 100_000):
+        specs = make_specs(count)
+        result, batch = timed(lambda: score_batch(specs))
+        print(f"{count} configurations")
+        print(f"  lot vectorise        : {batch * 1000:9.1f} ms ({count / batch:10.0f} config/s)")
+
+        _, table = timed(lambda: [compliance_table.report(spec)["security_score"] for spec in specs])
+        print(f"  table par config     : {table * 1000:9.1f} ms ({count / table:10.0f} config/s)")
+
+        sample = specs[:SAMPLE]
+        reports, scan = timed(lambda: [check_terraform_security_sections(generate_terraform(s)) for s in sample])
+        assert [r["security_score"] for r in reports] == result["security_score"][:SAMPLE].tolist()
+        print(f"  generation + analyse : {scan / SAMPLE * count * 1000:9.1f} ms estime "
+              f"({SAMPLE / scan:10.0f} config/s, echantillon de {SAMPLE})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: detection des demandes dangereuses sur des descriptions longues
+Compare les boucles any(mot in description) historiques a KeywordAutomaton
+(boucles `in` sous AUTOMATON_MIN_KEYWORDS mots-cles, automate au-dela), puis
+l'effet de l'ajout de synonymes FR/EN, avec l'automate force a chaque taille.
+
+Usage (depuis backend/):
+    python benchmarks/bench_dangerous_requests.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules import keywords as keywords_module
+from modules.keywords import KeywordAutomaton
+from modules.security import DANGEROUS_REQUEST_CATEGORIES, detect_dangerous_requests
+
+WORDS = (
+    "je veux une infrastructure avec des serveurs web une base de donnees mysql "
+    "sur aws azure gcp openstack avec load balancer monitoring et sauvegardes "
+    "i want a private postgresql database with encrypted storage and restricted access"
+).split()
+
+
+def legacy_detect(description: str) -> list:
+    # Implementation avant l'automate: une boucle par groupe de mots-cles
+    d = description.lower()
+    warnings = []
+    for category in DANGEROUS_REQUEST_CATEGORIES.values():
+        if all(any(keyword in d for keyword in group) for group in category["triggers"]):
+            warnings.append({
+                "requested": category["requested"],
+                "applied": category["applied"],
+                "reason": category["reason"]
+            })
+    return warnings
+
+
+def make_description(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    # Une demande dangereuse en fin de texte: tout le texte est parcouru
+    return " ".join(words) + " avec ssh ouvert"
+
+
+def synonyms(count: int, seed: int = 1) -> list:
+    # Synonymes synthetiques (jamais presents dans le texte): cout pur de la recherche
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz "
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(8, 20))) + "#" for _ in range(count)]
+
+
+def throughput(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(text) / elapsed / (1024 * 1024)
+
+
+def main():
+    keyword_count = sum(len(g) for c in DANGEROUS_REQUEST_CATEGORIES.values() for g in c["triggers"])
+    print(f"Categories actuelles ({keyword_count} mots-cles)")
+    for size in (1_000, 10_000, 100_000):
+        text = make_description(size)
+        assert detect_dangerous_requests(text) == legacy_detect(text)
+        repeat = max(3, 2_000_000 // size)
+        legacy = throughput(legacy_detect, text, repeat)
+        automaton = throughput(detect_dangerous_requests, text, repeat)
+        print(f"  {size:>7} car. : boucles {legacy:7.1f} Mo/s, detection {automaton:6.1f} Mo/s")
+
+    print("Avec synonymes supplementaires (description de 10 000 car.)")
+    text = make_description(10_000).lower()
+    for count in (0, 100, 300, 1000):
+        keywords = [group for c in DANGEROUS_REQUEST_CATEGORIES.values() for group in c["triggers"]]
+        keywords = [group + synonyms(count // len(keywords), seed=i) for i, group in enumerate(keywords)]
+        matcher = KeywordAutomaton(dict(enumerate(keywords)))
+        forced = KeywordAutomaton(dict(enumerate(keywords)))
+        forced.uses_automaton = True
+
+        def loops(t):
+            return [i for i, group in enumerate(keywords) if any(k in t for k in group)]
+
+        assert set(loops(text)) == matcher.tags(text) == forced.tags(text)
+        total = sum(len(group) for group in keywords)
+        legacy = throughput(loops, text, 50)
+        compiled = throughput(forced.tags, text, 50)
+        chosen = "automate" if matcher.uses_automaton else "boucles"
+        print(f"  {total:>5} mots-cles : boucles {legacy:7.1f} Mo/s, automate {compiled:6.1f} Mo/s"
+              f" -> {chosen} (seuil {keywords_module.AUTOMATON_MIN_KEYWORDS})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: historique SQLite (WAL, ecriture par lots) vs insertion synchrone
+Cout d'un ajout cote requete, debit du thread d'ecriture, puis requetes
+filtrees sur une base de 200000 runs.
+
+Usage (depuis backend/):
+    python benchmarks/bench_history_store.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.history import SQLiteRunHistory
+
+RUNS = 200000
+SYNC_RUNS = 2000
+QUERIES = 200
+PROVIDERS = ("aws", "azure", "gcp", "openstack")
+
+
+def make_run(index: int) -> dict:
+    return {
+        "timestamp": f"2026-01-{1 + index // 86400:02d}T{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}",
+        "phrase": f"Je veux {index % 7 + 1} serveurs",
+        "infra": {"providers": [{"provider": PROVIDERS[index % 4], "servers": index % 7 + 1}]},
+        "security_status": "NOT_OK" if index % 50 == 0 else "OK",
+        "terraform_status": "BLOCKED" if index % 50 == 0 else "GENERATED",
+        "security_score": 90
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        # Reference: une transaction par requete, sur le thread de la requete
+        sync = SQLiteRunHistory(os.path.join(directory, "sync.db"))
+        connection = sync._connect()
+        latencies = []
+        for index in range(SYNC_RUNS):
+            start = time.perf_counter()
+            with connection:
+                sync._insert(connection, [make_run(index)])
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"Insertion synchrone : p50 {latencies[len(latencies) // 2] * 1e6:7.1f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:7.1f} us par requete")
+
+        store = SQLiteRunHistory(os.path.join(directory, "history.db"), queue_size=RUNS).start()
+        runs = [make_run(index) for index in range(RUNS)]
+        latencies = []
+        begin = time.perf_counter()
+        for run in runs:
+            start = time.perf_counter()
+            store.add(run)
+            latencies.append(time.perf_counter() - start)
+        store.flush(timeout=120)
+        elapsed = time.perf_counter() - begin
+        latencies.sort()
+        print(f"Ajout en file       : p50 {latencies[len(latencies) // 2] * 1e6:7.1f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:7.1f} us par requete")
+        print(f"Thread d'ecriture   : {RUNS / elapsed:,.0f} runs/s ({store.batches} lots, "
+              f"{store.dropped} abandonnes)")
+
+        since, until = runs[RUNS // 2]["timestamp"], runs[RUNS // 2 + 600]["timestamp"]
+        cases = (
+            ("derniers runs", {}),
+            ("provider=gcp", {"provider": "gcp"}),
+            ("security_status=NOT_OK", {"security_status": "NOT_OK"}),
+            ("plage de 10 minutes", {"since": since, "until": until}),
+            ("page suivante (curseur)", {"cursor": RUNS // 3}),
+        )
+        print(f"Requetes (limit=50, {len(store)} runs en base) :")
+        for label, filters in cases:
+            start = time.perf_counter()
+            for _ in range(QUERIES):
+                store.query(limit=50, **filters)
+            print(f"  {label:<26} {(time.perf_counter() - start) / QUERIES * 1000:7.3f} ms")
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            len(store)
+        print(f"  {'taille (/health)':<26} {(time.perf_counter() - start) / QUERIES * 1000:7.3f} ms")
+        store.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
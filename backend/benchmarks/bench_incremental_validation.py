@@ -0,0 +1,61 @@
+"""
+Benchmark: re-validation incrementale d'un gros fichier Terraform
+Analyse complete a chaque fois vs cache des resultats par bloc: premier
+passage (cache vide), fichier identique, puis modification de 1, 10 et 100
+blocs. Le cout doit suivre le nombre de blocs modifies.
+
+Usage (depuis backend/):
+    python benchmarks/bench_incremental_validation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.security_rules import block_cache, check_terraform_security, check_terraform_security_incremental
+from modules.terraform_gen import generate_terraform
+
+
+def make_code(servers: int) -> str:
+    infra = {"providers": [{"provider": "aws", "servers": servers, "databases": servers // 10,
+                            "database_type": "postgresql", "networks": 1, "load_balancers": 5,
+                            "security_groups": 1}]}
+    return generate_terraform(infra)
+
+
+def edit(code: str, blocks: int) -> str:
+    # Desactive la surveillance des N premiers serveurs
+    return code.replace("monitoring = true", "monitoring = false", blocks)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    for servers in (1000, 4000):
+        code = make_code(servers)
+        block_cache.clear()
+        print(f"{servers} serveurs AWS ({len(code) / (1024 * 1024):.2f} Mo)")
+
+        report, full = timed(lambda: check_terraform_security(code))
+        cold_report, cold = timed(lambda: check_terraform_security_incremental(code))
+        warm_report, warm = timed(lambda: check_terraform_security_incremental(code))
+        assert report == cold_report == warm_report
+        print(f"  analyse complete       : {full:8.1f} ms")
+        print(f"  cache vide             : {cold:8.1f} ms")
+        print(f"  fichier identique      : {warm:8.1f} ms")
+
+        for blocks in (1, 10, 100):
+            edited = edit(code, blocks)
+            misses = block_cache.misses
+            edited_report, elapsed = timed(lambda: check_terraform_security_incremental(edited))
+            assert edited_report == check_terraform_security(edited)
+            print(f"  {blocks:>3} bloc(s) modifie(s) : {elapsed:8.1f} ms  ({block_cache.misses - misses} re-evalue(s))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: mode grande echelle, 10 000 serveurs sur 4 providers
+Compare generation + validation en flux (memoire bornee) et le chemin
+classique qui materialise tout le fichier, pic memoire mesure par tracemalloc.
+
+Usage (depuis backend/):
+    python benchmarks/bench_large_scale.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.terraform_gen import generate_terraform, iter_terraform
+from modules.security import validate_infrastructure, validate_infrastructure_stream
+
+# Plafond memoire du chemin en flux, independant du nombre de serveurs
+MEMORY_CEILING_BYTES = 2 * 1024 * 1024
+
+DESCRIPTION = "10000 serveurs repartis sur AWS, Azure, GCP et OpenStack"
+
+
+def make_infra(total_servers: int) -> dict:
+    providers = ["aws", "azure", "gcp", "openstack"]
+    return {
+        "providers": [
+            {
+                "provider": provider,
+                "servers": total_servers // len(providers),
+                "databases": 50,
+                "database_type": "postgresql",
+                "networks": 1,
+                "load_balancers": 5,
+                "security_groups": 1
+            }
+            for provider in providers
+        ]
+    }
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def streamed(infra: dict) -> dict:
+    security = validate_infrastructure_stream(DESCRIPTION, iter_terraform(infra))
+    # Sortie en flux (comme la reponse HTTP), jetee au fur et a mesure
+    with open(os.devnull, "w") as sink:
+        for chunk in iter_terraform(infra):
+            sink.write(chunk)
+    return security
+
+
+def materialized(infra: dict) -> dict:
+    terraform = generate_terraform(infra)
+    return validate_infrastructure(DESCRIPTION, terraform)
+
+
+def main():
+    for total in (1000, 10000):
+        infra = make_infra(total)
+        verdict_stream, t_stream, peak_stream = measure(lambda: streamed(infra))
+        verdict_full, t_full, peak_full = measure(lambda: materialized(infra))
+        assert verdict_stream == verdict_full
+
+        print(f"{total} serveurs / 4 providers (verdict {verdict_stream['status']})")
+        print(f"  flux       : {t_stream * 1000:8.1f} ms, pic {peak_stream / 1024:8.1f} KiB")
+        print(f"  materialise: {t_full * 1000:8.1f} ms, pic {peak_full / 1024:8.1f} KiB")
+
+        assert peak_stream < MEMORY_CEILING_BYTES, "plafond memoire depasse en mode flux"
+
+    print(f"Plafond {MEMORY_CEILING_BYTES // 1024} KiB respecte en mode flux")
+
+
+if __name__ == "__main__":
+    main()
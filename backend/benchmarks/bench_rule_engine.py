@@ -0,0 +1,82 @@
+"""
+Benchmark: moteur de regles (registre, plan compile, fail-fast)
+Temps d'evaluation des regles sur un contexte deja indexe (hors parsing):
+- toutes les regles sur tous les blocs (ancien fonctionnement)
+- plan compile par provider (regles applicables au type de bloc seulement)
+- fail-fast (arret des que le score passe sous le seuil de blocage)
+puis le temps total analyse comprise.
+
+Usage (depuis backend/):
+    python benchmarks/bench_rule_engine.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.security_rules import (
+    BLOCKING_SCORE, RULE_REGISTRY, SECURITY_POLICIES, _build_report, _evaluate_fail_fast, _evaluate_policies,
+    _policy_results, analyze_terraform, check_terraform_security, compile_rule_plan,
+)
+from modules.terraform_gen import generate_terraform
+
+RUNS = 5
+
+
+def make_code(provider: str, servers: int, insecure: bool) -> str:
+    infra = {"providers": [{"provider": provider, "servers": servers, "databases": servers // 10,
+                            "database_type": "postgresql", "networks": 1, "load_balancers": 5,
+                            "security_groups": 1}]}
+    code = generate_terraform(infra)
+    if insecure:
+        # Mot de passe en dur (CRITICAL) et base publique (HIGH): verdict NOT_OK
+        code += '\nvariable "db_password" {\n  default = "x"\n  password = "secret123"\n}\n'
+        code = code.replace("publicly_accessible     = false", "publicly_accessible     = true")
+    return code
+
+
+def all_rules(ctx, provider):
+    # Ancien fonctionnement: chaque regle sur chaque bloc
+    failing = {policy_id: [] for policy_id in SECURITY_POLICIES}
+    for policy_id, rule in RULE_REGISTRY.items():
+        check = rule["check"]
+        failing[policy_id] = [block.address for block in ctx.blocks if check(block, provider) is False]
+    return _build_report(*_policy_results(failing, {}))
+
+
+def best_of(fn) -> float:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    for provider in ("aws", "azure"):
+        for insecure in (False, True):
+            code = make_code(provider, 4000, insecure)
+            ctx = analyze_terraform(code)
+            ctx.blocks
+            plan = compile_rule_plan(provider)
+            reference = all_rules(ctx, provider)
+            assert _build_report(*_evaluate_policies(ctx, plan)) == reference
+            fast = _build_report(*_evaluate_fail_fast(ctx, plan))
+            assert (fast["security_score"] < BLOCKING_SCORE) == (reference["security_score"] < BLOCKING_SCORE)
+
+            label = "non conforme" if insecure else "conforme"
+            print(f"{provider} {len(ctx.blocks)} blocs, {label} (score {reference['security_score']}, "
+                  f"regles ignorees par le plan: {plan.skipped or 'aucune'})")
+            print(f"  toutes les regles       : {best_of(lambda: all_rules(ctx, provider)):8.1f} ms")
+            print(f"  plan compile            : {best_of(lambda: _evaluate_policies(ctx, plan)):8.1f} ms")
+            print(f"  fail-fast               : {best_of(lambda: _evaluate_fail_fast(ctx, plan)):8.1f} ms"
+                  f"  ({len(fast.get('skipped_checks', []))} regle(s) non evaluee(s))")
+            print(f"  total detaille (analyse): {best_of(lambda: check_terraform_security(code)):8.1f} ms")
+            print(f"  total fail-fast         : "
+                  f"{best_of(lambda: check_terraform_security(code, fail_fast=True)):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: cout de l'instrumentation par regle
+Evaluation des regles avec et sans mesure de latence (RULE_METRICS), puis
+classement des regles les plus couteuses par provider.
+
+Usage (depuis backend/):
+    python benchmarks/bench_rule_metrics.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules import security_rules
+from modules.metrics import rule_metrics
+from modules.security_rules import _evaluate_policies, analyze_terraform, compile_rule_plan
+from modules.terraform_gen import generate_terraform
+
+RUNS = 20
+
+
+def best_of(fn) -> float:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rule_metrics.reset()
+    for provider in ("aws", "azure", "gcp", "openstack"):
+        infra = {"providers": [{"provider": provider, "servers": 2000, "databases": 200,
+                                "database_type": "postgresql", "load_balancers": 5}]}
+        ctx = analyze_terraform(generate_terraform(infra))
+        ctx.blocks
+        plan = compile_rule_plan(provider)
+
+        security_rules.RULE_METRICS_ENABLED = False
+        plain = best_of(lambda: _evaluate_policies(ctx, plan))
+        security_rules.RULE_METRICS_ENABLED = True
+        measured = best_of(lambda: _evaluate_policies(ctx, plan))
+        print(f"{provider:<9} {len(ctx.blocks)} blocs : sans mesure {plain:6.1f} ms, "
+              f"avec mesure {measured:6.1f} ms ({(measured / plain - 1) * 100:+.1f} %)")
+
+    print("Regles les plus couteuses (temps cumule):")
+    for entry in rule_metrics.stats(top=8)["slowest"]:
+        print(f"  {entry['rule']:<26} {entry['provider']:<9} {entry['total_ms']:8.1f} ms "
+              f"(moyenne {entry['mean_ms']:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
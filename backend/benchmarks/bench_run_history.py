@@ -0,0 +1,93 @@
+"""
+Benchmark: historique des runs indexe (tampon circulaire) vs liste balayee
+Ajout d'un run, puis requetes filtrees (provider, statut, plage de temps)
+et pagination par curseur sur un historique plein.
+
+Usage (depuis backend/):
+    python benchmarks/bench_run_history.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.history import RunHistory, run_providers
+
+SIZE = 50000
+QUERIES = 200
+PROVIDERS = ("aws", "azure", "gcp", "openstack")
+
+
+def make_run(index: int) -> dict:
+    return {
+        "timestamp": f"2026-01-{1 + index // 86400:02d}T{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}",
+        "phrase": f"run {index}",
+        "infra": {"providers": [{"provider": PROVIDERS[index % 4], "servers": 2}]},
+        # Runs bloques rares: le filtre le plus selectif
+        "security_status": "NOT_OK" if index % 50 == 0 else "OK",
+        "terraform_status": "BLOCKED" if index % 50 == 0 else "GENERATED",
+        "security_score": 90
+    }
+
+
+def scan(runs: list, limit: int, provider=None, security_status=None, since=None, until=None) -> list:
+    """Ancien fonctionnement: filtre par balayage complet de la liste"""
+    matched = [
+        run for run in runs
+        if (provider is None or provider in run_providers(run))
+        and (security_status is None or run["security_status"] == security_status)
+        and (since is None or run["timestamp"] >= since)
+        and (until is None or run["timestamp"] < until)
+    ]
+    return matched[-limit:]
+
+
+def per_query(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        fn()
+    return (time.perf_counter() - start) / QUERIES * 1000
+
+
+def main():
+    runs = [make_run(index) for index in range(SIZE)]
+
+    history = RunHistory(SIZE)
+    start = time.perf_counter()
+    history.extend(runs)
+    print(f"Ajout : {(time.perf_counter() - start) / SIZE * 1e6:.2f} us/run ({SIZE} runs)")
+    # Tampon plein: chaque ajout evince le plus ancien run
+    start = time.perf_counter()
+    history.extend(make_run(SIZE + index) for index in range(SIZE))
+    print(f"Ajout avec eviction : {(time.perf_counter() - start) / SIZE * 1e6:.2f} us/run")
+    runs = runs[SIZE:] + [make_run(SIZE + index) for index in range(SIZE)]
+
+    since, until = runs[SIZE // 2]["timestamp"], runs[SIZE // 2 + 600]["timestamp"]
+    cases = (
+        ("derniers runs", {}),
+        ("provider=gcp", {"provider": "gcp"}),
+        ("security_status=NOT_OK", {"security_status": "NOT_OK"}),
+        ("provider + NOT_OK", {"provider": "azure", "security_status": "NOT_OK"}),
+        ("plage de 10 minutes", {"since": since, "until": until}),
+    )
+    print(f"Requetes (limit=50, {SIZE} runs en memoire) :")
+    for label, filters in cases:
+        assert history.query(limit=50, **filters)["runs"] == scan(runs, 50, **filters)
+        indexed = per_query(lambda: history.query(limit=50, **filters))
+        scanned = per_query(lambda: scan(runs, 50, **filters))
+        print(f"  {label:<24} index {indexed:7.3f} ms, balayage {scanned:7.2f} ms (x{scanned / indexed:.0f})")
+
+    start = time.perf_counter()
+    pages, cursor = 0, None
+    while True:
+        page = history.query(limit=100, cursor=cursor, security_status="NOT_OK")
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    print(f"Pagination NOT_OK : {pages} pages en {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: cout de la journalisation d'un run sur le thread de la requete
+Ancien log_run (reecriture complete de history.json, 50 entrees, indent=2)
+vs depot dans la file du journal JSONL (ecriture et fsync en arriere-plan).
+
+Usage (depuis backend/):
+    python benchmarks/bench_run_journal.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.journal import RunJournal
+
+RUNS = 2000
+
+
+def make_run(index: int) -> dict:
+    return {
+        "timestamp": f"2026-01-01T00:00:00.{index:06d}",
+        "phrase": "Je veux 3 serveurs AWS avec une base PostgreSQL et un load balancer",
+        "infra": {"providers": [{"provider": "aws", "servers": 3, "databases": 1, "database_type": "postgresql",
+                                 "load_balancers": 1, "networks": 1, "security_groups": 1}]},
+        "security_status": "OK",
+        "terraform_status": "GENERATED",
+        "security_score": 80
+    }
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return f"p50 {pick(0.5):8.1f} us, p99 {pick(0.99):8.1f} us, max {samples[-1] * 1e6:9.1f} us"
+
+
+def legacy_log_run(history: list, run: dict, path: str):
+    history.append(run)
+    if len(history) > 100:
+        history.pop(0)
+    with open(path, "w") as f:
+        json.dump(history[-50:], f, indent=2)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        history = []
+        path = os.path.join(directory, "history.json")
+        samples = []
+        for index in range(RUNS):
+            start = time.perf_counter()
+            legacy_log_run(history, make_run(index), path)
+            samples.append(time.perf_counter() - start)
+        print(f"reecriture history.json : {percentiles(samples)}")
+
+        journal = RunJournal(os.path.join(directory, "journal")).start()
+        samples = []
+        start_all = time.perf_counter()
+        for index in range(RUNS):
+            start = time.perf_counter()
+            journal.append(make_run(index))
+            samples.append(time.perf_counter() - start)
+        journal.flush(timeout=30)
+        elapsed = time.perf_counter() - start_all
+        journal.close()
+        print(f"depot dans le journal   : {percentiles(samples)}")
+        stats = journal.stats()
+        print(f"thread d'ecriture       : {RUNS / elapsed:8.0f} runs/s, {stats['fsyncs']} fsync(s), "
+              f"{stats['dropped']} abandonne(s)")
+        assert len(journal.load(RUNS)) == RUNS
+
+
+if __name__ == "__main__":
+    main()
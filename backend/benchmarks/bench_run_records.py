@@ -0,0 +1,95 @@
+"""
+Benchmark: memoire de l'historique en memoire, runs en dict vs CompactRun
+100000 runs relus depuis le journal (objets distincts, comme au demarrage),
+octets par run mesures avec tracemalloc, puis cout d'ajout et de service.
+
+Usage (depuis backend/):
+    python benchmarks/bench_run_records.py
+"""
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.history import RunHistory
+
+RUNS = 100000
+PROVIDERS = ("aws", "azure", "gcp", "openstack")
+PHRASES = (
+    "Je veux {n} serveurs web {p} avec un load balancer",
+    "Deploie {n} serveurs et une base postgresql sur {p}",
+    "Infrastructure {p} : {n} machines, base de donnees mysql, reseau prive",
+)
+
+
+def journal_lines() -> list:
+    """Runs tels qu'ecrits par log_run puis relus depuis le journal JSONL"""
+    rng = random.Random(3)
+    start = datetime(2026, 1, 1)
+    lines = []
+    for index in range(RUNS):
+        provider = rng.choice(PROVIDERS)
+        servers = rng.randint(1, 10)
+        sections = [{"provider": provider, "servers": servers, "databases": rng.randint(0, 2),
+                     "database_type": rng.choice(("mysql", "postgresql")), "networks": 1,
+                     "load_balancers": rng.randint(0, 1), "security_groups": 1}]
+        blocked = rng.random() < 0.1
+        lines.append(json.dumps({
+            "timestamp": (start + timedelta(seconds=index, microseconds=rng.randint(0, 999999))).isoformat(),
+            "phrase": rng.choice(PHRASES).format(n=servers, p=provider.upper()),
+            "infra": {"providers": sections},
+            "security_status": "NOT_OK" if blocked else "OK",
+            "terraform_status": "BLOCKED" if blocked else "GENERATED",
+            "security_score": 40 if blocked else 90
+        }, ensure_ascii=False))
+    return lines
+
+
+def measure(lines: list, compact: bool) -> tuple:
+    """(historique, octets alloues) apres relecture de tous les runs"""
+    gc.collect()
+    tracemalloc.start()
+    history = RunHistory(RUNS, compact=compact)
+    for line in lines:
+        history.add(json.loads(line))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return history, size
+
+
+def timings(runs: list, compact: bool) -> tuple:
+    """Cout d'ajout et de service par run (sans tracemalloc)"""
+    history = RunHistory(RUNS, compact=compact)
+    start = time.perf_counter()
+    history.extend(runs)
+    add_us = (time.perf_counter() - start) / RUNS * 1e6
+    start = time.perf_counter()
+    for _ in range(100):
+        history.query(limit=100)
+    serve_us = (time.perf_counter() - start) / 100 / 100 * 1e6
+    return add_us, serve_us
+
+
+def main():
+    lines = journal_lines()
+    runs = [json.loads(line) for line in lines]
+    results = {}
+    for compact in (False, True):
+        history, size = measure(lines, compact)
+        results[compact] = history
+        add_us, serve_us = timings(runs, compact)
+        label = "CompactRun" if compact else "dict"
+        print(f"{label:<10} : {size / RUNS:6.0f} octets/run ({size / 1e6:5.1f} Mo pour {RUNS} runs), "
+              f"ajout {add_us:.2f} us/run, service {serve_us:.2f} us/run")
+    assert results[True].query(limit=1000)["runs"] == results[False].query(limit=1000)["runs"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: statistiques des runs par agregats incrementaux vs parcours de l'historique
+Cout de mise a jour par run, puis cout d'une requete de stats selon la
+taille de l'historique (10k, 100k runs).
+
+Usage (depuis backend/):
+    python benchmarks/bench_run_stats.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.history import run_providers
+from modules.run_stats import RunStats
+
+PROVIDERS = ("aws", "azure", "gcp", "openstack")
+QUERIES = 20
+
+
+def make_run(rng: random.Random) -> tuple:
+    blocked = rng.random() < 0.1
+    run = {
+        "infra": {"providers": [{"provider": rng.choice(PROVIDERS)}]},
+        "security_status": "NOT_OK" if blocked else "OK",
+        "terraform_status": "BLOCKED" if blocked else "GENERATED",
+        "security_score": 40 if blocked else rng.choice((80, 90, 100))
+    }
+    timings = {"extraction": rng.lognormvariate(6, 0.5), "validation": rng.lognormvariate(1, 0.8)}
+    timings["total"] = sum(timings.values())
+    return run, timings
+
+
+def scan(runs: list) -> dict:
+    """Ancien fonctionnement: recalcul complet a chaque requete"""
+    providers = {}
+    for run, _ in runs:
+        for provider in run_providers(run):
+            providers[provider] = providers.get(provider, 0) + 1
+    totals = sorted(timings["total"] for _, timings in runs)
+    return {
+        "providers": providers,
+        "block_rate": sum(run["terraform_status"] == "BLOCKED" for run, _ in runs) / len(runs),
+        "security_score_mean": statistics.fmean(run["security_score"] for run, _ in runs),
+        "p95_ms": totals[int(0.95 * (len(totals) - 1))]
+    }
+
+
+def main():
+    rng = random.Random(1)
+    for size in (10000, 100000):
+        runs = [make_run(rng) for _ in range(size)]
+        stats = RunStats()
+        start = time.perf_counter()
+        for run, timings in runs:
+            stats.record(run_providers(run), run["security_status"], run["terraform_status"],
+                         run["security_score"], timings)
+        record_us = (time.perf_counter() - start) / size * 1e6
+
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            snapshot = stats.snapshot()
+        incremental = (time.perf_counter() - start) / QUERIES * 1000
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            windowed = stats.snapshot(3600)
+        window = (time.perf_counter() - start) / QUERIES * 1000
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            reference = scan(runs)
+        scanned = (time.perf_counter() - start) / QUERIES * 1000
+
+        error = abs(snapshot["stages"]["total"]["p95_ms"] - reference["p95_ms"]) / reference["p95_ms"]
+        assert snapshot["providers"] == reference["providers"] and windowed["runs"] == size
+        print(f"{size:>6} runs : mise a jour {record_us:.2f} us/run, stats {incremental:.3f} ms "
+              f"(fenetre 1 h {window:.3f} ms), parcours {scanned:.1f} ms ; p95 a {error * 100:.2f} % pres")
+
+
+if __name__ == "__main__":
+    main()
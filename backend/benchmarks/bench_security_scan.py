@@ -0,0 +1,151 @@
+"""
+Benchmark: verification securite sur des fichiers Terraform de plusieurs Mo
+Compare les regles historiques (recherches de sous-chaines sur le fichier
+entier, verdict global) a l'index HCL (un passage, regles evaluees bloc par
+bloc avec les ressources en violation), et verifie que le cout par Mo reste
+stable (temps lineaire en la taille du fichier).
+
+Usage (depuis backend/):
+    python benchmarks/bench_security_scan.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.security import validate_infrastructure
+from modules.security_rules import SECURITY_POLICIES, check_terraform_security
+from modules.terraform_gen import iter_terraform
+
+
+# --------------------------------------------
+# Reference: regles fichier entier (avant l'index par ressource)
+# --------------------------------------------
+
+def _legacy_detect_provider(code):
+    code_lower = code.lower()
+    if 'provider "aws"' in code_lower or 'hashicorp/aws' in code_lower:
+        return "aws"
+    elif 'provider "azurerm"' in code_lower or 'hashicorp/azurerm' in code_lower:
+        return "azure"
+    elif 'provider "google"' in code_lower or 'hashicorp/google' in code_lower:
+        return "gcp"
+    elif 'provider "openstack"' in code_lower:
+        return "openstack"
+    return "aws"
+
+
+def _legacy_db(code, provider):
+    code_lower = code.lower()
+    if provider == "aws":
+        if "publicly_accessible = true" in code_lower:
+            return False
+        if "aws_db_instance" in code_lower:
+            return "publicly_accessible = false" in code_lower or "vpc_security_group_ids" in code_lower
+    elif provider == "azure":
+        if "azurerm_mysql_server" in code_lower or "azurerm_postgresql_server" in code_lower:
+            return "public_network_access_enabled = false" in code_lower
+    elif provider == "gcp":
+        if "google_sql_database_instance" in code_lower:
+            return "ipv4_enabled = false" in code_lower or "ipv4_enabled    = false" in code_lower
+    return True
+
+
+def _legacy_encryption(code, provider):
+    code_lower = code.lower()
+    if provider == "aws" and ("aws_instance" in code_lower or "aws_db_instance" in code_lower):
+        return ("encrypted = true" in code_lower or "storage_encrypted = true" in code_lower
+                or "storage_encrypted   = true" in code_lower)
+    return True
+
+
+def _legacy_ssl(code, provider):
+    code_lower = code.lower()
+    if provider == "aws":
+        if "aws_db_instance" in code_lower:
+            return "require_ssl = true" in code_lower or "ssl" in code_lower
+    elif provider == "azure":
+        if "azurerm_mysql_server" in code_lower or "azurerm_postgresql_server" in code_lower:
+            return "ssl_enforcement_enabled = true" in code_lower or "ssl_minimal_tls_version" in code_lower
+    elif provider == "gcp":
+        if "google_sql_database_instance" in code_lower:
+            return "require_ssl = true" in code_lower or "require_ssl  = true" in code_lower
+    if "ssl" in code_lower or "tls" in code_lower:
+        return True
+    db_keywords = ["db_instance", "mysql_server", "postgresql_server", "sql_database_instance"]
+    return not any(keyword in code_lower for keyword in db_keywords)
+
+
+def _legacy_monitoring(code, provider):
+    code_lower = code.lower()
+    if provider == "aws":
+        if "aws_instance" in code_lower:
+            return "monitoring = true" in code_lower
+        if "aws_db_instance" in code_lower:
+            return "enabled_cloudwatch_logs_exports" in code_lower or "monitoring" in code_lower
+    elif provider == "azure":
+        return "insights" in code_lower or "monitoring" in code_lower
+    elif provider == "gcp":
+        return "query_insights_enabled" in code_lower or "monitoring" in code_lower or "insights" in code_lower
+    return "monitoring" in code_lower or "logs" in code_lower or "insights" in code_lower
+
+
+def legacy_validate(code):
+    # validate_infrastructure detectait le provider, puis chaque regle relancait lower()
+    provider = _legacy_detect_provider(code)
+    checks = [
+        _legacy_db(code, provider),
+        _legacy_encryption(code, provider),
+        _legacy_ssl(code, provider),
+        _legacy_monitoring(code, provider),
+        "backup" in code.lower(),
+        not any(p in code for p in ['password = "', 'secret = "', 'api_key = "']),
+    ]
+    return checks
+
+
+# --------------------------------------------
+
+def make_code(servers_per_provider: int) -> str:
+    infra = {
+        "providers": [
+            {"provider": provider, "servers": servers_per_provider, "databases": servers_per_provider // 10,
+             "database_type": "mysql", "networks": 1, "load_balancers": 5, "security_groups": 1}
+            for provider in ["aws", "azure", "gcp", "openstack"]
+        ]
+    }
+    return "".join(iter_terraform(infra))
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    assert len(SECURITY_POLICIES) == 6
+    per_mb = []
+    for servers in (1000, 4000):
+        code = make_code(servers)
+        size_mb = len(code) / (1024 * 1024)
+        legacy = best_of(lambda: legacy_validate(code))
+        shared = best_of(lambda: validate_infrastructure("infra", code))
+        report_only = best_of(lambda: check_terraform_security(code))
+        per_mb.append(report_only / size_mb)
+        print(f"{size_mb:5.1f} Mo")
+        print(f"  regles fichier entier : {legacy * 1000:8.1f} ms")
+        print(f"  index par ressource   : {shared * 1000:8.1f} ms  (x{shared / legacy:.1f})")
+        print(f"  check seul            : {report_only * 1000:8.1f} ms  ({per_mb[-1] * 1000:.1f} ms/Mo)")
+
+    # Lineaire: le cout par Mo ne doit pas exploser avec la taille
+    print(f"Rapport cout/Mo grand/petit fichier: {per_mb[1] / per_mb[0]:.2f}")
+    assert per_mb[1] / per_mb[0] < 2, "cout non lineaire en la taille du fichier"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: verification securite multi-cloud par section provider
+Compare l'ancienne verification du fichier complet avec un seul provider
+(regles du premier provider detecte appliquees a tout le fichier) a
+l'evaluation par section: sequentielle, threads, pool de processus partage
+(demarrage forkserver/spawn), et le choix par defaut (sequentiel sur 1 CPU).
+
+Usage (depuis backend/):
+    python benchmarks/bench_security_sections.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.security_rules import (
+    _aggregate_sections, _check_section, check_terraform_security,
+    check_terraform_security_sections, split_provider_sections,
+)
+from modules.terraform_gen import generate_terraform
+
+PROVIDERS = ["aws", "azure", "gcp", "openstack"]
+
+
+def make_code(servers: int) -> str:
+    infra = {
+        "providers": [
+            {"provider": provider, "servers": servers, "databases": max(1, servers // 10),
+             "database_type": "postgresql", "networks": 1, "load_balancers": 5, "security_groups": 1}
+            for provider in PROVIDERS
+        ]
+    }
+    return generate_terraform(infra)
+
+
+def sequential(code: str) -> dict:
+    return _aggregate_sections([_check_section(section) for section in split_provider_sections(code)])
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"CPU disponibles: {os.cpu_count()}")
+    for servers, repeat in ((50, 20), (1000, 3), (4000, 2)):
+        code = make_code(servers)
+        size_mb = len(code) / (1024 * 1024)
+
+        single = check_terraform_security(code)
+        report = check_terraform_security_sections(code)
+        assert sequential(code) == report == check_terraform_security_sections(code, use_processes=True)
+
+        whole = best_of(lambda: check_terraform_security(code), repeat)
+        seq = best_of(lambda: sequential(code), repeat)
+        threads = best_of(lambda: check_terraform_security_sections(code, use_processes=False), repeat)
+        processes = best_of(lambda: check_terraform_security_sections(code, use_processes=True), repeat)
+        default = best_of(lambda: check_terraform_security_sections(code), repeat)
+
+        print(f"4 x {servers} serveurs ({size_mb:.2f} Mo)")
+        print(f"  fichier entier, 1 provider : {whole * 1000:8.1f} ms  score {single['security_score']}")
+        print(f"  sections, sequentiel       : {seq * 1000:8.1f} ms  score {report['security_score']}")
+        print(f"  sections, threads          : {threads * 1000:8.1f} ms")
+        print(f"  sections, processus        : {processes * 1000:8.1f} ms  (x{seq / processes:.2f})")
+        print(f"  sections, par defaut       : {default * 1000:8.1f} ms")
+        print("  par provider: " + ", ".join(
+            f"{provider} {detail['security_score']}" for provider, detail in report["by_provider"].items()
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark du serveur de production (serve.py): memoire par worker et debit,
+application prechargee dans le maitre (copie sur ecriture + gc.freeze)
+vs importee par chaque worker (--no-preload)
+RSS, PSS (pages partagees divisees entre processus) et USS (pages privees)
+lus dans /proc apres une charge de chauffe; AI_MODE=mock, limite de debit
+desactivee.
+
+Usage (depuis backend/):
+    python benchmarks/bench_serve.py
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORKERS = 4
+THREADS = 4
+CONCURRENCY = 32
+REQUESTS = 2000
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def request(port: int, method: str, path: str, body: bytes = b"") -> tuple:
+    """Requete HTTP/1.1 brute (Connection: close): statut, corps"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), payload
+
+
+async def load(port: int, requests: int, concurrency: int) -> dict:
+    body = json.dumps({"description": "3 serveurs AWS et une base postgresql"}).encode()
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status, _ = await request(port, "POST", "/generate", body)
+                errors += status != 200
+            except (OSError, ValueError, IndexError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "errors": errors
+    }
+
+
+def memory_kib(pid: int) -> dict:
+    """Rss, Pss et USS (Private_Clean + Private_Dirty) en KiB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                values[name] = int(rest.split()[0])
+    return {"rss": values["Rss"], "pss": values["Pss"], "uss": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def run(preload: bool, directory: str) -> dict:
+    port = free_port()
+    env = dict(os.environ, AI_MODE="mock", RATELIMIT_ENABLED="0",
+               HISTORY_DB=os.path.join(directory, f"history-{port}.db"),
+               JOURNAL_DIR=os.path.join(directory, f"journal-{port}"))
+    command = [sys.executable, "serve.py", "--bind", f"127.0.0.1:{port}", "--workers", str(WORKERS),
+               "--threads", str(THREADS), "--max-requests", "0"]
+    if not preload:
+        command.append("--no-preload")
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Pret quand chaque worker repond (connexions reparties par le noyau)
+        for _ in range(300):
+            try:
+                if asyncio.run(request(port, "GET", "/health"))[0] == 200 and len(children(process.pid)) == WORKERS:
+                    break
+            except (OSError, IndexError):
+                pass
+            time.sleep(0.05)
+        boot = time.perf_counter() - started
+
+        asyncio.run(load(port, 200, CONCURRENCY))
+        result = asyncio.run(load(port, REQUESTS, CONCURRENCY))
+        workers = [memory_kib(pid) for pid in children(process.pid)]
+        result.update(
+            boot=boot,
+            master=memory_kib(process.pid),
+            rss=sum(w["rss"] for w in workers) / len(workers),
+            pss=sum(w["pss"] for w in workers) / len(workers),
+            uss=sum(w["uss"] for w in workers) / len(workers),
+        )
+        return result
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    print(f"{WORKERS} workers x {THREADS} threads, {REQUESTS} requetes /generate, concurrence {CONCURRENCY}, "
+          f"{os.cpu_count()} coeur(s)")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, preload in (("Prechargee (defaut)", True), ("--no-preload", False)):
+            r = run(preload, directory)
+            print(f"{label:<20} : par worker RSS {r['rss'] / 1024:5.1f} MiB, PSS {r['pss'] / 1024:5.1f} MiB, "
+                  f"USS {r['uss'] / 1024:5.1f} MiB | maitre RSS {r['master']['rss'] / 1024:5.1f} MiB | "
+                  f"{r['rps']:6.1f} req/s, p50 {r['p50']:5.1f} ms, p95 {r['p95']:5.1f} ms, "
+                  f"erreurs {r['errors']} | demarrage {r['boot']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
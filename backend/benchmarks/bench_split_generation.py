@@ -0,0 +1,66 @@
+"""
+Benchmark: generation multi-cloud sequentielle vs sections paralleles
+
+Usage (depuis backend/):
+    python benchmarks/bench_split_generation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.terraform_gen import generate_terraform, generate_terraform_sections, generate_terraform_archive
+
+PROVIDERS = ["aws", "azure", "gcp", "openstack"]
+
+
+def make_infra(servers: int, databases: int, load_balancers: int) -> dict:
+    return {
+        "providers": [
+            {
+                "provider": provider,
+                "servers": servers,
+                "databases": databases,
+                "database_type": "postgresql",
+                "networks": 1,
+                "load_balancers": load_balancers,
+                "security_groups": 1
+            }
+            for provider in PROVIDERS
+        ]
+    }
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"CPU disponibles: {os.cpu_count()}")
+    # Limites pedagogiques (50/10/5) puis sections volumineuses hors schema
+    scenarios = [
+        ("4 x (50 srv, 10 db, 5 lb)", make_infra(50, 10, 5), 20),
+        ("4 x (2000 srv, 200 db, 5 lb)", make_infra(2000, 200, 5), 3),
+    ]
+
+    for label, infra, repeat in scenarios:
+        sequential = best_of(lambda: generate_terraform(infra), repeat)
+        threads = best_of(lambda: generate_terraform_sections(infra), repeat)
+        processes = best_of(lambda: generate_terraform_sections(infra, use_processes=True), repeat)
+        archive = best_of(lambda: generate_terraform_archive(infra, use_processes=True), repeat)
+
+        print(f"{label}")
+        print(f"  sequentiel (fichier unique) : {sequential * 1000:8.1f} ms")
+        print(f"  sections, threads           : {threads * 1000:8.1f} ms  (x{sequential / threads:.2f})")
+        print(f"  sections, processus         : {processes * 1000:8.1f} ms  (x{sequential / processes:.2f})")
+        print(f"  archive zip, processus      : {archive * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
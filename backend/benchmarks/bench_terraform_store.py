@@ -0,0 +1,67 @@
+"""
+Benchmark des reponses /generate allegees (?format=ref): octets transferes et
+temps par requete pour un client qui redemande la meme infrastructure
+multi-cloud, Terraform inclus dans la reponse vs reference sha256 puis
+GET /terraform/<sha256> (gzip, If-None-Match : 304 tant que l'empreinte
+ne change pas). Extraction remplacee par une infrastructure fixe (3 providers).
+
+Usage (depuis backend/):
+    python benchmarks/bench_terraform_store.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+REQUESTS = 50
+INFRA = {"providers": [
+    {"provider": provider, "servers": 50, "databases": 10, "database_type": "postgresql",
+     "networks": 1, "load_balancers": 5, "security_groups": 1}
+    for provider in ("aws", "gcp", "azure")
+]}
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    os.environ.update(AI_MODE="mock", RATELIMIT_ENABLED="0", HISTORY_DB=os.path.join(directory, "history.db"),
+                      JOURNAL_DIR=os.path.join(directory, "journal"), JOBS_DB="", QUOTA_DB="",
+                      IDEMPOTENCY_DB="", TERRAFORM_STORE_DIR=os.path.join(directory, "terraform"))
+    import app as app_module
+
+    app_module.extract_infrastructure = lambda *args, **kwargs: {"providers": [dict(p) for p in INFRA["providers"]]}
+    client = app_module.app.test_client()
+    body = {"description": "infrastructure multi-cloud de reference"}
+
+    start = time.perf_counter()
+    inline_bytes = 0
+    for _ in range(REQUESTS):
+        response = client.post("/generate", json=body)
+        inline_bytes += len(response.get_data())
+    inline = time.perf_counter() - start
+    terraform_bytes = len(response.get_json()["terraform"].encode())
+
+    start = time.perf_counter()
+    ref_bytes = 0
+    etag = None
+    for _ in range(REQUESTS):
+        lean = client.post("/generate?format=ref", json=body)
+        ref_bytes += len(lean.get_data())
+        headers = {"Accept-Encoding": "gzip"}
+        if etag:
+            headers["If-None-Match"] = etag
+        terraform = client.get(lean.get_json()["terraform_url"], headers=headers)
+        ref_bytes += len(terraform.get_data())
+        etag = terraform.headers["ETag"]
+    ref = time.perf_counter() - start
+
+    print(f"Terraform : {terraform_bytes / 1024:.0f} Kio, {REQUESTS} requetes pour la meme infrastructure")
+    print(f"Terraform inclus            : {inline_bytes / 1024:6.0f} Kio transferes, "
+          f"{inline / REQUESTS * 1000:5.1f} ms par requete")
+    print(f"Reference + GET (gzip, 304) : {ref_bytes / 1024:6.0f} Kio transferes, "
+          f"{ref / REQUESTS * 1000:5.1f} ms par requete (x{inline_bytes / ref_bytes:.0f} moins d'octets)")
+
+
+if __name__ == "__main__":
+    main()
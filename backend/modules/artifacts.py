@@ -0,0 +1,180 @@
+"""
+Stockage adressé par contenu du Terraform généré (GET /terraform/<sha256>)
+
+Chaque Terraform est écrit une fois sous son empreinte sha256, avec une
+copie compressée (gzip) calculée à l'écriture: le contenu d'une empreinte
+ne change jamais, les clients le gardent en cache (ETag, If-None-Match) et
+ne le retéléchargent que si l'empreinte de /generate a changé.
+
+Écriture atomique (fichier temporaire puis os.replace): plusieurs workers
+peuvent écrire le même contenu sans se gêner. Lecture par mmap, servie par
+morceaux sans copier le fichier entier en mémoire; un fichier supprimé par
+la purge reste lisible par les lectures déjà ouvertes. Au-delà de
+`max_bytes`, les artefacts les moins récemment écrits sont supprimés.
+"""
+import gzip
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+from typing import Iterator, Optional
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+# Écritures entre deux contrôles de la taille du stockage
+_PRUNE_EVERY = 100
+
+# Taille des morceaux envoyés au client
+CHUNK_BYTES = 64 * 1024
+
+
+def _chunks(mapped: mmap.mmap) -> Iterator[bytes]:
+    try:
+        for offset in range(0, len(mapped), CHUNK_BYTES):
+            yield mapped[offset:offset + CHUNK_BYTES]
+    finally:
+        mapped.close()
+
+
+class TerraformStore:
+    """
+    Terraform stocké sur disque par empreinte sha256 (un dossier par préfixe de 2 caractères)
+
+    Args:
+        root: Dossier du stockage (partagé par les workers)
+        max_bytes: Taille maximale du stockage, copies gzip comprises
+        compress_level: Niveau de compression des copies gzip
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 ** 3, compress_level: int = 6):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.pruned = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.tf")
+
+    def _write(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def put(self, terraform: str) -> str:
+        """Stocke le Terraform (s'il ne l'est pas déjà) et retourne son empreinte sha256"""
+        data = terraform.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        written = 0
+        if os.path.exists(path):
+            # Déjà stocké: rafraîchi pour la purge
+            os.utime(path)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.compress_level, mtime=0)
+            if len(compressed) < len(data):
+                self._write(path + ".gz", compressed)
+                written += len(compressed)
+            # Copie non compressée en dernier: sa présence signifie artefact complet
+            self._write(path, data)
+            written += len(data)
+        with self._lock:
+            self.puts += 1
+            self.writes += 1 if written else 0
+            self.bytes_written += written
+            prune = self.puts % _PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+        return digest
+
+    def locate(self, digest: str, accept_gzip: bool = False) -> Optional[tuple]:
+        """
+        Variante à servir: (chemin, taille, encodage) avec encodage "gzip" ou
+        None (contenu brut); None si l'empreinte est invalide ou inconnue
+        """
+        if not _DIGEST.fullmatch(digest):
+            return None
+        path = self._path(digest)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        if accept_gzip:
+            try:
+                return path + ".gz", os.path.getsize(path + ".gz"), "gzip"
+            except OSError:
+                pass
+        return path, size, None
+
+    @staticmethod
+    def read(path: str) -> Iterator[bytes]:
+        """
+        Contenu d'un artefact par morceaux de CHUNK_BYTES, lu par mmap
+        Le fichier est ouvert tout de suite (OSError s'il a disparu entre-temps)
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return iter(())
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return _chunks(mapped)
+
+    def prune(self):
+        """Supprime les artefacts les moins récemment écrits au-delà de max_bytes (jusqu'à 90 %)"""
+        artifacts = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not (name.endswith(".tf") or name.endswith(".tf.gz")):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                # Âge de l'artefact: dernière écriture ou réécriture (put) de sa copie brute
+                digest = name.split(".", 1)[0]
+                mtime, size = artifacts.get(digest, (0.0, 0))
+                if name.endswith(".tf"):
+                    mtime = stat.st_mtime
+                artifacts[digest] = (mtime, size + stat.st_size)
+
+        total = sum(size for _, size in artifacts.values())
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for digest, (_, size) in sorted(artifacts.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes * 0.9:
+                break
+            path = self._path(digest)
+            # Copie non compressée d'abord: l'artefact cesse d'être servi
+            for candidate in (path, path + ".gz"):
+                try:
+                    os.unlink(candidate)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self.pruned += removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "puts": self.puts,
+                "writes": self.writes,
+                "bytes_written": self.bytes_written,
+                "pruned": self.pruned,
+                "max_bytes": self.max_bytes
+            }
@@ -0,0 +1,202 @@
+"""
+Audit de sécurité d'arborescences Terraform existantes (.tf)
+
+Les fichiers sont découverts au fil du parcours, évalués dans un pool de
+processus avec un nombre borné de tâches en vol, et chaque résultat est
+produit dès que son fichier est terminé (NDJSON), suivi d'un résumé.
+La mémoire reste bornée quel que soit le nombre de fichiers.
+Un fichier multi-cloud (sections du générateur) est vérifié section par
+section, chacune avec les règles de son provider.
+
+Usage (depuis backend/):
+    python -m modules.security_rules audit <chemin> [--workers N] [--provider aws] [--fail-fast] [--debug]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .security_rules import (
+    BLOCKING_SCORE, analyze_terraform, check_terraform_security, check_terraform_security_sections,
+    process_pool_context, shared_process_pool, split_provider_sections,
+)
+
+# Fichiers plus gros ignorés (signalés en erreur)
+AUDIT_MAX_FILE_BYTES = int(os.getenv("AUDIT_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+
+# Dossiers jamais parcourus (modules téléchargés, VCS)
+_SKIPPED_DIRS = {".terraform", ".git", "node_modules"}
+
+_TYPE_PREFIXES = (("aws_", "aws"), ("azurerm_", "azure"), ("google_", "gcp"), ("openstack_", "openstack"))
+
+
+def iter_tf_files(root: str):
+    """Fichiers .tf sous root, dans un ordre stable, sans lister tout l'arbre d'avance"""
+    if os.path.isfile(root):
+        if root.endswith(".tf"):
+            yield root
+        return
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIPPED_DIRS)
+        for filename in sorted(filenames):
+            if filename.endswith(".tf"):
+                yield os.path.join(directory, filename)
+
+
+def _infer_provider(ctx) -> str:
+    """Provider du fichier; à défaut de bloc provider (souvent dans providers.tf), d'après les types"""
+    if ctx.providers:
+        return ctx.provider
+    counts = {}
+    for resource_type in ctx.resource_types:
+        for prefix, provider in _TYPE_PREFIXES:
+            if resource_type.startswith(prefix):
+                counts[provider] = counts.get(provider, 0) + 1
+    return max(counts, key=counts.get) if counts else ctx.provider
+
+
+def audit_file(path: str, provider: str = None, fail_fast: bool = False, debug: bool = False) -> dict:
+    """
+    Rapport compact d'un fichier (exécuté dans un processus du pool)
+    provider: force les règles d'un provider pour tout le fichier (sinon
+        détecté, par section pour un fichier multi-cloud: "by_provider")
+    fail_fast: évaluation arrêtée dès que le fichier est NOT_OK ("complete": False)
+    debug: ajoute la durée de chaque règle ("rule_timings")
+    """
+    try:
+        if os.path.getsize(path) > AUDIT_MAX_FILE_BYTES:
+            return {"file": path, "error": f"Fichier trop volumineux (> {AUDIT_MAX_FILE_BYTES} octets)"}
+        with open(path, encoding="utf-8", errors="replace") as f:
+            terraform_code = f.read()
+        ctx = analyze_terraform(terraform_code)
+        if provider is None and len(split_provider_sections(terraform_code)) > 1:
+            # Déjà dans un processus du pool: sections évaluées en série
+            report = check_terraform_security_sections(terraform_code, max_workers=1,
+                                                       fail_fast=fail_fast, debug=debug)
+            file_provider = "multi-cloud"
+        else:
+            file_provider = provider or _infer_provider(ctx)
+            report = check_terraform_security(ctx, file_provider, fail_fast=fail_fast, debug=debug)
+    except Exception as e:
+        return {"file": path, "error": str(e)}
+
+    result = {
+        "file": path,
+        "provider": file_provider,
+        "resources": len(ctx.resources),
+        "security_score": report["security_score"],
+        "security_grade": report["security_grade"],
+        "status": "NOT_OK" if report["security_score"] < BLOCKING_SCORE else "OK",
+        "violations": [
+            {
+                "rule": v["rule"],
+                "severity": v["severity"],
+                "resources": v["resources"],
+                "resource_count": v["resource_count"]
+            }
+            for v in report["violations"]
+        ]
+    }
+    if "by_provider" in report:
+        result["by_provider"] = report["by_provider"]
+    if report.get("complete") is False:
+        result["complete"] = False
+    if debug:
+        result["rule_timings"] = report["rule_timings"]
+    return result
+
+
+def audit_tree(root: str, max_workers: int = None, provider: str = None, fail_fast: bool = False,
+               debug: bool = False):
+    """
+    Audite tous les fichiers .tf sous root
+    Produit un dict par fichier (ordre de fin d'évaluation) puis {"summary": ...}
+
+    max_workers: pool dédié de max_workers processus (CLI); par défaut le pool
+    partagé du processus (endpoint), jamais recréé à chaque audit
+    """
+    if max_workers:
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=process_pool_context())
+    else:
+        # Le pool partagé survit à l'audit: pas d'arrêt en sortie de bloc
+        pool = contextlib.nullcontext(shared_process_pool())
+        max_workers = os.cpu_count() or 1
+    # Tâches en vol bornées: la mémoire ne dépend pas du nombre de fichiers
+    max_pending = max_workers * 4
+    summary = {
+        "files": 0, "errors": 0, "ok": 0, "not_ok": 0, "resources": 0,
+        "grades": {}, "violations_by_rule": {}
+    }
+    start = time.perf_counter()
+
+    def account(result: dict):
+        summary["files"] += 1
+        if "error" in result:
+            summary["errors"] += 1
+            return
+        summary["ok" if result["status"] == "OK" else "not_ok"] += 1
+        summary["resources"] += result["resources"]
+        grade = result["security_grade"]
+        summary["grades"][grade] = summary["grades"].get(grade, 0) + 1
+        for violation in result["violations"]:
+            rule = violation["rule"]
+            summary["violations_by_rule"][rule] = summary["violations_by_rule"].get(rule, 0) + 1
+        for rule, timing in result.get("rule_timings", {}).items():
+            # Mode debug: durée cumulée de chaque règle sur l'arborescence
+            total = summary.setdefault("rule_timings_ms", {})
+            total[rule] = round(total.get(rule, 0.0) + timing["ms"], 3)
+
+    with pool as executor:
+        pending = set()
+        for path in iter_tf_files(root):
+            pending.add(executor.submit(audit_file, path, provider, fail_fast, debug))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    account(result)
+                    yield result
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                account(result)
+                yield result
+
+    elapsed = time.perf_counter() - start
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["files_per_sec"] = round(summary["files"] / elapsed, 1) if elapsed > 0 else 0.0
+    yield {"summary": summary}
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m modules.security_rules",
+        description="Audit de securite de fichiers Terraform existants (sortie NDJSON)"
+    )
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    audit = subcommands.add_parser("audit", help="Audite les fichiers .tf d'un dossier")
+    audit.add_argument("path", help="Fichier .tf ou dossier a parcourir")
+    audit.add_argument("--workers", type=int, default=None, help="Processus (defaut: nombre de CPU)")
+    audit.add_argument("--provider", choices=["aws", "azure", "gcp", "openstack"],
+                       help="Force le provider (defaut: detecte par fichier)")
+    audit.add_argument("--fail-fast", action="store_true",
+                       help="Verdict seul: arrete l'evaluation d'un fichier des qu'il est bloque")
+    audit.add_argument("--debug", action="store_true", help="Ajoute la duree de chaque regle par fichier")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"Chemin introuvable: {args.path}", file=sys.stderr)
+        return 2
+
+    blocked = 0
+    for result in audit_tree(args.path, max_workers=args.workers, provider=args.provider,
+                             fail_fast=args.fail_fast, debug=args.debug):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+        if "summary" in result:
+            blocked = result["summary"]["not_ok"]
+    # Code de sortie non nul si un fichier serait bloque (utilisable en CI)
+    return 1 if blocked else 0
@@ -0,0 +1,152 @@
+"""
+Évaluation vectorisée des politiques sur des lots de configurations
+
+Pour la planification de capacité: des milliers de configurations
+candidates (mix de providers, nombres de ressources, types de base) sont
+notées sans générer ni analyser de Terraform. Chaque section provider est
+encodée en tableaux de caractéristiques (provider, type de base, présence
+de chaque type de ressource), réduits à un code de clé de conformité.
+Chaque politique de SECURITY_POLICIES devient un prédicat vectorisé: un
+vecteur booléen "en violation" indexé par ce code, tiré de la table de
+conformité (une configuration sonde par clé). Scores et grades sont ceux de
+check_terraform_security_sections() sur la sortie du générateur.
+"""
+import numpy as np
+
+from .compliance import DATABASE_TYPES, PROVIDERS, _KINDS, compliance_table
+from .security_rules import SECURITY_POLICIES, SEVERITY_PENALTIES, check_terraform_security_sections, policy_fingerprint
+from .terraform_gen import generate_terraform
+
+# Code de clé: provider x type de base (0 = aucune base) x bits de présence
+_DB_CODES = len(DATABASE_TYPES) + 1
+_PRESENCE_CODES = 2 ** len(_KINDS)
+_CODES = len(PROVIDERS) * _DB_CODES * _PRESENCE_CODES
+
+_PROVIDER_INDEX = {provider: index for index, provider in enumerate(PROVIDERS)}
+_DB_INDEX = {database_type: index + 1 for index, database_type in enumerate(DATABASE_TYPES)}
+_DEFAULT_COUNTS = np.array([default for _, default in _KINDS], dtype=np.int64)
+_PRESENCE_WEIGHTS = 1 << np.arange(len(_KINDS))
+
+_GRADES = np.array(["A", "B", "C", "D"])
+
+_predicates = None
+_predicates_fingerprint = None
+
+
+def _decode(code: int) -> tuple:
+    provider, rest = divmod(code, _DB_CODES * _PRESENCE_CODES)
+    database, flags = divmod(rest, _PRESENCE_CODES)
+    present = tuple(bool(flags >> bit & 1) for bit in range(len(_KINDS)))
+    return PROVIDERS[provider], DATABASE_TYPES[database - 1] if database else None, present
+
+
+def policy_predicates() -> tuple:
+    """
+    (policy_ids, violations, tabulable): violations[p, code] vrai si la
+    politique p est en violation pour la clé `code`; tabulable[code] faux si
+    la clé doit passer par l'analyse du texte. Recalculé si les politiques changent.
+    """
+    global _predicates, _predicates_fingerprint
+
+    fingerprint = policy_fingerprint()
+    if _predicates is not None and fingerprint == _predicates_fingerprint:
+        return _predicates
+
+    policy_ids = list(SECURITY_POLICIES)
+    row = {policy_id: index for index, policy_id in enumerate(policy_ids)}
+    violations = np.zeros((len(policy_ids), _CODES), dtype=bool)
+    tabulable = np.zeros(_CODES, dtype=bool)
+    for code in range(_CODES):
+        key = _decode(code)
+        # Clés impossibles: le type de base n'existe que si des bases sont générées
+        if (key[1] is None) == key[2][1]:
+            continue
+        failing = compliance_table.failing_policies(key)
+        if failing is None:
+            continue
+        tabulable[code] = True
+        for policy_id in failing:
+            violations[row[policy_id], code] = True
+
+    _predicates = (policy_ids, violations, tabulable)
+    _predicates_fingerprint = fingerprint
+    return _predicates
+
+
+def encode_specs(specs: list) -> dict:
+    """
+    Encode les configurations (JSON infra {"providers": [...]}) en tableaux,
+    une ligne par section provider:
+    - config: indice de la configuration
+    - provider, database: indices (-1 si hors enum)
+    - counts: nombres de ressources (servers, databases, load_balancers,
+      networks, security_groups), défauts du générateur
+    - code: code de clé de conformité (-1 si non encodable)
+    """
+    config, provider, database, counts = [], [], [], []
+    for index, spec in enumerate(specs):
+        for section in spec.get("providers", []):
+            config.append(index)
+            provider.append(_PROVIDER_INDEX.get(str(section.get("provider", "aws")).lower(), -1))
+            database.append(_DB_INDEX.get(str(section.get("database_type", "mysql")).lower(), -1))
+            counts.append([section.get(kind, default) for kind, default in _KINDS])
+
+    config = np.array(config, dtype=np.int64)
+    provider = np.array(provider, dtype=np.int64)
+    database = np.array(database, dtype=np.int64)
+    counts = np.array(counts, dtype=np.int64).reshape(-1, len(_KINDS))
+
+    present = counts > 0
+    # Le type de base ne compte que si des bases sont générées
+    database = np.where(present[:, 1], database, 0)
+    code = (provider * _DB_CODES + database) * _PRESENCE_CODES + present @ _PRESENCE_WEIGHTS
+    code = np.where((provider < 0) | (database < 0), -1, code)
+    return {"config": config, "provider": provider, "database": database, "counts": counts, "code": code}
+
+
+def score_batch(specs: list) -> dict:
+    """
+    Note un lot de configurations sans générer de Terraform
+
+    Args:
+        specs: Liste de JSON infra ({"providers": [{"provider": "aws", "servers": 3, ...}]})
+
+    Returns:
+        dict: policies (ordre des colonnes), violations (booléens, une ligne
+        par configuration), security_score (entiers), security_grade; mêmes
+        valeurs que check_terraform_security_sections(generate_terraform(spec))
+    """
+    policy_ids, predicates, tabulable = policy_predicates()
+    features = encode_specs(specs)
+    code = features["code"]
+
+    # Sections non encodables (valeur hors enum, clé non tabulable): analyse du texte
+    encodable = code >= 0
+    encodable[encodable] = tabulable[code[encodable]]
+    fallback = np.unique(features["config"][~encodable])
+
+    # Une politique est en violation si elle l'est dans une section de la configuration
+    violations = np.zeros((len(specs), len(policy_ids)), dtype=bool)
+    np.logical_or.at(violations, features["config"][encodable], predicates[:, code[encodable]].T)
+
+    if len(fallback):
+        column = {policy_id: index for index, policy_id in enumerate(policy_ids)}
+        for index in fallback:
+            violations[index] = False
+            report = check_terraform_security_sections(generate_terraform(specs[index]))
+            for violation in report["violations"]:
+                violations[index, column[violation["rule"]]] = True
+
+    penalties = np.array(
+        [SEVERITY_PENALTIES.get(SECURITY_POLICIES[policy_id]["severity"], 10) for policy_id in policy_ids]
+    )
+    scores = np.maximum(0, 100 - violations @ penalties)
+    grades = _GRADES[np.select([scores >= 90, scores >= 75, scores >= 60], [0, 1, 2], 3)]
+
+    return {
+        "policies": policy_ids,
+        "violations": violations,
+        "security_score": scores,
+        "security_grade": grades,
+        "fallbacks": len(fallback)
+    }
@@ -0,0 +1,78 @@
+"""
+Cache LRU thread-safe avec statistiques (succès, échecs, temps économisé)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache LRU borné, partagé entre les threads du serveur
+
+    Chaque entrée garde le temps qu'a coûté son calcul: un succès ajoute ce
+    temps au total économisé.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def get(self, key, accept=None):
+        """
+        Valeur en cache ou None (l'entrée devient la plus récente)
+        accept: prédicat sur la valeur; une valeur refusée compte comme un échec
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (accept is not None and not accept(entry[0])):
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[0]
+
+    def put(self, key, value, cost_seconds: float = 0.0):
+        with self._lock:
+            self._data[key] = (value, cost_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute, accept=None):
+        """Retourne la valeur en cache (acceptée), sinon la calcule (hors verrou) et la stocke"""
+        value = self.get(key, accept)
+        if value is None:
+            start = time.perf_counter()
+            value = compute()
+            self.put(key, value, time.perf_counter() - start)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        """Présence de la clé, sans compter de succès ni d'échec ni rafraîchir l'entrée"""
+        with self._lock:
+            return key in self._data
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_ms": round(self.saved_seconds * 1000, 2)
+            }
@@ -0,0 +1,197 @@
+"""
+Table de conformité précalculée pour la sortie du générateur
+
+Chaque template de terraform_gen émet toujours les mêmes attributs de
+sécurité: le rapport d'une section générée ne dépend que de la clé
+(provider, database_type, types de ressources présents). Il est calculé une
+fois par clé sur une configuration sonde, puis chaque vérification de sortie
+générée est une recherche dans la table. Le Terraform fourni par un
+utilisateur reste vérifié par analyse complète.
+"""
+import logging
+import re
+import threading
+
+from .security_rules import (
+    MAX_REPORTED_RESOURCES, _aggregate_sections, _build_report, _check_section, policy_fingerprint,
+)
+from .terraform_gen import generate_terraform_single_provider
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("aws", "azure", "gcp", "openstack")
+DATABASE_TYPES = ("mysql", "postgresql", "mariadb", "mongodb")
+
+# Types de ressources (champ, défaut du générateur) qui changent les blocs émis
+_KINDS = (("servers", 0), ("databases", 0), ("load_balancers", 0), ("networks", 1), ("security_groups", 1))
+
+# Nombres distincts dans la configuration sonde: le nombre d'indices d'une
+# ressource en violation (server_1, server_2) désigne son type. Les réseaux
+# ne produisent que des ressources non indexées (main, private).
+_PROBE_COUNTS = {"servers": 2, "databases": 3, "load_balancers": 4, "networks": 1, "security_groups": 5}
+_KIND_BY_PROBE_COUNT = {2: "servers", 3: "databases", 4: "load_balancers", 5: "security_groups"}
+
+_INDEXED_RE = re.compile(r'^(.*_)(\d+)$')
+
+
+def compliance_key(provider_config: dict) -> tuple:
+    """Clé de conformité d'une configuration provider (mêmes défauts que le générateur)"""
+    provider = provider_config.get("provider", "aws").lower()
+    present = tuple(provider_config.get(kind, default) > 0 for kind, default in _KINDS)
+    # Le type de base n'apparaît que si des bases sont générées
+    database_type = provider_config.get("database_type", "mysql").lower() if present[1] else None
+    return provider, database_type, present
+
+
+def _resource_templates(resources: list):
+    """
+    Adresses de la sonde -> groupes [(type, [préfixes])] ou adresses fixes
+    None si un indice ne correspond à aucun type (clé non tabulable)
+    """
+    templates = []
+    indices = {}
+    for address in resources:
+        match = _INDEXED_RE.match(address)
+        if match:
+            indices.setdefault(match.group(1), []).append(int(match.group(2)))
+
+    seen = set()
+    for address in resources:
+        match = _INDEXED_RE.match(address)
+        if not match:
+            templates.append(address)
+            continue
+        prefix = match.group(1)
+        if prefix in seen:
+            continue
+        seen.add(prefix)
+        kind = _KIND_BY_PROBE_COUNT.get(len(indices[prefix]))
+        if kind is None or sorted(indices[prefix]) != list(range(1, _PROBE_COUNTS[kind] + 1)):
+            return None
+        # Ressources d'un même type émises ensemble à chaque itération (nic_i, vm_i)
+        if templates and isinstance(templates[-1], tuple) and templates[-1][0] == kind:
+            templates[-1][1].append(prefix)
+        else:
+            templates.append((kind, [prefix]))
+    return templates
+
+
+def _build_entry(key: tuple):
+    """Rapport de la sonde, violations converties en modèles d'adresses"""
+    provider, database_type, present = key
+    probe = {"provider": provider, "database_type": database_type or "mysql"}
+    for (kind, _), flag in zip(_KINDS, present):
+        probe[kind] = _PROBE_COUNTS[kind] if flag else 0
+
+    detected, report = _check_section(generate_terraform_single_provider(probe))
+    violations = []
+    for violation in report["violations"]:
+        if violation["resource_count"] > len(violation["resources"]):
+            return None
+        templates = _resource_templates(violation["resources"])
+        if templates is None:
+            return None
+        violations.append((violation, templates))
+    return detected, violations, report["passed_checks"]
+
+
+def _expand(templates: list, provider_config: dict) -> tuple:
+    """Adresses réelles (bornées à MAX_REPORTED_RESOURCES) et nombre total"""
+    resources = []
+    count = 0
+    for template in templates:
+        if isinstance(template, str):
+            count += 1
+            if len(resources) < MAX_REPORTED_RESOURCES:
+                resources.append(template)
+            continue
+        kind, prefixes = template
+        total = provider_config.get(kind, 0)
+        count += total * len(prefixes)
+        index = 1
+        while index <= total and len(resources) < MAX_REPORTED_RESOURCES:
+            resources.extend(f"{prefix}{index}" for prefix in prefixes)
+            index += 1
+    return resources[:MAX_REPORTED_RESOURCES], count
+
+
+class ComplianceTable:
+    """
+    Table clé de conformité -> rapport modèle, liée à l'empreinte des
+    politiques (reconstruite si SECURITY_POLICIES change)
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.fallbacks = 0
+
+    def _check_fingerprint(self):
+        fingerprint = policy_fingerprint()
+        if fingerprint != self._fingerprint:
+            with self._lock:
+                self._entries = {}
+                self._fingerprint = fingerprint
+
+    def warm(self):
+        """Précalcule toutes les clés connues (providers x types de base x présence)"""
+        self._check_fingerprint()
+        for provider in PROVIDERS:
+            for flags in range(2 ** len(_KINDS)):
+                present = tuple(bool(flags >> bit & 1) for bit in range(len(_KINDS)))
+                for database_type in (DATABASE_TYPES if present[1] else (None,)):
+                    self._entry((provider, database_type, present))
+        logger.info(f"Table de conformite: {len(self._entries)} cles precalculees")
+
+    def _entry(self, key: tuple):
+        entries = self._entries
+        if key not in entries:
+            # Clé inconnue (valeur hors enum): calculée une fois à la demande
+            entry = _build_entry(key)
+            with self._lock:
+                entries[key] = entry
+        return entries[key]
+
+    def failing_policies(self, key: tuple):
+        """Politiques en violation pour une clé de conformité, None si non tabulable"""
+        self._check_fingerprint()
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        return tuple(violation["rule"] for violation, _ in entry[1])
+
+    def section_report(self, provider_config: dict):
+        """(provider, rapport) d'une section générée, None si non tabulable"""
+        entry = self._entry(compliance_key(provider_config))
+        if entry is None:
+            return None
+        provider, violations, passed = entry
+        report_violations = []
+        for violation, templates in violations:
+            resources, count = _expand(templates, provider_config)
+            report_violations.append(dict(violation, resources=resources, resource_count=count))
+        return provider, _build_report(report_violations, list(passed))
+
+    def report(self, infra: dict):
+        """
+        Rapport de sécurité de generate_terraform(infra), identique à
+        check_terraform_security_sections(); None si une section n'est pas tabulable
+        """
+        self._check_fingerprint()
+        providers = infra.get("providers", [])
+        if not providers:
+            return None
+        self.lookups += 1
+        results = [self.section_report(provider_config) for provider_config in providers]
+        if any(result is None for result in results):
+            self.fallbacks += 1
+            return None
+        return _aggregate_sections(results)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "lookups": self.lookups, "fallbacks": self.fallbacks}
+
+
+compliance_table = ComplianceTable()
@@ -0,0 +1,615 @@
+"""
+Historique des runs en mémoire: tampon circulaire borné, partagé entre les
+threads du serveur, avec index secondaires et pagination par curseur
+
+Chaque run reçoit un numéro de séquence croissant. Les index (provider,
+statut de sécurité, statut Terraform) sont des listes de séquences
+croissantes: l'éviction du plus ancien run retire la tête de ses listes,
+une requête se place par recherche dichotomique. Les horodatages étant
+croissants, une plage de temps devient une plage de séquences.
+
+Les runs sont gardés sous forme compacte (CompactRun: horodatage entier,
+chaînes internées, sections partagées entre configurations identiques) et
+ne redeviennent des dict JSON qu'au moment d'être servis.
+
+SQLiteRunHistory offre la même interface sur une base SQLite partagée par
+les workers (gunicorn) et conservée au redémarrage.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Champs indexés: nom du filtre -> valeurs d'un run
+_INDEXED_FIELDS = ("provider", "security_status", "terraform_status")
+
+# Runs insérés au plus par transaction
+_BATCH_SIZE = 1000
+
+_STOP = object()
+
+# Forme d'un run de log_run() et d'une section provider (ordre des clés conservé)
+_RUN_FIELDS = ("timestamp", "phrase", "infra", "security_status", "terraform_status", "security_score")
+_SECTION_FIELDS = (
+    "provider", "servers", "databases", "database_type", "networks", "load_balancers", "security_groups"
+)
+_SECTION_STRINGS = (0, 3)
+
+# Sections (et listes de sections) partagées entre runs identiques, en nombre borné
+_MAX_SHARED_SECTIONS = 65536
+_shared_sections = {}
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def run_providers(run: dict) -> list:
+    """Providers d'un run (format multi-cloud ou ancien format mono-provider)"""
+    infra = run.get("infra") or {}
+    if "providers" in infra:
+        providers = [section.get("provider") for section in infra.get("providers") or []]
+    else:
+        providers = [infra.get("provider")]
+    return sorted({str(provider).lower() for provider in providers if provider})
+
+
+def _timestamp_key(timestamp: str) -> int:
+    """Horodatage ISO -> microsecondes depuis l'epoch (heure locale); ValueError si invalide"""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def _format_timestamp(key: int) -> str:
+    return (_EPOCH + key * _MICROSECOND).isoformat()
+
+
+def _sortable_timestamp(timestamp) -> str:
+    """
+    Horodatage ISO -> forme comparable en texte (heure locale sans fuseau,
+    microsecondes toujours écrites); ValueError si invalide
+    """
+    key = _timestamp_key(timestamp)
+    return (_EPOCH + key * _MICROSECOND).isoformat(timespec="microseconds")
+
+
+def _share(value: tuple) -> tuple:
+    if len(_shared_sections) >= _MAX_SHARED_SECTIONS:
+        return _shared_sections.get(value, value)
+    return _shared_sections.setdefault(value, value)
+
+
+class CompactRun:
+    """
+    Run de log_run() en mémoire compacte: horodatage en microsecondes,
+    statuts et providers internés, sections (provider, nombres, type de base)
+    en tuples partagés. expand() redonne le dict d'origine.
+    """
+
+    __slots__ = ("timestamp", "phrase", "sections", "security_status", "terraform_status", "security_score")
+
+    @classmethod
+    def from_run(cls, run: dict):
+        """CompactRun équivalent, None si le run n'a pas la forme de log_run()"""
+        if tuple(run) != _RUN_FIELDS or not isinstance(run["phrase"], str) or type(run["security_score"]) is not int:
+            return None
+        infra = run["infra"]
+        if not isinstance(infra, dict) or tuple(infra) != ("providers",) or not isinstance(infra["providers"], list):
+            return None
+        sections = []
+        for section in infra["providers"]:
+            if not isinstance(section, dict) or tuple(section) != _SECTION_FIELDS:
+                return None
+            values = list(section.values())
+            for position, value in enumerate(values):
+                if position in _SECTION_STRINGS:
+                    if not isinstance(value, str):
+                        return None
+                    values[position] = sys.intern(value)
+                elif type(value) is not int:
+                    return None
+            sections.append(_share(tuple(values)))
+        statuses = (run["security_status"], run["terraform_status"])
+        if not all(status is None or isinstance(status, str) for status in statuses):
+            return None
+        try:
+            timestamp = _timestamp_key(run["timestamp"])
+        except (TypeError, ValueError):
+            return None
+        # Horodatage non canonique (fuseau, précision): la conversion ne serait pas exacte
+        if _format_timestamp(timestamp) != run["timestamp"]:
+            return None
+
+        record = cls()
+        record.timestamp = timestamp
+        record.phrase = run["phrase"]
+        record.sections = _share(tuple(sections))
+        record.security_status, record.terraform_status = (
+            sys.intern(status) if status is not None else None for status in statuses
+        )
+        record.security_score = run["security_score"]
+        return record
+
+    def providers(self) -> list:
+        return sorted({section[0].lower() for section in self.sections if section[0]})
+
+    def expand(self) -> dict:
+        return {
+            "timestamp": _format_timestamp(self.timestamp),
+            "phrase": self.phrase,
+            "infra": {"providers": [dict(zip(_SECTION_FIELDS, section)) for section in self.sections]},
+            "security_status": self.security_status,
+            "terraform_status": self.terraform_status,
+            "security_score": self.security_score
+        }
+
+
+def _field_values(run, field: str) -> list:
+    if isinstance(run, CompactRun):
+        if field == "provider":
+            return run.providers()
+        value = getattr(run, field)
+        return [value] if value else []
+    if field == "provider":
+        return run_providers(run)
+    return [run[field]] if run.get(field) else []
+
+
+def _in_window(timestamp: int, since: int, until: int) -> bool:
+    return (since is None or timestamp >= since) and (until is None or timestamp < until)
+
+
+def _index_values(run) -> dict:
+    return {field: _field_values(run, field) for field in _INDEXED_FIELDS}
+
+
+class _SeqIndex:
+    """Séquences croissantes d'une valeur; la tête est retirée sans décalage (offset)"""
+
+    __slots__ = ("seqs", "head")
+
+    def __init__(self):
+        self.seqs = []
+        self.head = 0
+
+    def __len__(self):
+        return len(self.seqs) - self.head
+
+    def append(self, seq: int):
+        self.seqs.append(seq)
+
+    def evict(self, seq: int):
+        if self.head < len(self.seqs) and self.seqs[self.head] == seq:
+            self.head += 1
+            # Compactage amorti: la liste ne croît pas indéfiniment
+            if self.head > 1024 and self.head * 2 > len(self.seqs):
+                del self.seqs[:self.head]
+                self.head = 0
+
+    def position(self, seq: int) -> int:
+        return bisect_left(self.seqs, seq, self.head)
+
+
+class RunHistory:
+    """
+    Tampon circulaire de `capacity` runs, thread-safe
+
+    add(run) est en O(1) (éviction comprise); query() parcourt l'index le
+    plus sélectif à partir du curseur, sans balayer tout l'historique.
+    compact: runs gardés en CompactRun (les runs d'une autre forme restent des dict)
+
+    Les bornes since/until sont cherchées par dichotomie tant que les
+    horodatages du tampon sont croissants; sinon (journaux de workers
+    entrelacés, horloge reculée) chaque run est filtré sur son horodatage.
+    """
+
+    def __init__(self, capacity: int = 10000, compact: bool = True):
+        self.capacity = capacity
+        self.compact = compact
+        self._slots = [None] * capacity
+        self._timestamps = [0] * capacity
+        # Paires de runs consécutifs du tampon dont l'horodatage recule
+        self._disorder = 0
+        self._next_seq = 0
+        self._indexes = {field: {} for field in _INDEXED_FIELDS}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._next_seq, self.capacity)
+
+    @property
+    def _first_seq(self) -> int:
+        return max(0, self._next_seq - self.capacity)
+
+    def add(self, run: dict) -> int:
+        """Ajoute un run (le plus ancien est évincé si le tampon est plein), retourne sa séquence"""
+        record = CompactRun.from_run(run) if self.compact else None
+        if record is not None:
+            run, timestamp = record, record.timestamp
+        else:
+            try:
+                timestamp = _timestamp_key(run.get("timestamp"))
+            except (TypeError, ValueError):
+                timestamp = 0
+        values = _index_values(run)
+        with self._lock:
+            seq = self._next_seq
+            slot = seq % self.capacity
+            evicted = self._slots[slot]
+            if evicted is not None:
+                for field, old_values in _index_values(evicted).items():
+                    for value in old_values:
+                        self._indexes[field][value].evict(seq - self.capacity)
+                # La paire (évincé, suivant) sort du tampon
+                following = seq - self.capacity + 1
+                if following < seq and self._timestamps[following % self.capacity] < self._timestamps[slot]:
+                    self._disorder -= 1
+            if seq and self.capacity > 1 and timestamp < self._timestamps[(seq - 1) % self.capacity]:
+                self._disorder += 1
+            self._slots[slot] = run
+            self._timestamps[slot] = timestamp
+            for field, field_values in values.items():
+                for value in field_values:
+                    index = self._indexes[field].get(value)
+                    if index is None:
+                        index = self._indexes[field][value] = _SeqIndex()
+                    index.append(seq)
+            self._next_seq = seq + 1
+        return seq
+
+    def extend(self, runs: list):
+        for run in runs:
+            self.add(run)
+
+    def _seq_for_time(self, timestamp: int) -> int:
+        """Première séquence dont l'horodatage est >= timestamp (dichotomie, tampon ordonné)"""
+        low, high = self._first_seq, self._next_seq
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[middle % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, limit: int = 10, cursor: int = None, since: str = None, until: str = None,
+              **filters) -> dict:
+        """
+        Derniers runs correspondant aux filtres, antérieurs au curseur
+
+        Args:
+            limit: Nombre de runs au plus
+            cursor: Séquence exclue (next_cursor de la page précédente)
+            since / until: Horodatages ISO (since inclus, until exclu), ValueError si invalides
+            filters: provider, security_status, terraform_status (égalité)
+
+        Returns:
+            dict: runs (ordre chronologique), next_cursor (None si plus ancien inexistant)
+        """
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if limit <= 0:
+            return {"runs": [], "next_cursor": None}
+        unknown = set(filters) - set(_INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Filtre inconnu: {', '.join(sorted(unknown))}")
+        if "provider" in filters:
+            filters["provider"] = filters["provider"].lower()
+        since = None if since is None else _timestamp_key(since)
+        until = None if until is None else _timestamp_key(until)
+
+        with self._lock:
+            window = None
+            if self._disorder and (since is not None or until is not None):
+                # Horodatages non monotones: une dichotomie perdrait des runs
+                window = (since, until)
+                low, high = self._first_seq, self._next_seq
+            else:
+                low = self._first_seq if since is None else self._seq_for_time(since)
+                high = self._next_seq if until is None else self._seq_for_time(until)
+            if cursor is not None:
+                high = min(high, cursor)
+
+            # Index le plus sélectif pour énumérer les candidats, les autres filtres vérifiés par run
+            candidates = None
+            for field, value in filters.items():
+                index = self._indexes[field].get(value)
+                if index is None:
+                    return {"runs": [], "next_cursor": None}
+                if candidates is None or len(index) < len(candidates[1]):
+                    candidates = (field, index)
+
+            if candidates is None:
+                seqs = range(high - 1, low - 1, -1)
+            else:
+                index = candidates[1]
+                begin = index.position(low)
+                end = index.position(high)
+                seqs = (index.seqs[position] for position in range(end - 1, begin - 1, -1))
+                del filters[candidates[0]]
+
+            runs = []
+            next_cursor = None
+            for seq in seqs:
+                if window is not None and not _in_window(self._timestamps[seq % self.capacity], *window):
+                    continue
+                run = self._slots[seq % self.capacity]
+                if not filters or all(value in _field_values(run, field) for field, value in filters.items()):
+                    if len(runs) == limit:
+                        # Il reste au moins un run plus ancien: la page suivante commence ici
+                        next_cursor = runs[-1][0]
+                        break
+                    runs.append((seq, run))
+
+        runs.reverse()
+        return {
+            "runs": [run.expand() if isinstance(run, CompactRun) else run for _, run in runs],
+            "next_cursor": next_cursor
+        }
+
+    def counts(self, field: str) -> dict:
+        """Nombre de runs en mémoire par valeur d'un champ indexé"""
+        with self._lock:
+            return {value: len(index) for value, index in self._indexes[field].items() if len(index)}
+
+    def start(self):
+        """Pas de thread d'écriture: même cycle de vie que SQLiteRunHistory (serve.py)"""
+        return self
+
+    def close(self, timeout: float = 5.0):
+        """Rien à écrire"""
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Rien en attente: un run ajouté est immédiatement visible"""
+        return True
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self), "capacity": self.capacity}
+
+
+class SQLiteRunHistory:
+    """
+    Historique des runs dans une base SQLite (mode WAL), partagé entre les
+    workers d'un même hôte et conservé au redémarrage
+
+    add() ne fait que déposer le run dans une file bornée: un thread dédié
+    insère par lots (une transaction par lot). Les lectures utilisent une
+    connexion par thread; WAL permet de lire pendant les écritures.
+    Même interface que RunHistory (add, query, __len__), la séquence d'un run
+    est son rowid.
+
+    Args:
+        path: Fichier de la base
+        max_runs: Runs conservés (les plus anciens sont supprimés), 0 = tous
+        queue_size: Runs en attente au plus; au-delà ils sont abandonnés (comptés)
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS runs ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL,"
+        " security_status TEXT, terraform_status TEXT, data TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS run_providers (run_id INTEGER NOT NULL, provider TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS history_meta (id INTEGER PRIMARY KEY CHECK (id = 0), runs INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO history_meta (id, runs) VALUES (0, 0)",
+        "CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS runs_security_status ON runs (security_status, id)",
+        "CREATE INDEX IF NOT EXISTS runs_terraform_status ON runs (terraform_status, id)",
+        "CREATE INDEX IF NOT EXISTS run_providers_provider ON run_providers (provider, run_id)",
+        "CREATE INDEX IF NOT EXISTS run_providers_run ON run_providers (run_id)",
+    )
+
+    def __init__(self, path: str, max_runs: int = 1000000, queue_size: int = 10000):
+        self.path = path
+        self.max_runs = max_runs
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        with connection:
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: pas de fsync par transaction, la base reste cohérente
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.isolation_level = ""
+        return connection
+
+    @property
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    # ---------- côté requête ----------
+
+    def add(self, run: dict) -> bool:
+        """Dépose un run (sans E/S disque); False s'il est abandonné (file pleine)"""
+        try:
+            self._queue.put_nowait(run)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def extend(self, runs: list):
+        for run in runs:
+            self.add(run)
+
+    def seed(self, runs: list) -> int:
+        """
+        Importe des runs si la base est vide (premier démarrage après
+        l'historique en mémoire); un seul worker importe. Retourne le nombre importé.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("SELECT runs FROM history_meta").fetchone()[0]:
+                connection.execute("ROLLBACK")
+                return 0
+            self._insert(connection, runs)
+            connection.execute("COMMIT")
+            return len(runs)
+        finally:
+            connection.close()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Attend que tout ce qui a été déposé soit visible en lecture (tests, arrêt)"""
+        if self._thread is None:
+            return False
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    # ---------- cycle de vie ----------
+
+    def start(self):
+        """Démarre le thread d'écriture (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="run-history", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0):
+        """Écrit ce qui reste et arrête le thread d'écriture"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP, timeout=timeout)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------- thread d'écriture ----------
+
+    def _insert(self, connection: sqlite3.Connection, runs: list):
+        for run in runs:
+            # Colonne normalisée pour les filtres since / until (le run lui-même reste tel quel)
+            try:
+                timestamp = _sortable_timestamp(run.get("timestamp"))
+            except (TypeError, ValueError):
+                timestamp = ""
+            cursor = connection.execute(
+                "INSERT INTO runs (timestamp, security_status, terraform_status, data) VALUES (?, ?, ?, ?)",
+                (timestamp, run.get("security_status"), run.get("terraform_status"),
+                 json.dumps(run, ensure_ascii=False, default=str, separators=(",", ":")))
+            )
+            connection.executemany(
+                "INSERT INTO run_providers (run_id, provider) VALUES (?, ?)",
+                [(cursor.lastrowid, provider) for provider in run_providers(run)]
+            )
+        connection.execute("UPDATE history_meta SET runs = runs + ?", (len(runs),))
+
+    def _prune(self, connection: sqlite3.Connection):
+        """Supprime les runs au-delà de max_runs (par paquets de 1 %, pas à chaque lot)"""
+        count = connection.execute("SELECT runs FROM history_meta").fetchone()[0]
+        if not self.max_runs or count <= self.max_runs + self.max_runs // 100:
+            return
+        row = connection.execute(
+            "SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_runs,)
+        ).fetchone()
+        if row is None:
+            return
+        deleted = connection.execute("DELETE FROM runs WHERE id <= ?", row).rowcount
+        connection.execute("DELETE FROM run_providers WHERE run_id <= ?", row)
+        connection.execute("UPDATE history_meta SET runs = runs - ?", (deleted,))
+
+    def _run(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(item is _STOP for item in batch)
+            waiters = [item for item in batch if isinstance(item, threading.Event)]
+            runs = [item for item in batch if isinstance(item, dict)]
+            if runs:
+                try:
+                    with connection:
+                        self._insert(connection, runs)
+                        self._prune(connection)
+                    self.written += len(runs)
+                    self.batches += 1
+                except sqlite3.Error as e:
+                    logger.warning(f"Impossible d'ecrire l'historique des runs: {e}")
+
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                connection.close()
+                return
+
+    # ---------- lecture ----------
+
+    def __len__(self):
+        return self._reader.execute("SELECT runs FROM history_meta").fetchone()[0]
+
+    def query(self, limit: int = 10, cursor: int = None, since: str = None, until: str = None,
+              **filters) -> dict:
+        """Même contrat que RunHistory.query() (curseur = rowid)"""
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if limit <= 0:
+            return {"runs": [], "next_cursor": None}
+        unknown = set(filters) - set(_INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Filtre inconnu: {', '.join(sorted(unknown))}")
+
+        conditions, params = [], []
+        if "provider" in filters:
+            # Parcours de l'index (provider, run_id) dans l'ordre: pas de tri des runs du provider
+            sql = "SELECT runs.id, runs.data FROM run_providers JOIN runs ON runs.id = run_providers.run_id"
+            order = "run_providers.run_id"
+            conditions.append("run_providers.provider = ?")
+            params.append(filters.pop("provider").lower())
+        else:
+            sql = "SELECT runs.id, runs.data FROM runs"
+            order = "runs.id"
+        for field, value in filters.items():
+            conditions.append(f"runs.{field} = ?")
+            params.append(value)
+        # Bornes comparées sous la forme de la colonne (fuseau converti en heure locale)
+        since = None if since is None else _sortable_timestamp(since)
+        until = None if until is None else _sortable_timestamp(until)
+        for condition, value in (("runs.timestamp >= ?", since), ("runs.timestamp < ?", until),
+                                 (f"{order} < ?", cursor)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._reader.execute(sql, params).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        rows = rows[:limit]
+        rows.reverse()
+        return {"runs": [json.loads(data) for _, data in rows], "next_cursor": next_cursor}
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "batches": self.batches
+        }
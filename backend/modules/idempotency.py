@@ -0,0 +1,309 @@
+"""
+Clés d'idempotence (en-tête Idempotency-Key) pour les requêtes de génération
+
+Un client (ou le proxy Next.js) qui renvoie une requête après une coupure
+réseau repasse la même clé: la première requête est traitée et sa réponse
+conservée `ttl` secondes; une copie arrivée pendant le traitement attend la
+réponse en cours, une copie arrivée après la reçoit telle quelle, sans
+nouvel appel au modèle ni run journalisé en double.
+
+La clé est liée à l'empreinte de la requête (méthode, chemin, corps): la
+réutiliser pour une autre requête est refusé. Une réservation dont le
+traitement n'aboutit pas à une réponse à conserver (erreur serveur, quota,
+réponse en flux) est libérée: la copie suivante est traitée normalement.
+Une réservation orpheline (worker arrêté en plein traitement) expire après
+`pending_ttl` secondes.
+
+Les réservations et réponses sont en mémoire (IdempotencyStore, un worker)
+ou dans une base SQLite partagée par les workers d'un même hôte
+(SQLiteIdempotencyStore), pour qu'une copie reçue par un autre worker soit
+reconnue.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+# Intervalle de sondage d'une réservation en cours (base SQLite)
+POLL_INTERVAL = 0.05
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """Empreinte d'une requête (méthode, chemin avec la query string, corps brut)"""
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Réservations et réponses en mémoire (propres au processus)
+
+    Une entrée: {"fingerprint", "response"}, response valant None tant que
+    la requête est en cours, sinon {"status", "headers", "body"}.
+
+    Args:
+        ttl: Conservation d'une réponse (s)
+        pending_ttl: Durée maximale d'une réservation en cours (s)
+        max_entries: Entrées conservées au plus (les plus anciennes sont évincées)
+        clock: Horloge (secondes), remplaçable dans les tests
+    """
+
+    def __init__(self, ttl: int = 3600, pending_ttl: int = 120, max_entries: int = 10000, clock=time.time):
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        return entry[1]
+
+    def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Réserve la clé (None) ou retourne l'entrée existante"""
+        now = self.clock()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is not None:
+                return dict(entry)
+            self._entries.pop(key, None)
+            # Réservation expirée reprise ou entrées évincées: leurs attentes se terminent
+            events = [self._events.pop(key, None)]
+            self._entries[key] = (now + self.pending_ttl, {"fingerprint": fingerprint, "response": None})
+            self._events[key] = threading.Event()
+            while self._entries:
+                expires, _ = next(iter(self._entries.values()))
+                if expires > now and len(self._entries) <= self.max_entries:
+                    break
+                evicted, _ = self._entries.popitem(last=False)
+                events.append(self._events.pop(evicted, None))
+        for event in events:
+            if event is not None:
+                event.set()
+        return None
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._live(key, self.clock())
+        return dict(entry) if entry is not None else None
+
+    def complete(self, key: str, response: dict):
+        """Conserve la réponse de la requête qui a réservé la clé"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (self.clock() + self.ttl, dict(entry[1], response=response))
+            event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def release(self, key: str):
+        """Libère une réservation sans réponse à conserver"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1]["response"] is None:
+                del self._entries[key]
+            event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def wait(self, key: str, timeout: float) -> Optional[dict]:
+        """Attend la fin de la requête en cours; entrée courante (None si libérée)"""
+        with self._lock:
+            event = self._events.get(key)
+        if event is not None:
+            event.wait(timeout)
+        return self.get(key)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self._entries), "max_entries": self.max_entries}
+
+
+class SQLiteIdempotencyStore:
+    """
+    Réservations et réponses dans une base SQLite (mode WAL) partagée par les workers
+
+    La réservation est un INSERT OR IGNORE sur la clé: un seul worker la
+    gagne. Les autres sondent la ligne (POLL_INTERVAL) jusqu'à la réponse.
+    Les entrées expirées sont supprimées à la réservation des suivantes.
+
+    Args:
+        path: Fichier de la base
+        ttl: Conservation d'une réponse (s)
+        pending_ttl: Durée maximale d'une réservation en cours (s)
+        clock: Horloge (secondes), remplaçable dans les tests
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+        "expires REAL NOT NULL, status INTEGER, headers TEXT, body BLOB)",
+        "CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires)",
+    )
+
+    def __init__(self, path: str, ttl: int = 3600, pending_ttl: int = 120, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.clock = clock
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connexion fermée aussitôt: rien n'est hérité par les workers forkés
+        connection = self._connect()
+        try:
+            with connection:
+                for statement in self._SCHEMA:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    @staticmethod
+    def _entry(row) -> Optional[dict]:
+        if row is None:
+            return None
+        fingerprint, status, headers, body = row
+        response = None if status is None else {"status": status, "headers": json.loads(headers), "body": body}
+        return {"fingerprint": fingerprint, "response": response}
+
+    def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        now = self.clock()
+        with self._connection as connection:
+            connection.execute("DELETE FROM idempotency WHERE expires <= ?", (now,))
+            inserted = connection.execute(
+                "INSERT OR IGNORE INTO idempotency (key, fingerprint, expires) VALUES (?, ?, ?)",
+                (key, fingerprint, now + self.pending_ttl)
+            ).rowcount
+            if inserted:
+                return None
+            row = connection.execute(
+                "SELECT fingerprint, status, headers, body FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+        return self._entry(row)
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self._connection.execute(
+            "SELECT fingerprint, status, headers, body FROM idempotency WHERE key = ? AND expires > ?",
+            (key, self.clock())
+        ).fetchone()
+        return self._entry(row)
+
+    def complete(self, key: str, response: dict):
+        with self._connection as connection:
+            connection.execute(
+                "UPDATE idempotency SET status = ?, headers = ?, body = ?, expires = ? WHERE key = ?",
+                (response["status"], json.dumps(response["headers"]), response["body"],
+                 self.clock() + self.ttl, key)
+            )
+
+    def release(self, key: str):
+        with self._connection as connection:
+            connection.execute("DELETE FROM idempotency WHERE key = ? AND status IS NULL", (key,))
+
+    def wait(self, key: str, timeout: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while True:
+            entry = self.get(key)
+            if entry is None or entry["response"] is not None or time.monotonic() >= deadline:
+                return entry
+            time.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def stats(self) -> dict:
+        size = self._connection.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0]
+        return {"backend": "sqlite", "size": size}
+
+
+class IdempotencyKeys:
+    """
+    Réservation d'une clé, attente d'une copie en cours et rejeu
+
+    Args:
+        store: IdempotencyStore ou SQLiteIdempotencyStore
+        wait_timeout: Attente maximale de la réponse d'une requête en cours (s)
+    """
+
+    def __init__(self, store, wait_timeout: float = 60):
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self._outcomes = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._outcomes[outcome] += 1
+
+    def claim(self, key: str, fingerprint: str) -> tuple:
+        """
+        Returns:
+            ("execute", None): clé réservée, traiter la requête puis appeler
+                complete() ou release()
+            ("replay", réponse): réponse conservée de la première requête
+            ("mismatch", None): clé déjà utilisée pour une autre requête
+            ("in_progress", None): la première requête n'a pas fini dans wait_timeout
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        entry = self.store.reserve(key, fingerprint)
+        waited = False
+        while entry is not None:
+            if entry["fingerprint"] != fingerprint:
+                self._count("mismatch")
+                return "mismatch", None
+            if entry["response"] is not None:
+                self._count("replay")
+                if waited:
+                    self._count("waited")
+                return "replay", entry["response"]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count("in_progress")
+                return "in_progress", None
+            waited = True
+            entry = self.store.wait(key, remaining)
+            if entry is None:
+                # Première requête sans réponse à conserver: celle-ci prend le relais
+                entry = self.store.reserve(key, fingerprint)
+        self._count("execute")
+        return "execute", None
+
+    def complete(self, key: str, response: dict):
+        self.store.complete(key, response)
+
+    def release(self, key: str):
+        self._count("release")
+        self.store.release(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            outcomes = dict(self._outcomes)
+        return {
+            "executed": outcomes.get("execute", 0),
+            "replayed": outcomes.get("replay", 0),
+            "waited": outcomes.get("waited", 0),
+            "mismatched": outcomes.get("mismatch", 0),
+            "in_progress": outcomes.get("in_progress", 0),
+            "released": outcomes.get("release", 0),
+            "store": self.store.stats()
+        }
@@ -0,0 +1,317 @@
+"""
+Jobs de génération asynchrones (POST /jobs, GET /jobs/<id>)
+
+submit() dépose le job dans une file bornée et rend aussitôt son
+identifiant; un pool de threads dédié le traite. File pleine: le job est
+refusé (l'appelant répond 503 avec un Retry-After estimé d'après la
+profondeur de la file et le temps de service moyen) plutôt que d'accumuler
+une attente sans borne.
+
+L'état des jobs (en file, en cours, terminé, échoué) et leurs résultats
+sont conservés `ttl` secondes dans un JobStore: en mémoire (un worker), ou
+SQLiteJobStore partagé par les workers d'un même hôte, pour que n'importe
+quel worker réponde à GET /jobs/<id>. La file et le pool restent propres au
+worker qui a accepté le job.
+"""
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from .run_stats import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Réponse d'un job non traité (arrêt du worker avant son tour)
+ABANDONED_ERROR = {
+    "error": "Service indisponible",
+    "message": "Job abandonné à l'arrêt du serveur, soumettez-le à nouveau"
+}
+
+_HANDLER_ERROR = {
+    "error": "Erreur serveur",
+    "message": "Une erreur inattendue s'est produite"
+}
+
+
+class JobStore:
+    """
+    États des jobs en mémoire (propres au processus), bornés en nombre et en âge
+
+    Args:
+        ttl: Durée de conservation d'un job (s) depuis sa création
+        max_jobs: Jobs conservés au plus (les plus anciens sont évincés)
+        clock: Horloge (secondes), remplaçable dans les tests
+    """
+
+    def __init__(self, ttl: int = 3600, max_jobs: int = 10000, clock=time.time):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.clock = clock
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, job: dict):
+        """Crée ou remplace l'état d'un job"""
+        now = self.clock()
+        with self._lock:
+            if job["job_id"] in self._jobs:
+                expires = self._jobs[job["job_id"]][0]
+                self._jobs[job["job_id"]] = (expires, dict(job))
+                return
+            self._jobs[job["job_id"]] = (now + self.ttl, dict(job))
+            while self._jobs:
+                expires, _ = next(iter(self._jobs.values()))
+                if expires > now and len(self._jobs) <= self.max_jobs:
+                    break
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: str):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None or entry[0] <= self.clock():
+            return None
+        return dict(entry[1])
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self._jobs), "max_jobs": self.max_jobs}
+
+
+class SQLiteJobStore:
+    """
+    États des jobs dans une base SQLite (mode WAL) partagée par les workers
+
+    Chaque changement d'état est une petite transaction (création, début,
+    fin): il doit être visible des autres workers dès la réponse à POST /jobs.
+    Les jobs expirés sont supprimés à la création des suivants.
+
+    Args:
+        path: Fichier de la base
+        ttl: Durée de conservation d'un job (s) depuis sa création
+        clock: Horloge (secondes), remplaçable dans les tests
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, expires REAL NOT NULL, data TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires)",
+    )
+
+    def __init__(self, path: str, ttl: int = 3600, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connexion fermée aussitôt: rien n'est hérité par les workers forkés
+        connection = self._connect()
+        try:
+            with connection:
+                for statement in self._SCHEMA:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (requêtes et pool de jobs)
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def save(self, job: dict):
+        now = self.clock()
+        data = json.dumps(job, ensure_ascii=False, default=str)
+        with self._connection as connection:
+            updated = connection.execute("UPDATE jobs SET data = ? WHERE id = ?", (data, job["job_id"])).rowcount
+            if not updated:
+                connection.execute("DELETE FROM jobs WHERE expires <= ?", (now,))
+                connection.execute("INSERT INTO jobs (id, expires, data) VALUES (?, ?, ?)",
+                                   (job["job_id"], now + self.ttl, data))
+
+    def get(self, job_id: str):
+        row = self._connection.execute(
+            "SELECT data FROM jobs WHERE id = ? AND expires > ?", (job_id, self.clock())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self) -> dict:
+        size = self._connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {"backend": "sqlite", "size": size}
+
+
+class JobQueue:
+    """
+    File bornée de jobs traités par un pool de threads
+
+    Args:
+        handler: Traitement d'un job, handler(*args) -> (code HTTP, corps);
+            code >= 400: job échoué, le corps est l'erreur
+        store: JobStore ou SQLiteJobStore
+        workers: Jobs traités en parallèle
+        queue_size: Jobs en attente au plus; au-delà submit() refuse
+    """
+
+    def __init__(self, handler, store, workers: int = 4, queue_size: int = 100):
+        self.handler = handler
+        self.store = store
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait = QuantileSketch()
+        self.service = QuantileSketch()
+
+    # ---------- côté requête ----------
+
+    def submit(self, *args) -> dict:
+        """Dépose un job; son état (job_id, status "queued"), None si la file est pleine"""
+        if self._queue.full():
+            with self._lock:
+                self.rejected += 1
+            return None
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "created": datetime.now().isoformat()
+        }
+        # Enregistré avant d'être visible du pool: jamais d'état "queued" écrit après la fin
+        self.store.save(job)
+        try:
+            self._queue.put_nowait((job, time.perf_counter(), args))
+        except queue.Full:
+            # File remplie entre-temps par une autre requête
+            self.store.save(dict(job, status="failed", http_status=503, error=ABANDONED_ERROR))
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            self.submitted += 1
+        return job
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    def retry_after(self) -> int:
+        """Secondes avant qu'une place se libère (estimation, au moins 1)"""
+        with self._lock:
+            mean_service = self.service.total / self.service.count if self.service.count else 1000.0
+        backlog = self._queue.qsize() + self.running
+        return max(1, math.ceil(backlog * mean_service / 1000 / max(1, self.workers)))
+
+    # ---------- cycle de vie ----------
+
+    def start(self):
+        """Démarre le pool (idempotent)"""
+        if not self._threads:
+            self._threads = [
+                threading.Thread(target=self._run, name=f"job-{index}", daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def close(self, timeout: float = 30.0):
+        """
+        Termine les jobs en cours (au plus `timeout` s); les jobs encore en
+        file sont marqués échoués (503) pour que le client les soumette à nouveau
+        """
+        if not self._threads:
+            return
+        while True:
+            try:
+                job, _, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.store.save(dict(job, status="failed", http_status=503, error=ABANDONED_ERROR))
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    # ---------- pool ----------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            job, enqueued, args = item
+            started = time.perf_counter()
+            with self._lock:
+                self.running += 1
+                self.wait.add((started - enqueued) * 1000)
+            job = dict(job, status="running", started=datetime.now().isoformat())
+
+            # Erreur du stockage (base SQLite) comprise: le job échoue, le worker continue
+            try:
+                self.store.save(job)
+                status, body = self.handler(*args)
+            except Exception as e:
+                logger.exception(f"Erreur inattendue dans un job: {e}")
+                status, body = 500, _HANDLER_ERROR
+
+            service_ms = (time.perf_counter() - started) * 1000
+            job = dict(
+                job,
+                status="done" if status < 400 else "failed",
+                finished=datetime.now().isoformat(),
+                wait_ms=round((started - enqueued) * 1000, 3),
+                service_ms=round(service_ms, 3),
+                http_status=status
+            )
+            job["result" if status < 400 else "error"] = body
+            try:
+                self.store.save(job)
+            except Exception as e:
+                logger.error(f"Impossible d'enregistrer le job {job['job_id']}: {e}")
+            with self._lock:
+                self.running -= 1
+                self.service.add(service_ms)
+                if status < 400:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "depth": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "running": self.running,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "wait": self.wait.snapshot(),
+                "service": self.service.snapshot(),
+                "store": self.store.stats()
+            }
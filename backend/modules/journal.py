@@ -0,0 +1,292 @@
+"""
+Journal des runs en ajout seul (JSONL), écrit hors du thread de la requête
+
+append() ne fait que déposer l'enregistrement dans une file bornée: un
+thread dédié sérialise, écrit par lots et fait un fsync groupé (au plus un
+par intervalle). Les segments tournent à partir d'une taille donnée
+(runs-000001.jsonl, runs-000002.jsonl, ...), avec compression gzip
+optionnelle des segments fermés. load() relit la fin du journal au
+démarrage pour reconstruire l'historique en mémoire.
+
+Plusieurs processus (workers gunicorn) peuvent écrire le même journal:
+chaque lot, la rotation, la compression et la purge se font sous un verrou
+flock posé sur le dossier, et un processus rejoint le segment le plus
+récent avant d'écrire. Aucun n'écrit dans un segment déjà fermé,
+compressé ou supprimé par un autre.
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: pas de flock, un seul processus écrit le journal
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_RE = re.compile(r'^runs-(\d{6})\.jsonl(\.gz)?$')
+
+# Lignes écrites au plus par lot (entre deux vérifications de rotation)
+_BATCH_SIZE = 1000
+
+_STOP = object()
+
+
+class RunJournal:
+    """
+    Journal JSONL segmenté, alimenté par une file bornée
+
+    Args:
+        directory: Dossier des segments
+        segment_bytes: Taille à partir de laquelle un nouveau segment est ouvert
+        compress: Compresse (gzip) les segments fermés
+        max_segments: Segments conservés (les plus anciens sont supprimés), 0 = tous
+        queue_size: Enregistrements en attente au plus; au-delà ils sont
+            abandonnés (comptés) plutôt que de bloquer la requête
+        fsync_interval: Délai maximal (s) entre une écriture et son fsync
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 8 * 1024 * 1024, compress: bool = False,
+                 max_segments: int = 20, queue_size: int = 10000, fsync_interval: float = 1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        self.max_segments = max_segments
+        self.fsync_interval = fsync_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._file = None
+        self._index = 0
+        self.written = 0
+        self.dropped = 0
+        self.fsyncs = 0
+        self.rotations = 0
+
+    # ---------- côté requête ----------
+
+    def append(self, record: dict) -> bool:
+        """Dépose un enregistrement (sans E/S disque); False s'il est abandonné (file pleine)"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Attend que tout ce qui a été déposé soit écrit et synchronisé (tests, arrêt)"""
+        if self._thread is None:
+            return False
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    # ---------- cycle de vie ----------
+
+    def start(self):
+        """Démarre le thread d'écriture (idempotent)"""
+        if self._thread is not None:
+            return self
+        os.makedirs(self.directory, exist_ok=True)
+        with self._locked():
+            self._open_latest()
+        self._thread = threading.Thread(target=self._run, name="run-journal", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0):
+        """Écrit ce qui reste, fsync, ferme le segment courant"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP, timeout=timeout)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------- segments ----------
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        """
+        Verrou du dossier entre processus (exclusif pour écrire, partagé pour relire)
+        Descripteur ouvert à chaque fois: un verrou hérité du maître au fork
+        serait partagé avec lui au lieu de l'exclure.
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _open_latest(self):
+        """Ouvre le segment le plus récent, ou le suivant s'il est plein ou compressé (sous verrou)"""
+        segments = self.segments()
+        index = segments[-1][0] if segments else 1
+        if segments and (segments[-1][1].endswith(".gz") or os.path.getsize(segments[-1][1]) >= self.segment_bytes):
+            index += 1
+        if self._file is not None:
+            self._file.close()
+        self._index = index
+        self._file = open(self._segment_path(index), "a", encoding="utf-8")
+        # Ligne incomplète laissée par un arrêt brutal: terminée pour ne pas y coller la suivante
+        size = os.fstat(self._file.fileno()).st_size
+        if size:
+            with open(self._segment_path(index), "rb") as f:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+                    self._file.flush()
+
+    def _write(self, data: str):
+        """Écrit un lot à la fin du segment le plus récent, tourne si plein (sous verrou)"""
+        segments = self.segments()
+        if not segments or segments[-1][0] != self._index:
+            # Segment tourné par un autre processus
+            self._open_latest()
+        self._file.write(data)
+        # Vidé avant de rendre le verrou: un autre processus peut tourner et compresser ce segment
+        self._file.flush()
+        if os.fstat(self._file.fileno()).st_size >= self.segment_bytes:
+            self._rotate()
+
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"runs-{index:06d}.jsonl")
+
+    def segments(self) -> list:
+        """[(indice, chemin)] des segments existants, du plus ancien au plus récent"""
+        if not os.path.isdir(self.directory):
+            return []
+        found = {}
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_RE.match(name)
+            if match:
+                # Un segment présent compressé et non compressé (arrêt pendant
+                # la compression): la version non compressée fait foi
+                index = int(match.group(1))
+                if index not in found or not match.group(2):
+                    found[index] = os.path.join(self.directory, name)
+        return sorted(found.items())
+
+    def _rotate(self):
+        self._sync()
+        closed = self._segment_path(self._index)
+        self._open_latest()
+        self.rotations += 1
+        if self.compress:
+            with open(closed, "rb") as source, gzip.open(closed + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(closed)
+        if self.max_segments:
+            for _, path in self.segments()[:-self.max_segments]:
+                os.remove(path)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+
+    # ---------- thread d'écriture ----------
+
+    def _run(self):
+        dirty = False
+        last_sync = time.monotonic()
+        while True:
+            # Sans écriture en attente de fsync, on dort jusqu'au prochain enregistrement
+            try:
+                item = self._queue.get(timeout=self.fsync_interval if dirty else None)
+                batch = [item]
+            except queue.Empty:
+                batch = []
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            waiters = []
+            lines = []
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    try:
+                        lines.append(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Enregistrement du journal ignore: {e}")
+
+            try:
+                if lines:
+                    with self._locked():
+                        self._write("".join(lines))
+                    self.written += len(lines)
+                    dirty = True
+                if dirty and (stop or waiters or time.monotonic() - last_sync >= self.fsync_interval):
+                    self._sync()
+                    dirty = False
+                    last_sync = time.monotonic()
+            except OSError as e:
+                logger.warning(f"Impossible d'ecrire le journal des runs: {e}")
+
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._file.close()
+                return
+
+    # ---------- relecture ----------
+
+    def load(self, limit: int, legacy_file: str = None) -> list:
+        """
+        Derniers `limit` enregistrements, du plus ancien au plus récent
+        Une ligne incomplète (arrêt brutal pendant l'écriture) est ignorée.
+        legacy_file: historique JSON de l'ancien format, relu si le journal est vide
+        """
+        records = []
+        if os.path.isdir(self.directory):
+            # Verrou partagé: pas de segment compressé ou supprimé pendant la relecture
+            with self._locked(shared=True):
+                for _, path in reversed(self.segments()):
+                    opener = gzip.open if path.endswith(".gz") else open
+                    with opener(path, "rt", encoding="utf-8") as f:
+                        segment = []
+                        for line in f:
+                            try:
+                                segment.append(json.loads(line))
+                            except ValueError:
+                                continue
+                    records = segment + records
+                    if len(records) >= limit:
+                        break
+
+        if not records and legacy_file and os.path.exists(legacy_file):
+            try:
+                with open(legacy_file, encoding="utf-8") as f:
+                    records = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Historique {legacy_file} illisible: {e}")
+        return records[-limit:] if limit else []
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "segment": self._index
+        }
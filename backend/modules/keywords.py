@@ -0,0 +1,108 @@
+"""
+Recherche multi-mots-clés en un seul passage (automate d'Aho-Corasick)
+Les listes de mots-clés sont compilées une fois; chaque texte est ensuite
+parcouru une seule fois quel que soit le nombre de mots-clés.
+
+L'automate est parcouru en Python (environ 15 Mo/s) alors que `in` recherche
+en C: en dessous de AUTOMATON_MIN_KEYWORDS mots-clés, une boucle `in` par
+mot-clé reste plus rapide (benchmarks/bench_dangerous_requests.py).
+"""
+
+# Seuil mesuré: à 114 mots-clés les boucles `in` font 39 Mo/s contre 17 pour
+# l'automate, à 314 les deux sont à 16 Mo/s
+AUTOMATON_MIN_KEYWORDS = 300
+
+
+class KeywordAutomaton:
+    """
+    Automate d'Aho-Corasick sur des mots-clés étiquetés
+
+    Args:
+        keywords: dict étiquette -> liste de mots-clés (sous-chaînes, comme `in`)
+
+    Les transitions sont complétées (liens d'échec résolus à la compilation):
+    le parcours fait une seule recherche de dict par caractère. tags() et
+    contains_any() ne parcourent l'automate qu'à partir de
+    AUTOMATON_MIN_KEYWORDS mots-clés (boucles `in` en dessous).
+    """
+
+    def __init__(self, keywords: dict):
+        goto = [{}]
+        outputs = [set()]
+
+        # Trie des mots-clés
+        for tag, words in keywords.items():
+            for word in words:
+                state = 0
+                for char in word:
+                    next_state = goto[state].get(char)
+                    if next_state is None:
+                        goto.append({})
+                        outputs.append(set())
+                        next_state = len(goto) - 1
+                        goto[state][char] = next_state
+                    state = next_state
+                outputs[state].add((word, tag))
+
+        # Liens d'échec en largeur, puis transitions complètes
+        fail = [0] * len(goto)
+        order = list(goto[0].values())
+        transitions = [dict(goto[0])] + [None] * (len(goto) - 1)
+        index = 0
+        while index < len(order):
+            state = order[index]
+            index += 1
+            for char, next_state in goto[state].items():
+                order.append(next_state)
+                # Etat d'échec: transition depuis l'état d'échec du parent
+                fail[next_state] = transitions[fail[state]].get(char, 0)
+                outputs[next_state] |= outputs[fail[next_state]]
+            table = dict(transitions[fail[state]])
+            table.update(goto[state])
+            transitions[state] = table
+
+        self._transitions = transitions
+        # Seuls les états terminaux portent une sortie (tuple vide sinon)
+        self._outputs = [tuple(output) for output in outputs]
+        self.size = sum(len(words) for words in keywords.values())
+        self.uses_automaton = self.size >= AUTOMATON_MIN_KEYWORDS
+        self._keywords = {tag: tuple(words) for tag, words in keywords.items()}
+
+    def find_all(self, text: str) -> list:
+        """Toutes les occurrences (position de début, mot-clé, étiquette), chevauchements compris"""
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        found = []
+        for end, char in enumerate(text, 1):
+            state = transitions[state].get(char, 0)
+            for word, tag in outputs[state]:
+                found.append((end - len(word), word, tag))
+        return found
+
+    def tags(self, text: str) -> set:
+        """Etiquettes dont au moins un mot-clé apparaît dans le texte"""
+        if not self.uses_automaton:
+            return {tag for tag, words in self._keywords.items() if any(word in text for word in words)}
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        found = set()
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(tag for _, tag in outputs[state])
+        return found
+
+    def contains_any(self, text: str) -> bool:
+        """Vrai dès qu'un mot-clé est trouvé (arrêt au premier)"""
+        if not self.uses_automaton:
+            return any(word in text for words in self._keywords.values() for word in words)
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                return True
+        return False
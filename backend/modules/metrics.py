@@ -0,0 +1,112 @@
+"""
+Mesures de latence du moteur de règles (par règle et par provider)
+
+Chaque évaluation d'une règle sur un fichier (ou un morceau en cache
+incrémental) ajoute une observation: durée, blocs évalués, violations.
+Les durées sont rangées dans un histogramme à seaux fixes (mémoire
+constante), d'où les quantiles approchés exposés par /api/metrics.
+Les évaluations faites dans un pool de processus ne sont pas comptées.
+"""
+import os
+import threading
+
+# RULE_METRICS=0 désactive la mesure
+RULE_METRICS_ENABLED = os.getenv("RULE_METRICS", "1") != "0"
+
+# Bornes supérieures des seaux, en millisecondes (le dernier seau est ouvert)
+BUCKET_BOUNDS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class LatencyHistogram:
+    """Histogramme de durées à seaux fixes, avec total, maximum et compteurs"""
+
+    __slots__ = ("buckets", "count", "total", "max", "blocks", "violations")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.blocks = 0
+        self.violations = 0
+
+    def observe(self, elapsed_ms: float, blocks: int = 0, violations: int = 0):
+        index = 0
+        while index < len(BUCKET_BOUNDS_MS) and elapsed_ms > BUCKET_BOUNDS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += elapsed_ms
+        if elapsed_ms > self.max:
+            self.max = elapsed_ms
+        self.blocks += blocks
+        self.violations += violations
+
+    def quantile(self, q: float) -> float:
+        """Borne supérieure du seau contenant le quantile q (maximum observé pour le dernier seau)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        labels = [str(bound) for bound in BUCKET_BOUNDS_MS] + ["+Inf"]
+        return {
+            "count": self.count,
+            "blocks": self.blocks,
+            "violations": self.violations,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 4) if self.count else 0.0,
+            "max_ms": round(self.max, 4),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets_ms": {label: count for label, count in zip(labels, self.buckets) if count}
+        }
+
+
+class RuleMetrics:
+    """Histogrammes par (règle, provider), partagés entre les threads du serveur"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, rule: str, provider: str, elapsed_seconds: float, blocks: int = 0, violations: int = 0):
+        with self._lock:
+            histogram = self._histograms.get((rule, provider))
+            if histogram is None:
+                histogram = self._histograms[(rule, provider)] = LatencyHistogram()
+            histogram.observe(elapsed_seconds * 1000, blocks, violations)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def stats(self, top: int = 5) -> dict:
+        """
+        {"rules": {règle: {provider: histogramme}}, "slowest": les `top`
+        couples (règle, provider) au temps cumulé le plus élevé}
+        """
+        with self._lock:
+            snapshots = {key: histogram.snapshot() for key, histogram in self._histograms.items()}
+        rules = {}
+        for (rule, provider), snapshot in sorted(snapshots.items()):
+            rules.setdefault(rule, {})[provider] = snapshot
+        slowest = sorted(snapshots.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:top]
+        return {
+            "enabled": RULE_METRICS_ENABLED,
+            "rules": rules,
+            "slowest": [
+                {"rule": rule, "provider": provider, "total_ms": snapshot["total_ms"], "mean_ms": snapshot["mean_ms"]}
+                for (rule, provider), snapshot in slowest
+            ]
+        }
+
+
+rule_metrics = RuleMetrics()
@@ -1,13 +1,17 @@
 import os
+import copy
 import json
+import time
+import asyncio
 import logging
 import threading
 from typing import Optional
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from pydantic import BaseModel, Field, field_validator, ValidationError
+from pydantic import BaseModel, Field, field_validator, model_validator, ValidationError
 from contextlib import contextmanager
+from modules.cache import LRUCache
 
 load_dotenv()
 
@@ -23,7 +27,10 @@ if AI_MODE == "real":
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY manquante dans .env")
-    client = genai.Client(api_key=api_key)
+    # GEMINI_BASE_URL: autre point d'accès (proxy, faux serveur des tests de charge)
+    base_url = os.getenv("GEMINI_BASE_URL")
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    client = genai.Client(api_key=api_key, http_options=http_options)
 elif AI_MODE == "mock":
     logger.info("Mode MOCK activé - utilisation de données fictives")
 
@@ -166,6 +173,35 @@ class InfrastructureSchema(BaseModel):
         }
 
 
+# Mode grande echelle (opt-in) : limites relevees, configurables par variables d'environnement
+LARGE_SCALE_LIMITS = {
+    "servers": int(os.getenv("LARGE_SCALE_MAX_SERVERS", "10000")),
+    "databases": int(os.getenv("LARGE_SCALE_MAX_DATABASES", "1000")),
+    "load_balancers": int(os.getenv("LARGE_SCALE_MAX_LOAD_BALANCERS", "100")),
+}
+
+
+class LargeScaleProviderConfig(ProviderConfig):
+    """Configuration provider en mode grande echelle (limites de LARGE_SCALE_LIMITS)"""
+    servers: int = Field(ge=0, default=0, description="Nombre de serveurs")
+    databases: int = Field(ge=0, default=0, description="Nombre de bases de données")
+    load_balancers: int = Field(ge=0, default=0, description="Nombre de load balancers")
+    
+    @model_validator(mode='after')
+    def validate_large_scale_limits(self):
+        for field, limit in LARGE_SCALE_LIMITS.items():
+            if getattr(self, field) > limit:
+                raise ValueError(
+                    f"Limite grande échelle dépassée : maximum {limit} {field} par provider"
+                )
+        return self
+
+
+class LargeScaleInfrastructureSchema(BaseModel):
+    """Schéma d'infrastructure en mode grande échelle"""
+    providers: list[LargeScaleProviderConfig] = Field(..., min_length=1, description="Liste des configurations par provider")
+
+
 # Timeout context manager (compatible multiplateforme)
 class TimeoutError(Exception):
     """Exception levée lors d'un timeout"""
@@ -261,13 +297,58 @@ def mock_extract_infrastructure(description: str) -> dict:
     }
 
 
-def extract_infrastructure(description: str) -> dict:
+# Modèle et délai maximal des appels Gemini
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_TIMEOUT = 30
+
+
+# Extractions validées, par description (aux espaces près) et mode: une
+# description déjà vue ne rappelle pas le modèle. Les replis sur le mock
+# (Gemini en erreur) ne sont pas gardés.
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "1024"))
+extraction_cache = LRUCache(EXTRACTION_CACHE_SIZE)
+
+
+def _extraction_key(description: str, large_scale: bool) -> tuple:
+    return " ".join(description.split()), bool(large_scale)
+
+
+def is_extraction_cached(description: str, large_scale: bool = False) -> bool:
+    """Vrai si l'extraction de cette description est en cache (sans compter de succès ni d'échec)"""
+    return _extraction_key(description, large_scale) in extraction_cache
+
+
+def _cached_extraction(key: tuple, usage: dict) -> Optional[dict]:
+    cached = extraction_cache.get(key)
+    if cached is None:
+        return None
+    usage.update(source="cache", tokens=0)
+    return copy.deepcopy(cached)
+
+
+def _store_extraction(key: tuple, result: dict, usage: dict, started: float):
+    if usage.get("source") != "fallback":
+        extraction_cache.put(key, copy.deepcopy(result), time.perf_counter() - started)
+
+
+def _token_count(response) -> int:
+    """Tokens facturés pour un appel Gemini (0 si la réponse ne les indique pas)"""
+    metadata = getattr(response, "usage_metadata", None)
+    return getattr(metadata, "total_token_count", None) or 0
+
+
+def extract_infrastructure(description: str, large_scale: bool = False, usage: dict = None) -> dict:
     """
     Phrase utilisateur -> JSON structure via Gemini (ou mock)
     Retourne un dictionnaire validé avec liste de providers
     
     Args:
         description: Description de l'infrastructure en langage naturel
+        large_scale: Valide avec les limites grande échelle (LARGE_SCALE_LIMITS)
+            au lieu des limites pédagogiques
+        usage: Rempli avec le travail réellement fait, y compris en cas
+            d'erreur: source ("cache", "mock", "gemini" ou "fallback" si
+            Gemini a échoué) et tokens consommés
         
     Returns:
         dict: Structure d'infrastructure validée avec clé 'providers' (liste)
@@ -276,12 +357,27 @@ def extract_infrastructure(description: str) -> dict:
         ValueError: Si le JSON généré est invalide
         TimeoutError: Si l'appel Gemini dépasse le timeout
     """
+    usage = {} if usage is None else usage
+    key = _extraction_key(description, large_scale)
+    cached = _cached_extraction(key, usage)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    result = _extract_infrastructure(description, large_scale, usage)
+    _store_extraction(key, result, usage, started)
+    return result
+
+
+def _extract_infrastructure(description: str, large_scale: bool, usage: dict) -> dict:
+    schema = LargeScaleInfrastructureSchema if large_scale else InfrastructureSchema
+    
     # Mode mock pour développement
     if AI_MODE == "mock":
+        usage.update(source="mock", tokens=0)
         result = mock_extract_infrastructure(description)
         try:
             # Validation avec Pydantic
-            validated = InfrastructureSchema(**result)
+            validated = schema(**result)
             return validated.model_dump()
         except Exception as e:
             logger.error(f"Erreur validation mode mock: {e}")
@@ -290,40 +386,19 @@ def extract_infrastructure(description: str) -> dict:
     # Mode réel avec Gemini
     if not client:
         raise ValueError("Client Gemini non initialisé")
+    usage.update(source="gemini", tokens=0)
     
     try:
         # Timeout de 30 secondes
-        with timeout(30):
-            # Configure Gemini pour forcer le format JSON
-            config = types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=json_schema,
-                system_instruction=SYSTEM_INSTRUCTIONS,
-            )
-
+        with timeout(GEMINI_TIMEOUT):
             # Appel a Gemini
             response = client.models.generate_content(
-                model="gemini-2.5-flash",
+                model=GEMINI_MODEL,
                 contents=[description],
-                config=config,
+                config=_gemini_config(),
             )
-
-            # Extraction du JSON de la reponse Gemini
-            candidate = response.candidates[0]
-            
-            if not candidate.content or not candidate.content.parts:
-                raise ValueError("Reponse Gemini vide")
-
-            part = candidate.content.parts[0]
-
-            # Methode 1 : structured_data (objet Python direct)
-            if hasattr(part, "structured_data") and part.structured_data:
-                result = dict(part.structured_data)
-            # Methode 2 : text (string JSON a parser)
-            elif hasattr(part, "text") and part.text:
-                result = json.loads(part.text)
-            else:
-                raise ValueError("Reponse Gemini inexploitable")
+            usage["tokens"] = _token_count(response)
+            result = _parse_gemini_response(response)
         
     except TimeoutError:
         logger.error("Timeout lors de l'appel Gemini (30s)")
@@ -335,17 +410,108 @@ def extract_infrastructure(description: str) -> dict:
         logger.error(f"Erreur lors de l'appel Gemini: {repr(e)}")
         # Fallback vers mode mock en cas d'erreur
         logger.warning("Fallback vers mode mock")
+        usage["source"] = "fallback"
         result = mock_extract_infrastructure(description)
     
+    return _validate_extraction(result, schema, large_scale)
+
+
+async def extract_infrastructure_async(description: str, large_scale: bool = False, usage: dict = None) -> dict:
+    """
+    Variante asynchrone de extract_infrastructure() pour le service ASGI :
+    l'appel Gemini est attendu sans occuper de thread. Mêmes résultats,
+    même cache et mêmes erreurs.
+    """
+    if AI_MODE == "mock":
+        return extract_infrastructure(description, large_scale=large_scale, usage=usage)
+    
+    usage = {} if usage is None else usage
+    key = _extraction_key(description, large_scale)
+    cached = _cached_extraction(key, usage)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    result = await _extract_infrastructure_async(description, large_scale, usage)
+    _store_extraction(key, result, usage, started)
+    return result
+
+
+async def _extract_infrastructure_async(description: str, large_scale: bool, usage: dict) -> dict:
+    schema = LargeScaleInfrastructureSchema if large_scale else InfrastructureSchema
+    
+    if not client:
+        raise ValueError("Client Gemini non initialisé")
+    usage.update(source="gemini", tokens=0)
+    
+    try:
+        response = await asyncio.wait_for(
+            client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[description],
+                config=_gemini_config(),
+            ),
+            timeout=GEMINI_TIMEOUT
+        )
+        usage["tokens"] = _token_count(response)
+        result = _parse_gemini_response(response)
+    except asyncio.TimeoutError:
+        logger.error("Timeout lors de l'appel Gemini (30s)")
+        raise ValueError("Timeout: L'appel à l'IA a dépassé 30 secondes")
+    except json.JSONDecodeError as e:
+        logger.error(f"Erreur parsing JSON Gemini: {e}")
+        raise ValueError(f"JSON invalide retourné par Gemini: {str(e)}")
+    except Exception as e:
+        logger.error(f"Erreur lors de l'appel Gemini: {repr(e)}")
+        logger.warning("Fallback vers mode mock")
+        usage["source"] = "fallback"
+        result = mock_extract_infrastructure(description)
+    
+    return _validate_extraction(result, schema, large_scale)
+
+
+def _gemini_config() -> types.GenerateContentConfig:
+    """Configure Gemini pour forcer le format JSON"""
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=json_schema,
+        system_instruction=SYSTEM_INSTRUCTIONS,
+    )
+
+
+def _parse_gemini_response(response) -> dict:
+    """Extraction du JSON de la reponse Gemini"""
+    candidate = response.candidates[0]
+    
+    if not candidate.content or not candidate.content.parts:
+        raise ValueError("Reponse Gemini vide")
+
+    part = candidate.content.parts[0]
+
+    # Methode 1 : structured_data (objet Python direct)
+    if hasattr(part, "structured_data") and part.structured_data:
+        return dict(part.structured_data)
+    # Methode 2 : text (string JSON a parser)
+    if hasattr(part, "text") and part.text:
+        return json.loads(part.text)
+    raise ValueError("Reponse Gemini inexploitable")
+
+
+def _validate_extraction(result: dict, schema, large_scale: bool) -> dict:
+    """Validation Pydantic (messages pédagogiques) puis normalisation de chaque provider"""
     # Validation avec Pydantic
     try:
-        validated = InfrastructureSchema(**result)
+        validated = schema(**result)
         result = validated.model_dump()
     except ValidationError as e:
         # Detection des limites depassees
         error_str = str(e)
         
-        if "servers" in error_str and "less_than_equal" in error_str:
+        if large_scale and "Limite grande échelle" in error_str:
+            raise ValueError(next(
+                err["msg"].removeprefix("Value error, ") for err in e.errors()
+                if "Limite grande échelle" in err["msg"]
+            ))
+        elif "servers" in error_str and "less_than_equal" in error_str:
             raise ValueError(
                 "Limite pédagogique dépassée : maximum 50 serveurs par provider. "
                 "Pour des infrastructures plus grandes, utilisez des boucles Terraform "
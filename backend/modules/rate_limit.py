@@ -0,0 +1,285 @@
+"""
+Quota de génération par client: seau à jetons débité du coût réel
+
+Une requête est admise si le solde du client couvre son coût estimé
+(extractions hors cache). Son coût réel n'est connu qu'une fois le travail
+fait (extraction servie par le cache, extraction locale, appel Gemini et
+tokens consommés): il est débité après coup et le solde peut devenir
+négatif (tokens au-delà de l'estimation), ce qui bloque le client le temps
+que le seau se remplisse à nouveau (`refill_per_second` unités par seconde,
+jusqu'à `capacity`).
+
+Les soldes sont dans une base SQLite partagée par les workers d'un même
+hôte (SQLiteBucketStore) ou en mémoire, propres au processus
+(MemoryBucketStore). Un seau n'est stocké que par ses deux valeurs (solde,
+instant de la dernière mise à jour): le remplissage est calculé à la lecture.
+
+Les compteurs de flask-limiter (limites en requêtes des autres routes)
+peuvent aussi être partagés sans serveur externe: SQLiteLimitStorage
+enregistre le schéma sqlite:// auprès de limits
+(RATELIMIT_STORAGE_URI=sqlite:///logs/ratelimit.db).
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+# Débits entre deux purges des seaux pleins (clients inactifs)
+_PRUNE_EVERY = 1000
+
+
+def _refill(tokens: float, updated: float, capacity: float, rate: float, now: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Soldes en mémoire, propres au processus"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def balance(self, key: str, capacity: float, rate: float, now: float) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+        return capacity if bucket is None else _refill(*bucket, capacity, rate, now)
+
+    def charge(self, key: str, cost: float, capacity: float, rate: float, now: float) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = (capacity if bucket is None else _refill(*bucket, capacity, rate, now)) - cost
+            self._buckets[key] = (tokens, now)
+        return tokens
+
+    def prune(self, before: float):
+        """Oublie les seaux non débités depuis `before` (pleins à nouveau)"""
+        with self._lock:
+            for key in [key for key, (_, updated) in self._buckets.items() if updated < before]:
+                del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "clients": len(self._buckets)}
+
+
+class _SQLiteDatabase:
+    """Base SQLite (mode WAL) partagée par les workers, une connexion par thread"""
+
+    _SCHEMA = ()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connexion fermée aussitôt: rien n'est hérité par les workers forkés
+        connection = self._connect()
+        try:
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+
+class SQLiteBucketStore(_SQLiteDatabase):
+    """
+    Soldes dans une base SQLite (mode WAL) partagée par les workers
+
+    Un débit est une transaction BEGIN IMMEDIATE (lecture, remplissage,
+    écriture): deux workers ne peuvent pas dépenser le même solde.
+
+    Args:
+        path: Fichier de la base
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)",
+    )
+
+    def balance(self, key: str, capacity: float, rate: float, now: float) -> float:
+        row = self._connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        return capacity if row is None else _refill(*row, capacity, rate, now)
+
+    def charge(self, key: str, cost: float, capacity: float, rate: float, now: float) -> float:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = (capacity if row is None else _refill(*row, capacity, rate, now)) - cost
+            connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                               (key, tokens, now))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return tokens
+
+    def prune(self, before: float):
+        self._connection.execute("DELETE FROM buckets WHERE updated < ?", (before,))
+
+    def stats(self) -> dict:
+        clients = self._connection.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+        return {"backend": "sqlite", "clients": clients}
+
+
+class SQLiteLimitStorage(_SQLiteDatabase, Storage):
+    """
+    Stockage limits (compteurs à fenêtre fixe de flask-limiter) dans une base
+    SQLite partagée par les workers, sans serveur Redis ou Memcached
+
+    URI: sqlite:///chemin/relatif.db ou sqlite:////chemin/absolu.db
+    Un incrément est une transaction BEGIN IMMEDIATE: deux workers ne
+    peuvent pas compter la même requête deux fois ni en perdre une.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expiry REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS counters_expiry ON counters (expiry)",
+    )
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        Storage.__init__(self, uri, wrap_exceptions=wrap_exceptions, **options)
+        path = uri[len("sqlite://"):]
+        _SQLiteDatabase.__init__(self, path[1:] if path.startswith("/") else path)
+        self._increments = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT value, expiry FROM counters WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                # Nouvelle fenêtre
+                value, expires = amount, now + expiry
+            else:
+                value, expires = row[0] + amount, row[1]
+            connection.execute("INSERT OR REPLACE INTO counters (key, value, expiry) VALUES (?, ?, ?)",
+                               (key, value, expires))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._increments += 1
+        if self._increments % _PRUNE_EVERY == 0:
+            connection.execute("DELETE FROM counters WHERE expiry <= ?", (now,))
+        return value
+
+    def get(self, key: str) -> int:
+        row = self._connection.execute(
+            "SELECT value FROM counters WHERE key = ? AND expiry > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connection.execute(
+            "SELECT expiry FROM counters WHERE key = ? AND expiry > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._connection.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def reset(self) -> int:
+        return self._connection.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str):
+        self._connection.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        counters = self._connection.execute("SELECT COUNT(*) FROM counters").fetchone()[0]
+        return {"backend": "sqlite", "counters": counters}
+
+
+class TokenBucketLimiter:
+    """
+    Seau à jetons par client, débité après coup du coût réel des requêtes
+
+    Args:
+        capacity: Solde maximal (rafale autorisée), en unités de coût
+        refill_per_second: Unités regagnées par seconde
+        store: MemoryBucketStore ou SQLiteBucketStore
+        clock: Horloge murale (secondes), commune aux workers; remplaçable dans les tests
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, store, clock=time.time):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.store = store
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.charges = 0
+        self.charged = 0.0
+
+    def retry_after(self, key: str, cost: float = 0.0) -> int:
+        """
+        0 si le solde du client est positif et couvre `cost` (coût estimé de la
+        requête, borné à capacity), sinon secondes avant qu'il le couvre
+        """
+        needed = min(cost, self.capacity)
+        tokens = self.store.balance(key, self.capacity, self.refill_per_second, self.clock())
+        with self._lock:
+            if tokens > 0 and tokens >= needed:
+                self.admitted += 1
+                return 0
+            self.rejected += 1
+        if self.refill_per_second <= 0:
+            return 3600
+        return max(1, math.ceil((max(needed, 0.0) - tokens) / self.refill_per_second))
+
+    def charge(self, key: str, cost: float) -> float:
+        """Débite le coût d'une requête terminée; retourne le nouveau solde (éventuellement négatif)"""
+        if cost <= 0:
+            return self.store.balance(key, self.capacity, self.refill_per_second, self.clock())
+        now = self.clock()
+        tokens = self.store.charge(key, cost, self.capacity, self.refill_per_second, now)
+        with self._lock:
+            self.charges += 1
+            self.charged += cost
+            prune = self.charges % _PRUNE_EVERY == 0
+        if prune and self.refill_per_second > 0:
+            # Un seau non débité depuis capacity / refill secondes est plein: inutile de le garder
+            self.store.prune(now - self.capacity / self.refill_per_second)
+        return tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "refill_per_second": self.refill_per_second,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "charges": self.charges,
+                "charged": round(self.charged, 3),
+                "store": self.store.stats()
+            }
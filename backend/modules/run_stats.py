@@ -0,0 +1,195 @@
+"""
+Agrégats des runs maintenus au fil de l'eau pour /api/stats
+
+log_run() met à jour des compteurs (providers, statuts), la somme des scores
+et, par étape (extraction, génération, validation), un résumé de quantiles
+à seaux logarithmiques: erreur relative bornée, mémoire bornée, fusionnable.
+Les agrégats existent pour tout le processus et par tranche de temps
+(minute par défaut, dernière heure conservée): une requête de stats
+fusionne au plus quelques dizaines de tranches, quelle que soit la taille
+de l'historique.
+"""
+import math
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+STAGES = ("extraction", "generation", "validation", "total")
+
+
+class QuantileSketch:
+    """
+    Résumé de quantiles à seaux logarithmiques: chaque valeur x > 0 tombe dans
+    le seau ceil(log_gamma(x)); le quantile renvoyé est à `relative_accuracy`
+    près de la vraie valeur
+    """
+
+    __slots__ = ("gamma", "log_gamma", "buckets", "count", "total", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float):
+        # Valeurs nulles (horloge) ramenées à 1 ns pour rester dans le domaine du log
+        key = math.ceil(math.log(max(value, 1e-6)) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "QuantileSketch"):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Milieu (relatif) du seau, borné par les extrêmes observés
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max, 3)
+        }
+
+
+class RunAggregate:
+    """Compteurs, somme des scores et résumés de latence d'un ensemble de runs"""
+
+    __slots__ = ("runs", "providers", "security_status", "terraform_status", "score_total", "stages")
+
+    def __init__(self):
+        self.runs = 0
+        self.providers = Counter()
+        self.security_status = Counter()
+        self.terraform_status = Counter()
+        self.score_total = 0
+        self.stages = {}
+
+    def add(self, providers: list, security_status: str, terraform_status: str, score: int, timings: dict):
+        self.runs += 1
+        self.providers.update(providers)
+        self.security_status[security_status] += 1
+        self.terraform_status[terraform_status] += 1
+        self.score_total += score
+        for stage, elapsed_ms in timings.items():
+            sketch = self.stages.get(stage)
+            if sketch is None:
+                sketch = self.stages[stage] = QuantileSketch()
+            sketch.add(elapsed_ms)
+
+    def merge(self, other: "RunAggregate"):
+        self.runs += other.runs
+        self.providers.update(other.providers)
+        self.security_status.update(other.security_status)
+        self.terraform_status.update(other.terraform_status)
+        self.score_total += other.score_total
+        for stage, sketch in other.stages.items():
+            if stage not in self.stages:
+                self.stages[stage] = QuantileSketch()
+            self.stages[stage].merge(sketch)
+
+    def snapshot(self) -> dict:
+        blocked = self.terraform_status.get("BLOCKED", 0)
+        return {
+            "runs": self.runs,
+            "providers": dict(self.providers),
+            "security_status": dict(self.security_status),
+            "terraform_status": dict(self.terraform_status),
+            "block_rate": round(blocked / self.runs, 4) if self.runs else 0.0,
+            "security_score_mean": round(self.score_total / self.runs, 2) if self.runs else 0.0,
+            "stages": {stage: self.stages[stage].snapshot() for stage in STAGES if stage in self.stages}
+        }
+
+
+class RunStats:
+    """
+    Agrégats depuis le démarrage et par tranche de `bucket_seconds`
+    (les `buckets` dernières tranches conservées), thread-safe
+
+    Args:
+        bucket_seconds: Durée d'une tranche
+        buckets: Tranches conservées (fenêtre maximale = bucket_seconds * buckets)
+        clock: Horloge (secondes), remplaçable dans les tests
+    """
+
+    def __init__(self, bucket_seconds: int = 60, buckets: int = 60, clock=time.time):
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.started = datetime.now().isoformat()
+        self._total = RunAggregate()
+        self._buckets = deque(maxlen=buckets)
+        self._lock = threading.Lock()
+
+    @property
+    def max_window(self) -> int:
+        return self.bucket_seconds * self._buckets.maxlen
+
+    def record(self, providers: list, security_status: str, terraform_status: str, score: int,
+               timings: dict = None):
+        """Ajoute un run (timings: étape -> durée en ms)"""
+        timings = timings or {}
+        bucket = int(self.clock() // self.bucket_seconds)
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] != bucket:
+                self._buckets.append((bucket, RunAggregate()))
+            for aggregate in (self._total, self._buckets[-1][1]):
+                aggregate.add(providers, security_status, terraform_status, score, timings)
+
+    def snapshot(self, window_seconds: int = None) -> dict:
+        """Agrégats depuis le démarrage, ou sur les dernières `window_seconds` (arrondies à la tranche)"""
+        if window_seconds is None:
+            with self._lock:
+                return dict(self._total.snapshot(), since=self.started)
+
+        tranches = max(1, min(math.ceil(window_seconds / self.bucket_seconds), self._buckets.maxlen))
+        oldest = int(self.clock() // self.bucket_seconds) - tranches + 1
+        merged = RunAggregate()
+        with self._lock:
+            for bucket, aggregate in reversed(self._buckets):
+                if bucket < oldest:
+                    break
+                merged.merge(aggregate)
+        return dict(merged.snapshot(), window_seconds=tranches * self.bucket_seconds)
+
+    def timeline(self, window_seconds: int) -> list:
+        """Runs et runs bloqués par tranche sur la fenêtre (tranches vides incluses)"""
+        tranches = max(1, min(math.ceil(window_seconds / self.bucket_seconds), self._buckets.maxlen))
+        current = int(self.clock() // self.bucket_seconds)
+        with self._lock:
+            counts = {
+                bucket: (aggregate.runs, aggregate.terraform_status.get("BLOCKED", 0))
+                for bucket, aggregate in self._buckets
+            }
+        return [
+            {
+                "start": datetime.fromtimestamp(bucket * self.bucket_seconds).isoformat(),
+                "runs": counts.get(bucket, (0, 0))[0],
+                "blocked": counts.get(bucket, (0, 0))[1]
+            }
+            for bucket in range(current - tranches + 1, current + 1)
+        ]
@@ -1,69 +1,99 @@
-from .security_rules import check_terraform_security
+import copy
+import hashlib
+import logging
+import os
+
+from .cache import LRUCache
+from .compliance import compliance_table
+from .keywords import KeywordAutomaton
+from .security_rules import (
+    BLOCKING_SCORE, check_terraform_security_sections, check_terraform_security_stream, policy_fingerprint,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cache des rapports de securite: la generation etant deterministe, le meme
+# Terraform revient pour les memes configurations
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "256"))
+verdict_cache = LRUCache(VERDICT_CACHE_SIZE)
+_cached_policy_fingerprint = None
+
+
+# Categories de demandes dangereuses (donnees, pas de code)
+# triggers: groupes de mots-cles; la categorie est detectee si chaque groupe
+# a au moins un mot-cle present dans la description (en minuscules)
+# Ajouter une categorie ou un synonyme FR/EN = ajouter une entree ici
+DANGEROUS_REQUEST_CATEGORIES = {
+    "public_database": {
+        "triggers": [
+            ["publique", "public", "accessible internet"],
+            ["database", "db", "base", "mysql", "postgresql"]
+        ],
+        "requested": "Base de donnees publique",
+        "applied": "Base de donnees PRIVEE (politique de securite)",
+        "reason": "Les bases de donnees ne doivent jamais etre accessibles depuis Internet"
+    },
+    "no_encryption": {
+        "triggers": [
+            ["sans chiffrement", "non chiffre", "unencrypted"]
+        ],
+        "requested": "Donnees non chiffrees",
+        "applied": "Chiffrement ACTIVE (politique de securite)",
+        "reason": "Le chiffrement est obligatoire pour proteger les donnees sensibles"
+    },
+    "open_ssh": {
+        "triggers": [
+            ["ssh 0.0.0.0", "ssh public", "ssh ouvert"]
+        ],
+        "requested": "SSH ouvert a tous",
+        "applied": "SSH RESTREINT (politique de securite)",
+        "reason": "SSH ne doit etre accessible que depuis des IPs specifiques"
+    }
+}
+
+
+def _compile_categories(categories: dict) -> KeywordAutomaton:
+    # Une etiquette par groupe: (categorie, indice du groupe)
+    return KeywordAutomaton({
+        (category_id, index): group
+        for category_id, category in categories.items()
+        for index, group in enumerate(category["triggers"])
+    })
+
+
+_DANGEROUS_MATCHER = _compile_categories(DANGEROUS_REQUEST_CATEGORIES)
 
 
 def detect_dangerous_requests(description: str) -> list:
     """
     Detecte si l'utilisateur demande quelque chose qui viole les regles de securite
     Retourne une liste de demandes dangereuses detectees
+
+    Un seul passage sur la description, quel que soit le nombre de mots-cles
     """
+    found = _DANGEROUS_MATCHER.tags(description.lower())
+    if not found:
+        return []
+
     warnings = []
-    d = description.lower()
-    
-    # Detection : DB publique
-    if any(keyword in d for keyword in ["publique", "public", "accessible internet"]):
-        if any(db in d for db in ["database", "db", "base", "mysql", "postgresql"]):
+    for category_id, category in DANGEROUS_REQUEST_CATEGORIES.items():
+        if all((category_id, index) in found for index in range(len(category["triggers"]))):
             warnings.append({
-                "requested": "Base de donnees publique",
-                "applied": "Base de donnees PRIVEE (politique de securite)",
-                "reason": "Les bases de donnees ne doivent jamais etre accessibles depuis Internet"
+                "requested": category["requested"],
+                "applied": category["applied"],
+                "reason": category["reason"]
             })
-    
-    # Detection : Pas de chiffrement
-    if any(keyword in d for keyword in ["sans chiffrement", "non chiffre", "unencrypted"]):
-        warnings.append({
-            "requested": "Donnees non chiffrees",
-            "applied": "Chiffrement ACTIVE (politique de securite)",
-            "reason": "Le chiffrement est obligatoire pour proteger les donnees sensibles"
-        })
-    
-    # Detection : SSH ouvert a tous
-    if any(keyword in d for keyword in ["ssh 0.0.0.0", "ssh public", "ssh ouvert"]):
-        warnings.append({
-            "requested": "SSH ouvert a tous",
-            "applied": "SSH RESTREINT (politique de securite)",
-            "reason": "SSH ne doit etre accessible que depuis des IPs specifiques"
-        })
-    
+
     return warnings
 
 
-def validate_infrastructure(description: str, terraform_code: str) -> dict:
+def _decide(dangerous_requests: list, security_report: dict) -> dict:
     """
-    Validation complete : detection proactive + verification code genere
-    Retourne un verdict binaire (OK/NOT_OK) avec details
+    Decision binaire
+    Blocage si :
+    - Demandes dangereuses detectees OU
+    - Score de securite < 70
     """
-    # Etape 1 : Detection proactive des demandes dangereuses
-    dangerous_requests = detect_dangerous_requests(description)
-    
-    # Etape 2 : Verification du code Terraform genere
-    # Détecte le provider depuis le code Terraform
-    provider = None
-    terraform_lower = terraform_code.lower()
-    if 'provider "aws"' in terraform_lower or 'hashicorp/aws' in terraform_lower:
-        provider = "aws"
-    elif 'provider "azurerm"' in terraform_lower or 'hashicorp/azurerm' in terraform_lower:
-        provider = "azure"
-    elif 'provider "google"' in terraform_lower or 'hashicorp/google' in terraform_lower:
-        provider = "gcp"
-    elif 'provider "openstack"' in terraform_lower:
-        provider = "openstack"
-    
-    security_report = check_terraform_security(terraform_code, provider)
-    
-    # Etape 3 : Decision binaire
-    # Blocage si :
-    # - Demandes dangereuses detectees OU
-    # - Score de securite < 70
     if dangerous_requests:
         return {
             "status": "NOT_OK",
@@ -71,14 +101,98 @@ def validate_infrastructure(description: str, terraform_code: str) -> dict:
         }
 
     # Sinon, verifier le score du code genere
-    if security_report['security_score'] < 70:
-        return {
+    if security_report['security_score'] < BLOCKING_SCORE:
+        verdict = {
             "status": "NOT_OK",
             "violations": security_report.get('violations', [])
         }
+        if security_report.get("complete") is False:
+            # Mode fail-fast : violations constatees avant l'arret
+            verdict["complete"] = False
+    else:
+        verdict = {
+            "status": "OK",
+            "score": security_report['security_score'],
+            "grade": security_report['security_grade']
+        }
+
+    # Multi-cloud : detail par provider
+    by_provider = security_report.get("by_provider", {})
+    if len(by_provider) > 1:
+        verdict["by_provider"] = by_provider
+
+    return verdict
+
+
+def _complete(report: dict) -> bool:
+    return report.get("complete") is not False
+
+
+def _security_report(terraform_code: str, fail_fast: bool = False) -> dict:
+    """
+    Rapport de securite du code, en cache par empreinte du contenu et de
+    l'ensemble de politiques (une recherche par appel, copie du rapport en cache)
+    Un rapport fail-fast (partiel) ne sert que les demandes fail-fast; un
+    rapport complet les sert toutes et remplace le rapport partiel
+    """
+    global _cached_policy_fingerprint
+
+    fingerprint = policy_fingerprint()
+    if fingerprint != _cached_policy_fingerprint:
+        # Politiques modifiees : les verdicts en cache ne sont plus valides
+        if _cached_policy_fingerprint is not None:
+            logger.info("Politiques de securite modifiees, cache des verdicts vide")
+        verdict_cache.clear()
+        _cached_policy_fingerprint = fingerprint
+
+    key = (hashlib.sha256(terraform_code.encode("utf-8")).hexdigest(), fingerprint)
+    report = verdict_cache.get_or_compute(
+        key,
+        lambda: check_terraform_security_sections(terraform_code, fail_fast=fail_fast),
+        accept=None if fail_fast else _complete
+    )
+    # Le rapport en cache reste intact quoi que fasse l'appelant de sa copie
+    return copy.deepcopy(report)
+
+
+def validate_infrastructure(description: str, terraform_code: str, infra: dict = None,
+                            fail_fast: bool = False) -> dict:
+    """
+    Validation complete : detection proactive + verification code genere
+    Retourne un verdict binaire (OK/NOT_OK) avec details
+
+    infra : JSON dont terraform_code est la sortie du generateur ; le rapport
+    vient alors de la table de conformite (sans analyse du texte)
+    fail_fast : l'analyse s'arrete des que le verdict NOT_OK est acquis
+    (meme verdict, liste de violations partielle) ; par defaut rapport detaille
+    """
+    # Etape 1 : Detection proactive des demandes dangereuses
+    dangerous_requests = detect_dangerous_requests(description)
+    if dangerous_requests:
+        # Verdict deja decide : le rapport du code ne changerait rien
+        return _decide(dangerous_requests, None)
+    
+    # Etape 2 : Verification du code Terraform genere
+    # Sortie du generateur : recherche dans la table de conformite. Sinon
+    # chaque section provider est verifiee avec ses propres regles (en
+    # parallele); un Terraform deja verifie est servi depuis le cache
+    security_report = compliance_table.report(infra) if infra is not None else None
+    if security_report is None:
+        security_report = _security_report(terraform_code, fail_fast)
     
-    return {
-        "status": "OK",
-        "score": security_report['security_score'],
-        "grade": security_report['security_grade']
-    }
\ No newline at end of file
+    # Etape 3 : Decision binaire
+    return _decide(dangerous_requests, security_report)
+
+
+def validate_infrastructure_stream(description: str, terraform_chunks, infra: dict = None) -> dict:
+    """
+    Comme validate_infrastructure(), mais sur un flux de morceaux Terraform
+    (mode grande echelle): le fichier complet n'est jamais construit
+    """
+    dangerous_requests = detect_dangerous_requests(description)
+    if dangerous_requests:
+        return _decide(dangerous_requests, None)
+    security_report = compliance_table.report(infra) if infra is not None else None
+    if security_report is None:
+        security_report = check_terraform_security_stream(terraform_chunks)
+    return _decide(dangerous_requests, security_report)
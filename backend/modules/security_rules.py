@@ -1,13 +1,31 @@
 """
 BIBLIOTHÈQUE DE GÉNÉRATION DE POLITIQUES DE SÉCURITÉ
 6 règles essentielles pour le MVP
+
+Audit de fichiers Terraform existants (NDJSON):
+    python -m modules.security_rules audit <chemin>
 """
 
+import copy
+import hashlib
+import os
 import re
 import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from .cache import LRUCache
+from .keywords import KeywordAutomaton
+from .metrics import RULE_METRICS_ENABLED, rule_metrics
 
 logger = logging.getLogger(__name__)
 
+# Score en dessous duquel une infrastructure est bloquée
+BLOCKING_SCORE = 70
+
 # ============================================
 # POLITIQUES DE SÉCURITÉ (6 règles MVP)
 # ============================================
@@ -23,8 +41,7 @@ SECURITY_POLICIES = {
             "azure": {"public_network_access_enabled": False},
             "gcp": {"ipv4_enabled": False},
             "openstack": {"public": False}
-        },
-        "check": lambda code, provider=None: _check_db_no_public_ip(code, provider)
+        }
     },
     
     "encryption_at_rest": {
@@ -37,8 +54,7 @@ SECURITY_POLICIES = {
             "azure": {"infrastructure_encryption_enabled": True},
             "gcp": {"disk_encryption_key": "customer-managed"},
             "openstack": {"encrypted": True}
-        },
-        "check": lambda code, provider=None: _check_encryption_at_rest(code, provider)
+        }
     },
     
     "ssl_required": {
@@ -49,10 +65,8 @@ SECURITY_POLICIES = {
         "terraform_settings": {
             "aws": {"require_ssl": True},
             "azure": {"ssl_enforcement_enabled": True, "ssl_minimal_tls_version_enforced": "TLS1_2"},
-            "gcp": {"require_ssl": True},
-            "openstack": {"ssl_required": True}
-        },
-        "check": lambda code, provider=None: _check_ssl_required(code, provider)
+            "gcp": {"require_ssl": True}
+        }
     },
     
     "monitoring_enabled": {
@@ -63,10 +77,8 @@ SECURITY_POLICIES = {
         "terraform_settings": {
             "aws": {"monitoring": True, "enabled_cloudwatch_logs_exports": ["error", "general", "slowquery"]},
             "azure": {"insights_enabled": True},
-            "gcp": {"query_insights_enabled": True},
-            "openstack": {"logging_enabled": True}
-        },
-        "check": lambda code, provider=None: _check_monitoring_enabled(code, provider)
+            "gcp": {"query_insights_enabled": True}
+        }
     },
     
     "backup_enabled": {
@@ -77,10 +89,8 @@ SECURITY_POLICIES = {
         "terraform_settings": {
             "aws": {"backup_retention_period": 7},
             "azure": {"backup_retention_days": 7},
-            "gcp": {"backup_enabled": True, "backup_start_time": "03:00"},
-            "openstack": {"backup_enabled": True}
-        },
-        "check": lambda code, provider=None: "backup" in code.lower()
+            "gcp": {"backup_enabled": True, "backup_start_time": "03:00"}
+        }
     },
     
     "no_hardcoded_credentials": {
@@ -90,150 +100,607 @@ SECURITY_POLICIES = {
         "category": "Identity & Access",
         "terraform_settings": {
             "description": "Utiliser des variables sensibles"
-        },
-        "check": lambda code, provider=None: not any(
-            pattern in code
-            for pattern in ['password = "', 'secret = "', 'api_key = "']
-        )
+        }
     }
 }
 
 # ============================================
-# FONCTIONS DE VÉRIFICATION PAR PROVIDER
+# REGISTRE DES RÈGLES
+# ============================================
+
+# Pénalité de score par sévérité
+SEVERITY_PENALTIES = {"CRITICAL": 30, "HIGH": 20, "MEDIUM": 10}
+
+# Cibles d'une règle (en plus d'un tuple de types ou d'un prédicat sur le type)
+ANY_RESOURCE = "resource"   # toutes les ressources
+ANY_BLOCK = "*"             # tous les blocs (resource, variable, provider, ...)
+
+# policy_id -> {"check", "applies_to", "cost"}
+RULE_REGISTRY = {}
+
+
+def register_rule(policy_id: str, applies_to: dict, cost: int = 1):
+    """
+    Décorateur: enregistre la vérification par bloc d'une politique de
+    SECURITY_POLICIES. La fonction reçoit (bloc, provider) et retourne True
+    (conforme), False (violation) ou None (non applicable).
+
+    Args:
+        policy_id: Clé de la politique dans SECURITY_POLICIES
+        applies_to: provider -> cible (tuple de types, prédicat sur le type,
+            ANY_RESOURCE ou ANY_BLOCK); "*" pour tout autre provider. Un
+            provider sans cible: règle jamais applicable, ignorée par le plan
+        cost: Coût relatif par bloc (ordre d'évaluation du mode fail-fast)
+    """
+    def decorator(check):
+        RULE_REGISTRY[policy_id] = {"check": check, "applies_to": applies_to, "cost": cost}
+        return check
+    return decorator
+
+# ============================================
+# INDEX DES RESSOURCES (parseur HCL léger)
+# ============================================
+
+# Motifs de détection, dans l'ordre de priorité (premier trouvé = provider principal)
+_PROVIDER_PATTERNS = (
+    ("aws", ('provider "aws"', "hashicorp/aws")),
+    ("azure", ('provider "azurerm"', "hashicorp/azurerm")),
+    ("gcp", ('provider "google"', "hashicorp/google")),
+    ("openstack", ('provider "openstack"',)),
+)
+
+_DB_KEYWORDS = ("db_instance", "mysql_server", "postgresql_server", "mariadb_server", "sql_database_instance")
+_DB_TYPE_MATCHER = KeywordAutomaton({"database": _DB_KEYWORDS})
+
+_COMPUTE_TYPES = (
+    "aws_instance", "azurerm_linux_virtual_machine", "azurerm_windows_virtual_machine",
+    "google_compute_instance", "openstack_compute_instance_v2",
+)
+
+_AZURE_DB_TYPES = ("azurerm_mysql_server", "azurerm_postgresql_server", "azurerm_mariadb_server")
+
+# Bases AWS (instance RDS, cluster DocumentDB) et leurs groupes de paramètres:
+# type de la base -> (attribut de référence, type du groupe)
+_AWS_DB_TYPES = ("aws_db_instance", "aws_docdb_cluster")
+_AWS_PARAMETER_GROUPS = {
+    "aws_db_instance": ("parameter_group_name", "aws_db_parameter_group"),
+    "aws_docdb_cluster": ("db_cluster_parameter_group_name", "aws_docdb_cluster_parameter_group"),
+}
+_AWS_PARAMETER_GROUP_TYPES = tuple(group for _, group in _AWS_PARAMETER_GROUPS.values())
+
+# Paramètres imposant SSL/TLS aux connexions et valeurs qui l'imposent
+_TLS_PARAMETERS = {
+    "require_secure_transport": ("on", "1", "true"),   # MySQL, MariaDB
+    "rds.force_ssl": ("1",),                           # PostgreSQL
+    "tls": ("enabled",),                               # DocumentDB
+}
+
+_CREDENTIAL_ATTRIBUTES = ("password", "secret", "api_key", "administrator_login_password")
+
+# `kind "label" "label" {reste` (en-tête de bloc) et `nom = valeur`
+_BLOCK_RE = re.compile(r'([\w-]+)((?:[ \t]+(?:"[^"]*"|[\w-]+))*)[ \t]*\{(.*)$')
+_ATTRIBUTE_RE = re.compile(r'([\w-]+)[ \t]*=[ \t]*(.*)$')
+_INLINE_ATTRIBUTE_RE = re.compile(r'([\w-]+)[ \t]*=[ \t]*("[^"]*"|[^\s,}]+)')
+_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"')
+# Blocs `parameter { name = ... value = ... }` d'un groupe de paramètres
+_PARAMETER_BLOCK_RE = re.compile(r'\bparameter\s*\{([^{}]*)\}')
+_PARAMETER_FIELD_RE = re.compile(r'\b(name|value)\s*=\s*"([^"]*)"')
+
+
+class HclBlock:
+    """
+    Bloc de premier niveau (resource, provider, variable, ...)
+    Les attributs des blocs imbriqués sont aplatis avec un chemin pointé
+    (root_block_device.encrypted) et indexés par nom simple (encrypted).
+    """
+
+    __slots__ = ("kind", "labels", "attributes", "_by_name", "start", "end", "_source", "_text")
+
+    def __init__(self, kind: str, labels: list, start: int, source: str = None):
+        self.kind = kind
+        self.labels = labels
+        self.attributes = {}
+        self._by_name = {}
+        self.start = start
+        self.end = start
+        self._source = source
+        self._text = None
+
+    @property
+    def type(self) -> str:
+        return self.labels[0] if self.labels else ""
+
+    @property
+    def address(self) -> str:
+        """Adresse Terraform (aws_instance.server_1, provider.aws, var.db_password)"""
+        if self.kind == "resource":
+            return ".".join(self.labels)
+        if self.kind == "variable":
+            return "var." + ".".join(self.labels)
+        return ".".join([self.kind] + self.labels)
+
+    @property
+    def text(self) -> str:
+        """Source du bloc (minuscules)"""
+        if self._text is None:
+            self._text = self._source[self.start:self.end]
+        return self._text
+
+    def set(self, path: str, name: str, value: str):
+        self.attributes[path] = value
+        values = self._by_name.get(name)
+        if values is None:
+            self._by_name[name] = [value]
+        else:
+            values.append(value)
+
+    def has(self, name: str) -> bool:
+        return name in self._by_name
+
+    def values(self, name: str) -> list:
+        """Valeurs de l'attribut `name`, quel que soit le bloc imbriqué"""
+        return self._by_name.get(name, [])
+
+
+_BRACKETS_RE = re.compile(r'[\[\](){}]')
+
+
+def _bracket_balance(value: str) -> int:
+    # Cas courant (true, "t2.micro", aws_vpc.main.id): aucune parenthèse
+    if _BRACKETS_RE.search(value) is None:
+        return 0
+    if '"' in value:
+        value = _STRING_RE.sub('""', value)
+    return (value.count("[") + value.count("(") + value.count("{")
+            - value.count("]") - value.count(")") - value.count("}"))
+
+
+def _strip_comment(line: str) -> str:
+    for marker in ("#", "//"):
+        index = line.find(marker)
+        if index != -1 and line.count('"', 0, index) % 2 == 0:
+            line = line[:index].rstrip()
+    return line
+
+
+class HclParser:
+    """
+    Parseur HCL ligne à ligne, un seul passage, état conservé entre les appels
+    à feed() pour le mode flux. Couvre le sous-ensemble utilisé par les
+    règles: blocs, blocs imbriqués, maps, attributs (y compris listes
+    multi-lignes et heredocs, ignorés).
+    """
+
+    def __init__(self, keep_text: bool = False):
+        # keep_text: conserve le texte de chaque bloc (mode flux, la source
+        # n'étant pas gardée); sinon le texte est relu dans la source
+        self.keep_text = keep_text
+        self.offset = 0
+        self.current = None
+        self.path = []
+        self.prefix = ""
+        self.pending = None
+        self.heredoc = None
+        self.lines = []
+
+    def feed(self, text: str, source: str = None) -> list:
+        """Analyse des lignes complètes, retourne les blocs terminés"""
+        # Boucle chaude: état en variables locales, réécrit en fin d'appel
+        done = []
+        keep_text = self.keep_text
+        offset = self.offset
+        current = self.current
+        path = self.path
+        prefix = self.prefix
+        pending = self.pending
+        heredoc = self.heredoc
+        lines = self.lines
+        attribute_match = _ATTRIBUTE_RE.match
+        block_match = _BLOCK_RE.match
+
+        for line in text.splitlines(keepends=True):
+            line_start = offset
+            offset += len(line)
+            if keep_text and current is not None:
+                lines.append(line)
+
+            stripped = line.strip()
+            if heredoc is not None:
+                if stripped == heredoc:
+                    heredoc = None
+                continue
+            if not stripped:
+                continue
+            first = stripped[0]
+            if first == "#" or first == "/" and stripped.startswith("//"):
+                continue
+            if "#" in stripped or "//" in stripped:
+                stripped = _strip_comment(stripped)
+
+            # Valeur multi-lignes en cours (liste, appel de fonction)
+            if pending is not None:
+                pending[1].append(stripped)
+                pending[2] += _bracket_balance(stripped)
+                if pending[2] <= 0:
+                    current.set(prefix + pending[0], pending[0], " ".join(pending[1]))
+                    pending = None
+                continue
+
+            if current is None:
+                match = block_match(stripped)
+                if match:
+                    kind, labels, rest = match.groups()
+                    current = HclBlock(kind, [label.strip('"') for label in labels.split()], line_start, source)
+                    if keep_text:
+                        lines = [line]
+                    rest = rest.strip()
+                    if rest.endswith("}"):
+                        # Bloc sur une ligne: features {}
+                        for name, value in _INLINE_ATTRIBUTE_RE.findall(rest[:-1]):
+                            current.set(name, name, value)
+                        current = self._close(current, offset, lines, done)
+                        lines = []
+                continue
+
+            if first == "}" or first == "]" and stripped.endswith("}"):
+                if path:
+                    path.pop()
+                    prefix = ".".join(path) + "." if path else ""
+                else:
+                    current = self._close(current, offset, lines, done)
+                    lines = []
+                continue
+
+            match = attribute_match(stripped)
+            if match:
+                name, value = match.groups()
+                if value == "{":
+                    # Map (tags = {) : comme un bloc imbriqué
+                    path.append(name)
+                    prefix += name + "."
+                elif value.startswith("<<"):
+                    heredoc = value[2:].lstrip("-~").strip()
+                elif ("[" in value or "(" in value or "{" in value) and _bracket_balance(value) > 0:
+                    pending = [name, [value], _bracket_balance(value)]
+                else:
+                    current.set(prefix + name, name, value)
+                continue
+
+            match = block_match(stripped)
+            if match:
+                kind, _, rest = match.groups()
+                rest = rest.strip()
+                if rest.endswith("}"):
+                    # Bloc imbriqué sur une ligne: root_block_device { encrypted = true }
+                    for name, value in _INLINE_ATTRIBUTE_RE.findall(rest[:-1]):
+                        current.set(prefix + kind + "." + name, name, value)
+                else:
+                    path.append(kind)
+                    prefix += kind + "."
+
+        self.offset = offset
+        self.current = current
+        self.path = path
+        self.prefix = prefix
+        self.pending = pending
+        self.heredoc = heredoc
+        self.lines = lines
+        return done
+
+    def _close(self, block: HclBlock, offset: int, lines: list, done: list):
+        block.end = offset
+        if self.keep_text:
+            block._text = "".join(lines)
+        done.append(block)
+        self.path.clear()
+        self.prefix = ""
+        return None
+
+
+def parse_hcl_blocks(code_lower: str) -> list:
+    """Découpe le code en blocs de premier niveau indexés (un passage linéaire)"""
+    return HclParser().feed(code_lower, source=code_lower)
+
+
+def _detect_providers(code_lower: str) -> list:
+    return [
+        provider for provider, patterns in _PROVIDER_PATTERNS
+        if any(pattern in code_lower for pattern in patterns)
+    ]
+
+
+class TerraformAnalysis:
+    """
+    Contexte d'analyse partagé par toutes les règles
+    Le code est mis en minuscules, les providers détectés et les blocs indexés
+    une seule fois:
+    - lower: texte en minuscules
+    - providers: providers détectés, par ordre de priorité
+    - blocks: blocs de premier niveau (HclBlock), dans l'ordre du fichier
+    - resources: index adresse -> bloc (aws_instance.server_1)
+    - resources_by_type: index type -> blocs
+    """
+
+    def __init__(self, lower: str):
+        self.lower = lower
+        self.providers = _detect_providers(lower)
+        self._blocks = None
+        self._resources = None
+        self._resources_by_type = None
+
+    @property
+    def provider(self) -> str:
+        """Provider principal (aws par défaut)"""
+        return self.providers[0] if self.providers else "aws"
+
+    @property
+    def blocks(self) -> list:
+        if self._blocks is None:
+            self._blocks = parse_hcl_blocks(self.lower)
+        return self._blocks
+
+    @property
+    def resources(self) -> dict:
+        if self._resources is None:
+            self._resources = {b.address: b for b in self.blocks if b.kind == "resource"}
+        return self._resources
+
+    @property
+    def resources_by_type(self) -> dict:
+        if self._resources_by_type is None:
+            self._resources_by_type = {}
+            for block in self.resources.values():
+                self._resources_by_type.setdefault(block.type, []).append(block)
+        return self._resources_by_type
+
+    @property
+    def resource_types(self) -> set:
+        return set(self.resources_by_type)
+
+
+def analyze_terraform(terraform_code: str) -> TerraformAnalysis:
+    """Construit le contexte d'analyse partagé (un seul lower() pour toutes les règles)"""
+    return TerraformAnalysis(terraform_code.lower())
+
+
+def _analysis(code) -> TerraformAnalysis:
+    """Accepte un contexte déjà construit ou du code brut (compatibilité)"""
+    if isinstance(code, TerraformAnalysis):
+        return code
+    return analyze_terraform(code)
+
+
+# ============================================
+# RÈGLES PAR RESSOURCE
+# Chaque règle évalue un bloc: True (conforme), False (violation),
+# None (règle non applicable à ce bloc)
 # ============================================
 
-def _detect_provider(terraform_code: str) -> str:
+def _detect_provider(terraform_code) -> str:
     """Détecte le provider depuis le code Terraform"""
-    code_lower = terraform_code.lower()
-    if 'provider "aws"' in code_lower or 'hashicorp/aws' in code_lower:
-        return "aws"
-    elif 'provider "azurerm"' in code_lower or 'hashicorp/azurerm' in code_lower:
-        return "azure"
-    elif 'provider "google"' in code_lower or 'hashicorp/google' in code_lower:
-        return "gcp"
-    elif 'provider "openstack"' in code_lower:
-        return "openstack"
-    return "aws"  # Default
-
-
-def _check_db_no_public_ip(code: str, provider: str = None) -> bool:
-    """Vérifie que les bases de données ne sont pas publiques"""
-    if provider is None:
-        provider = _detect_provider(code)
-    
-    code_lower = code.lower()
-    
-    # Vérifications spécifiques par provider
+    return _analysis(terraform_code).provider
+
+
+@lru_cache(maxsize=256)
+def _is_database_type(resource_type: str) -> bool:
+    # Peu de types distincts: un passage de l'automate par type, puis cache
+    return resource_type in _AWS_DB_TYPES or _DB_TYPE_MATCHER.contains_any(resource_type)
+
+
+def _is_database(block: HclBlock) -> bool:
+    return block.kind == "resource" and _is_database_type(block.type)
+
+
+def _is_monitored_type(resource_type: str) -> bool:
+    return resource_type in _COMPUTE_TYPES or _is_database_type(resource_type)
+
+
+def _is_aws_ssl_target(resource_type: str) -> bool:
+    return resource_type in _AWS_PARAMETER_GROUP_TYPES or _is_database_type(resource_type)
+
+
+def _enforces_tls(block: HclBlock) -> bool:
+    """Groupe de paramètres dont un paramètre impose SSL/TLS aux connexions"""
+    for body in _PARAMETER_BLOCK_RE.findall(block.text):
+        fields = dict(_PARAMETER_FIELD_RE.findall(body))
+        if fields.get("value") in _TLS_PARAMETERS.get(fields.get("name"), ()):
+            return True
+    return False
+
+
+@register_rule("db_no_public_ip", {
+    "aws": ANY_RESOURCE, "azure": _AZURE_DB_TYPES, "gcp": ("google_sql_database_instance",)
+})
+def _rule_db_no_public_ip(block: HclBlock, provider: str):
+    """Les bases de données ne sont pas publiques"""
+    if block.kind != "resource":
+        return None
+
     if provider == "aws":
         # AWS: publicly_accessible doit être false ou absent
-        if "publicly_accessible = true" in code_lower:
+        if "true" in block.values("publicly_accessible"):
             return False
-        # Si DB présente, vérifier qu'elle est dans un VPC privé
-        if "aws_db_instance" in code_lower:
-            return "publicly_accessible = false" in code_lower or "vpc_security_group_ids" in code_lower
+        # DB: privée explicitement ou dans un VPC (security groups)
+        if block.type in _AWS_DB_TYPES:
+            return "false" in block.values("publicly_accessible") or block.has("vpc_security_group_ids")
     elif provider == "azure":
         # Azure: public_network_access_enabled doit être false
-        if "azurerm_mysql_server" in code_lower or "azurerm_postgresql_server" in code_lower:
-            return "public_network_access_enabled = false" in code_lower
+        if block.type in _AZURE_DB_TYPES:
+            return "false" in block.values("public_network_access_enabled")
     elif provider == "gcp":
         # GCP: ipv4_enabled doit être false
-        if "google_sql_database_instance" in code_lower:
-            return "ipv4_enabled = false" in code_lower or "ipv4_enabled    = false" in code_lower
-    
-    # Si pas de DB, considérer comme OK
-    db_keywords = ["db_instance", "mysql_server", "postgresql_server", "sql_database_instance"]
-    if not any(keyword in code_lower for keyword in db_keywords):
-        return True
-    
-    # Par défaut, si on ne peut pas vérifier, on considère comme OK (pas de DB publique explicite)
-    return True
+        if block.type == "google_sql_database_instance":
+            return "false" in block.values("ipv4_enabled")
 
+    return None
 
-def _check_encryption_at_rest(code: str, provider: str = None) -> bool:
-    """Vérifie le chiffrement au repos"""
-    if provider is None:
-        provider = _detect_provider(code)
-    
-    code_lower = code.lower()
-    
-    # Vérifications spécifiques par provider
-    if provider == "aws":
-        # AWS: encrypted = true ou storage_encrypted = true
-        if "aws_instance" in code_lower or "aws_db_instance" in code_lower:
-            return ("encrypted = true" in code_lower or 
-                   "storage_encrypted = true" in code_lower or
-                   "storage_encrypted   = true" in code_lower)
-    elif provider == "azure":
-        # Azure: infrastructure_encryption_enabled ou pas de mention (par défaut chiffré)
-        if "azurerm_mysql_server" in code_lower or "azurerm_linux_virtual_machine" in code_lower:
-            # Azure chiffre par défaut, donc OK si présent
-            return True
-    elif provider == "gcp":
-        # GCP: disk_encryption_key ou chiffrement par défaut
-        if "google_compute_instance" in code_lower or "google_sql_database_instance" in code_lower:
-            # GCP chiffre par défaut
-            return True
-    
-    # Si pas de ressources nécessitant chiffrement, OK
-    return True
 
+@register_rule("encryption_at_rest", {"aws": ("aws_instance",) + _AWS_DB_TYPES})
+def _rule_encryption_at_rest(block: HclBlock, provider: str):
+    """Chiffrement au repos (Azure et GCP chiffrent par défaut)"""
+    if provider == "aws" and block.kind == "resource":
+        if block.type == "aws_instance":
+            return "true" in block.values("encrypted")
+        if block.type in _AWS_DB_TYPES:
+            return "true" in block.values("storage_encrypted") or "true" in block.values("encrypted")
+    return None
+
+
+# OpenStack: openstack_db_instance_v1 (Trove) n'a pas d'argument pour imposer SSL/TLS
+@register_rule("ssl_required", {"aws": _is_aws_ssl_target, "openstack": None, "*": _is_database_type}, cost=2)
+def _rule_ssl_required(block: HclBlock, provider: str):
+    """SSL/TLS requis pour les bases de données"""
+    if block.kind != "resource":
+        return None
 
-def _check_ssl_required(code: str, provider: str = None) -> bool:
-    """Vérifie que SSL/TLS est requis"""
-    if provider is None:
-        provider = _detect_provider(code)
-    
-    code_lower = code.lower()
-    
-    # Vérifications spécifiques par provider
     if provider == "aws":
-        # AWS: require_ssl = true
-        if "aws_db_instance" in code_lower:
-            return "require_ssl = true" in code_lower or "ssl" in code_lower
-    elif provider == "azure":
-        # Azure: ssl_enforcement_enabled = true
-        if "azurerm_mysql_server" in code_lower or "azurerm_postgresql_server" in code_lower:
-            return "ssl_enforcement_enabled = true" in code_lower or "ssl_minimal_tls_version" in code_lower
-    elif provider == "gcp":
-        # GCP: require_ssl = true
-        if "google_sql_database_instance" in code_lower:
-            return "require_ssl = true" in code_lower or "require_ssl  = true" in code_lower
-    
-    # Vérification générique
-    if "ssl" in code_lower or "tls" in code_lower:
-        return True
-    
-    # Si pas de DB, OK
-    db_keywords = ["db_instance", "mysql_server", "postgresql_server", "sql_database_instance"]
-    if not any(keyword in code_lower for keyword in db_keywords):
-        return True
-    
-    return False
+        # Imposé par un groupe de paramètres: la base y fait référence, le groupe
+        # (bloc vérifié lui-même par cette règle) impose le paramètre
+        if block.type in _AWS_PARAMETER_GROUP_TYPES:
+            return _enforces_tls(block)
+        if block.type in _AWS_PARAMETER_GROUPS:
+            attribute, group_type = _AWS_PARAMETER_GROUPS[block.type]
+            return any(value.startswith(group_type + ".") for value in block.values(attribute))
 
+    if not _is_database(block):
+        return None
+    if provider == "azure" and block.type in _AZURE_DB_TYPES:
+        return "true" in block.values("ssl_enforcement_enabled") or block.has("ssl_minimal_tls_version_enforced")
+
+    # GCP et générique
+    return "true" in block.values("require_ssl")
+
+
+@register_rule("monitoring_enabled", {"*": _is_monitored_type}, cost=2)
+def _rule_monitoring_enabled(block: HclBlock, provider: str):
+    """Surveillance active sur les serveurs et bases de données"""
+    if not (block.kind == "resource" and block.type in _COMPUTE_TYPES or _is_database(block)):
+        return None
 
-def _check_monitoring_enabled(code: str, provider: str = None) -> bool:
-    """Vérifie que le monitoring est activé"""
-    if provider is None:
-        provider = _detect_provider(code)
-    
-    code_lower = code.lower()
-    
-    # Vérifications spécifiques par provider
     if provider == "aws":
-        # AWS: monitoring = true ou enabled_cloudwatch_logs_exports
-        if "aws_instance" in code_lower:
-            return "monitoring = true" in code_lower
-        if "aws_db_instance" in code_lower:
-            return "enabled_cloudwatch_logs_exports" in code_lower or "monitoring" in code_lower
+        if block.type == "aws_instance":
+            return "true" in block.values("monitoring")
+        if block.type in _AWS_DB_TYPES:
+            return block.has("enabled_cloudwatch_logs_exports") or "monitoring" in block.text
+    elif provider == "gcp" and block.type == "google_sql_database_instance":
+        return "true" in block.values("query_insights_enabled")
     elif provider == "azure":
-        # Azure: insights ou monitoring
-        return "insights" in code_lower or "monitoring" in code_lower
-    elif provider == "gcp":
-        # GCP: query_insights_enabled ou monitoring
-        return "query_insights_enabled" in code_lower or "monitoring" in code_lower or "insights" in code_lower
-    
-    # Vérification générique
-    return "monitoring" in code_lower or "logs" in code_lower or "insights" in code_lower
+        # VM: diagnostics de démarrage (journaux console); base: détection des menaces
+        if "boot_diagnostics" in block.text or block.attributes.get("threat_detection_policy.enabled") == "true":
+            return True
+    elif provider == "openstack" and _is_database(block):
+        # openstack_db_instance_v1 (Trove) n'a pas d'argument de journalisation
+        return None
+
+    # Générique: insights / monitoring / logs dans le bloc
+    text = block.text
+    return "monitoring" in text or "insights" in text or "logs" in text
+
+
+def _positive(values: list) -> bool:
+    return any(v.isdigit() and int(v) > 0 for v in values)
+
+
+# OpenStack: les sauvegardes Trove ne se déclarent pas sur openstack_db_instance_v1
+@register_rule("backup_enabled", {"openstack": None, "*": _is_database_type}, cost=2)
+def _rule_backup_enabled(block: HclBlock, provider: str):
+    """Sauvegardes configurées sur chaque base de données"""
+    if not _is_database(block):
+        return None
+
+    if block.type in _AWS_DB_TYPES:
+        return _positive(block.values("backup_retention_period"))
+    if block.type in _AZURE_DB_TYPES:
+        return _positive(block.values("backup_retention_days"))
+    if block.type == "google_sql_database_instance":
+        return block.attributes.get("settings.backup_configuration.enabled") == "true"
+
+    return "backup" in block.text
+
+
+@register_rule("no_hardcoded_credentials", {"*": ANY_BLOCK})
+def _rule_no_hardcoded_credentials(block: HclBlock, provider: str):
+    """Pas de mot de passe / secret littéral, dans aucun bloc"""
+    values = [v for name in _CREDENTIAL_ATTRIBUTES for v in block.values(name)]
+    if not values:
+        return None
+    return not any(value.startswith('"') for value in values)
+
+
+# ============================================
+# PLAN D'ÉVALUATION COMPILÉ (par provider)
+# ============================================
+
+def _target_matcher(target):
+    """Cible déclarée -> prédicat (kind, type) du bloc"""
+    if target == ANY_BLOCK:
+        return lambda kind, resource_type: True
+    if target == ANY_RESOURCE:
+        return lambda kind, resource_type: kind == "resource"
+    if callable(target):
+        return lambda kind, resource_type: kind == "resource" and target(resource_type)
+    types = frozenset(target)
+    return lambda kind, resource_type: kind == "resource" and resource_type in types
+
+
+class RulePlan:
+    """
+    Plan d'évaluation d'un provider, compilé depuis RULE_REGISTRY:
+    - rules: règles applicables au provider, dans l'ordre de SECURITY_POLICIES
+      (policy_id, check, matcher, cost)
+    - skipped: politiques jamais applicables à ce provider (conformes d'office)
+    - fail_fast_order: règles par pénalité décroissante puis coût croissant
+    Les règles à évaluer pour un (kind, type) de bloc sont calculées une fois.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.rules = []
+        self.skipped = []
+        for policy_id in SECURITY_POLICIES:
+            rule = RULE_REGISTRY.get(policy_id)
+            if rule is None:
+                continue
+            target = rule["applies_to"].get(provider, rule["applies_to"].get("*"))
+            if target is None:
+                self.skipped.append(policy_id)
+            else:
+                self.rules.append((policy_id, rule["check"], _target_matcher(target), rule["cost"]))
+        self.fail_fast_order = sorted(
+            self.rules,
+            key=lambda rule: (-SEVERITY_PENALTIES.get(SECURITY_POLICIES[rule[0]]["severity"], 10), rule[3])
+        )
+        self._by_block_type = {}
+
+    def rules_for(self, kind: str, resource_type: str) -> tuple:
+        """[(policy_id, check)] applicables à un bloc de ce (kind, type)"""
+        key = (kind, resource_type)
+        rules = self._by_block_type.get(key)
+        if rules is None:
+            rules = tuple(
+                (policy_id, check) for policy_id, check, matches, _ in self.rules if matches(kind, resource_type)
+            )
+            self._by_block_type[key] = rules
+        return rules
+
+
+_rule_plans = {}
+
+
+def compile_rule_plan(provider: str) -> RulePlan:
+    """Plan du provider, recompilé si les politiques ou le registre changent"""
+    key = (provider, policy_fingerprint())
+    plan = _rule_plans.get(key)
+    if plan is None:
+        if len(_rule_plans) > 64:
+            _rule_plans.clear()
+        plan = _rule_plans[key] = RulePlan(provider)
+    return plan
+
+
+def registered_policies() -> list:
+    """Politiques évaluées (celles qui ont une règle enregistrée), dans l'ordre"""
+    return [policy_id for policy_id in SECURITY_POLICIES if policy_id in RULE_REGISTRY]
 
 
 # ============================================
@@ -259,56 +726,141 @@ def get_secure_settings(provider: str) -> dict:
 # FONCTION : Vérification post-génération
 # ============================================
 
-def check_terraform_security(terraform_code: str, provider: str = None) -> dict:
-    """
-    Verifie le code Terraform contre les 6 politiques
-    
-    Args:
-        terraform_code: Code Terraform à vérifier
-        provider: Provider cloud (auto-détecté si None)
-    
-    Returns:
-        dict: Rapport de sécurité avec violations, score, grade
-    """
-    if provider is None:
-        provider = _detect_provider(terraform_code)
-    
-    logger.info(f"Vérification sécurité pour provider: {provider}")
-    
+# Nombre d'adresses listées par violation (le total reste dans resource_count):
+# borne la taille du rapport et la mémoire du mode flux
+MAX_REPORTED_RESOURCES = 50
+
+
+def _violation(policy_id: str, policy: dict, resources: list, count: int = None) -> dict:
+    return {
+        "rule": policy_id,
+        "severity": policy["severity"],
+        "category": policy["category"],
+        "description": policy["description"],
+        # Adresses des ressources en violation (ex: aws_db_instance.db_1)
+        "resources": resources[:MAX_REPORTED_RESOURCES],
+        "resource_count": len(resources) if count is None else count
+    }
+
+
+def _error_violation(policy_id: str, error: Exception) -> dict:
+    logger.error(f"Erreur vérification {policy_id}: {error}")
+    # En cas d'erreur, on considère comme violation pour sécurité
+    return {
+        "rule": policy_id,
+        "severity": "MEDIUM",
+        "category": SECURITY_POLICIES[policy_id].get("category", "Unknown"),
+        "description": f"Erreur lors de la vérification: {str(error)}",
+        "resources": [],
+        "resource_count": 0
+    }
+
+
+def _policy_results(failing: dict, errors: dict, skipped: list = ()) -> tuple:
+    """(violations, passed) dans l'ordre de SECURITY_POLICIES"""
     violations = []
     passed = []
-    
-    for policy_id, policy in SECURITY_POLICIES.items():
-        if "check" in policy:
-            try:
-                # Passe le provider à la fonction de check
-                check_result = policy["check"](terraform_code, provider)
-                if check_result:
-                    passed.append(policy_id)
-                else:
-                    violations.append({
-                        "rule": policy_id,
-                        "severity": policy["severity"],
-                        "category": policy["category"],
-                        "description": policy["description"]
-                    })
-            except Exception as e:
-                logger.error(f"Erreur vérification {policy_id}: {e}")
-                # En cas d'erreur, on considère comme violation pour sécurité
-                violations.append({
-                    "rule": policy_id,
-                    "severity": "MEDIUM",
-                    "category": policy.get("category", "Unknown"),
-                    "description": f"Erreur lors de la vérification: {str(e)}"
-                })
-    
+    for policy_id in registered_policies():
+        if policy_id in errors:
+            violations.append(_error_violation(policy_id, errors[policy_id]))
+        elif failing.get(policy_id):
+            violations.append(_violation(policy_id, SECURITY_POLICIES[policy_id], failing[policy_id]))
+        elif policy_id not in skipped:
+            passed.append(policy_id)
+    return violations, passed
+
+
+def _add_timing(timings: dict, policy_id: str, ms: float, blocks: int, violations: int):
+    total = timings.get(policy_id)
+    if total is None:
+        timings[policy_id] = {"ms": round(ms, 3), "blocks": blocks, "violations": violations}
+    else:
+        total["ms"] = round(total["ms"] + ms, 3)
+        total["blocks"] += blocks
+        total["violations"] += violations
+
+
+def _run_rules(blocks: list, plan: RulePlan, rules: list, fail_fast: bool = False, timings: dict = None) -> tuple:
+    """
+    Evalue les règles une à une sur leurs seuls blocs cibles (blocs regroupés
+    par (kind, type)); chaque passage de règle est chronométré (rule_metrics,
+    et `timings` en mode debug).
+    fail_fast: arrêt dès que les pénalités constatées placent le score sous BLOCKING_SCORE
+    Retourne (failing: policy_id -> blocs en violation dans l'ordre du fichier, errors, skipped)
+    """
+    provider = plan.provider
+    groups = {}
+    for block in blocks:
+        key = (block.kind, block.labels[0] if block.labels else "")
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [block]
+        else:
+            group.append(block)
+
+    measure = RULE_METRICS_ENABLED or timings is not None
+    failing = {}
+    errors = {}
+    skipped = []
+    penalties = 0
+    for policy_id, check, matches, _ in rules:
+        if fail_fast and 100 - penalties < BLOCKING_SCORE:
+            skipped.append(policy_id)
+            continue
+        targets = [group for key, group in groups.items() if matches(*key)]
+        began = time.perf_counter() if measure else 0.0
+        try:
+            failed = [block for group in targets for block in group if check(block, provider) is False]
+        except Exception as e:
+            errors[policy_id] = e
+            penalties += SEVERITY_PENALTIES["MEDIUM"]
+            continue
+        if measure:
+            elapsed = time.perf_counter() - began
+            evaluated = sum(len(group) for group in targets)
+            if RULE_METRICS_ENABLED:
+                rule_metrics.record(policy_id, provider, elapsed, evaluated, len(failed))
+            if timings is not None:
+                _add_timing(timings, policy_id, elapsed * 1000, evaluated, len(failed))
+        if failed:
+            if len(targets) > 1:
+                # Ordre du fichier, quel que soit le type des blocs
+                failed.sort(key=lambda block: block.start)
+            failing[policy_id] = failed
+            penalties += SEVERITY_PENALTIES.get(SECURITY_POLICIES[policy_id]["severity"], 10)
+
+    return failing, errors, skipped
+
+
+def _addresses(failing: dict) -> dict:
+    return {policy_id: [block.address for block in blocks] for policy_id, blocks in failing.items()}
+
+
+def _evaluate_policies(ctx: TerraformAnalysis, plan: RulePlan, timings: dict = None) -> tuple:
+    """Evalue toutes les règles du plan sur leurs blocs cibles, retourne (violations, passed)"""
+    failing, errors, _ = _run_rules(ctx.blocks, plan, plan.rules, timings=timings)
+    return _policy_results(_addresses(failing), errors)
+
+
+def _evaluate_fail_fast(ctx: TerraformAnalysis, plan: RulePlan, timings: dict = None) -> tuple:
+    """
+    Evalue règle par règle (pénalité décroissante, coût croissant) et
+    s'arrête dès que le verdict NOT_OK est acquis.
+    Retourne (violations, passed, skipped) où skipped liste les règles non évaluées.
+    """
+    failing, errors, skipped = _run_rules(ctx.blocks, plan, plan.fail_fast_order, fail_fast=True, timings=timings)
+    violations, passed = _policy_results(_addresses(failing), errors, skipped)
+    return violations, passed, [policy_id for policy_id in registered_policies() if policy_id in skipped]
+
+
+def _build_report(violations: list, passed: list, skipped: list = None) -> dict:
+    """Calcule score et grade à partir des violations"""
     if not violations:
         score = 100
     else:
-        penalty_map = {"CRITICAL": 30, "HIGH": 20, "MEDIUM": 10}
-        penalties = sum(penalty_map.get(v["severity"], 10) for v in violations)
+        penalties = sum(SEVERITY_PENALTIES.get(v["severity"], 10) for v in violations)
         score = max(0, 100 - penalties)
-    
+
     if score >= 90:
         grade, status = "A", "Excellent"
     elif score >= 75:
@@ -317,8 +869,8 @@ def check_terraform_security(terraform_code: str, provider: str = None) -> dict:
         grade, status = "C", "Acceptable"
     else:
         grade, status = "D", "Insuffisant"
-    
-    return {
+
+    report = {
         "violations": violations,
         "passed_checks": passed,
         "total_issues": len(violations),
@@ -328,3 +880,450 @@ def check_terraform_security(terraform_code: str, provider: str = None) -> dict:
         "security_status": status,
         "policies_checked": len(SECURITY_POLICIES)
     }
+    if skipped:
+        # Mode fail-fast: verdict décidé, score réel inférieur ou égal
+        report["complete"] = False
+        report["skipped_checks"] = skipped
+    return report
+
+
+def check_terraform_security(terraform_code: str, provider: str = None, fail_fast: bool = False,
+                             debug: bool = False) -> dict:
+    """
+    Verifie le code Terraform contre les 6 politiques, ressource par ressource
+
+    Args:
+        terraform_code: Code Terraform à vérifier (ou TerraformAnalysis déjà construit)
+        provider: Provider cloud (auto-détecté si None)
+        fail_fast: Arrête l'évaluation dès que le score passe sous BLOCKING_SCORE
+            (verdict identique; le rapport porte alors "complete": False et
+            "skipped_checks"). Par défaut, rapport détaillé complet.
+        debug: Ajoute "rule_timings" (durée, blocs évalués, violations par règle)
+
+    Returns:
+        dict: Rapport de sécurité avec violations (et ressources concernées), score, grade
+    """
+    # Un seul lower() + indexation des blocs, partagés par toutes les règles
+    ctx = _analysis(terraform_code)
+    if provider is None:
+        provider = ctx.provider
+
+    logger.info(f"Vérification sécurité pour provider: {provider}")
+
+    plan = compile_rule_plan(provider)
+    timings = {} if debug else None
+    if fail_fast:
+        report = _build_report(*_evaluate_fail_fast(ctx, plan, timings))
+    else:
+        report = _build_report(*_evaluate_policies(ctx, plan, timings))
+    if debug:
+        report["rule_timings"] = timings
+    return report
+
+
+# ============================================
+# RE-VALIDATION INCRÉMENTALE (cache par bloc)
+# ============================================
+
+# Début de bloc de premier niveau en colonne 0 (style du générateur et de
+# terraform fmt); un fichier indenté autrement forme un seul morceau
+# (préfixe littéral "\n" plutôt que ^ multiligne: recherche bien plus rapide)
+_TOP_LEVEL_RE = re.compile(
+    r'\n(?=(?:resource|data|module|variable|output|provider|terraform|locals)\b)'
+)
+
+BLOCK_CACHE_SIZE = int(os.getenv("BLOCK_CACHE_SIZE", "50000"))
+block_cache = LRUCache(BLOCK_CACHE_SIZE)
+
+
+def split_top_level_blocks(code_lower: str) -> list:
+    """Découpe le texte en morceaux commençant chacun par un bloc de premier niveau"""
+    starts = [0] + [match.end() for match in _TOP_LEVEL_RE.finditer(code_lower)] + [len(code_lower)]
+    return [code_lower[begin:end] for begin, end in zip(starts, starts[1:])]
+
+
+def _evaluate_chunks(chunks: list, plan: RulePlan) -> list:
+    """
+    [(adresse, politiques en violation)] pour les blocs de chaque morceau
+    Les blocs de tous les morceaux sont évalués en un seul passage par règle
+    """
+    blocks_by_chunk = [parse_hcl_blocks(chunk) for chunk in chunks]
+    failing, errors, _ = _run_rules([block for blocks in blocks_by_chunk for block in blocks], plan, plan.rules)
+    if errors:
+        raise next(iter(errors.values()))
+    by_block = {}
+    for policy_id, failed in failing.items():
+        for block in failed:
+            by_block.setdefault(id(block), []).append(policy_id)
+    return [
+        [(block.address, tuple(by_block.get(id(block), ()))) for block in blocks]
+        for blocks in blocks_by_chunk
+    ]
+
+
+def check_terraform_security_incremental(terraform_code, provider: str = None) -> dict:
+    """
+    Même rapport que check_terraform_security(), en ne ré-évaluant que les
+    blocs modifiés: le résultat des règles est mis en cache par empreinte du
+    texte de chaque bloc (et du provider, de l'ensemble de politiques).
+    Une petite modification d'un gros fichier ne ré-analyse que ses blocs.
+    """
+    ctx = _analysis(terraform_code)
+    if provider is None:
+        provider = ctx.provider
+
+    fingerprint = policy_fingerprint()
+    plan = compile_rule_plan(provider)
+    chunks = split_top_level_blocks(ctx.lower)
+    keys = [
+        (hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).digest(), provider, fingerprint)
+        for chunk in chunks
+    ]
+    results = [block_cache.get(key) for key in keys]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        start = time.perf_counter()
+        try:
+            evaluated = _evaluate_chunks([chunks[index] for index in missing], plan)
+        except Exception:
+            # Erreur d'une règle: l'évaluation complète produit le rapport d'erreur
+            return check_terraform_security(ctx, provider)
+        cost = (time.perf_counter() - start) / len(missing)
+        for index, result in zip(missing, evaluated):
+            results[index] = result
+            block_cache.put(keys[index], result, cost)
+
+    failing = {policy_id: [] for policy_id in SECURITY_POLICIES}
+    for result in results:
+        for address, policies in result:
+            for policy_id in policies:
+                failing[policy_id].append(address)
+    return _build_report(*_policy_results(failing, {}))
+
+
+# Dernière empreinte calculée et copie profonde de l'état dont elle provient
+_fingerprint_memo = None
+
+
+def _policy_state() -> list:
+    """Etat courant des politiques et de leurs règles (objets vivants, non copiés)"""
+    state = []
+    for policy_id, policy in SECURITY_POLICIES.items():
+        rule = RULE_REGISTRY.get(policy_id)
+        if rule is not None:
+            check = rule["check"]
+            rule = (check, getattr(check, "__code__", None), rule["applies_to"], rule["cost"])
+        state.append((policy_id, policy, rule))
+    return state
+
+
+def policy_fingerprint() -> str:
+    """
+    Empreinte de l'ensemble de politiques: change dès qu'une politique est
+    ajoutée, retirée ou modifiée (métadonnées, règle enregistrée, cibles, coût)
+
+    L'état courant est comparé à une copie profonde de celui de la dernière
+    empreinte (quelques dict comparés en C); le hachage n'est refait qu'en cas
+    de différence, y compris pour une politique modifiée sur place.
+    """
+    global _fingerprint_memo
+
+    state = _policy_state()
+    memo = _fingerprint_memo
+    if memo is not None and memo[0] == state:
+        return memo[1]
+
+    parts = []
+    for policy_id, policy in SECURITY_POLICIES.items():
+        parts.append(policy_id)
+        for key in sorted(policy):
+            parts.append(f"{key}={policy[key]!r}")
+        rule = RULE_REGISTRY.get(policy_id)
+        if rule is not None:
+            code = getattr(rule["check"], "__code__", None)
+            parts.append(f"check={id(rule['check'])}:{code.co_code.hex() if code else ''}")
+            parts.append(f"applies_to={rule['applies_to']!r} cost={rule['cost']!r}")
+    fingerprint = hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+    # Fonctions et code copiés par référence, dicts et listes en profondeur
+    _fingerprint_memo = (copy.deepcopy(state), fingerprint)
+    return fingerprint
+
+
+# ============================================
+# ÉVALUATION PAR SECTION PROVIDER (multi-cloud)
+# ============================================
+
+# En-tête de section du générateur multi-cloud ("# SECTION 2: AZURE")
+_SECTION_RE = re.compile(r'^# section \d+: ', re.MULTILINE | re.IGNORECASE)
+
+# Au-delà de cette taille, les sections sont évaluées dans des processus
+# (l'analyse est du Python pur: des threads ne tournent pas en parallèle)
+PARALLEL_SCAN_MIN_BYTES = 1024 * 1024
+
+# Pool de processus partagé par les vérifications par section et l'audit,
+# créé au premier usage dans chaque processus. Démarrage "forkserver" (ou
+# "spawn"): jamais de fork d'un serveur qui a déjà des threads, dont un verrou
+# pourrait rester pris dans l'enfant
+_process_pool = None
+_process_pool_pid = None
+_process_pool_lock = threading.Lock()
+
+
+def process_pool_context():
+    """Contexte multiprocessing des pools: forkserver si disponible, sinon spawn"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def shared_process_pool() -> ProcessPoolExecutor:
+    """Pool de processus du processus courant (un worker par CPU)"""
+    global _process_pool, _process_pool_pid
+    with _process_pool_lock:
+        # Après un fork (workers gunicorn), le pool hérité n'a plus de processus
+        if _process_pool is None or _process_pool_pid != os.getpid():
+            _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=process_pool_context())
+            _process_pool_pid = os.getpid()
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Arrête le pool partagé s'il a été créé dans ce processus"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None and _process_pool_pid == os.getpid():
+            _process_pool.shutdown(wait=True)
+        _process_pool = None
+
+
+def split_provider_sections(terraform_code: str) -> list:
+    """
+    Découpe un fichier multi-cloud en sections (une par provider)
+    L'en-tête du fichier est rattaché à la première section; un fichier sans
+    marqueur de section forme une seule section.
+    """
+    starts = [match.start() for match in _SECTION_RE.finditer(terraform_code)][1:]
+    bounds = [0] + starts + [len(terraform_code)]
+    return [terraform_code[begin:end] for begin, end in zip(bounds, bounds[1:])]
+
+
+def _check_section(section_code: str, fail_fast: bool = False, debug: bool = False) -> tuple:
+    """Vérifie une section avec les règles de son propre provider (blocs déjà vus en cache)"""
+    ctx = analyze_terraform(section_code)
+    if fail_fast or debug:
+        # Durées du mode debug: évaluation réelle, sans le cache par bloc
+        return ctx.provider, check_terraform_security(ctx, ctx.provider, fail_fast=fail_fast, debug=debug)
+    return ctx.provider, check_terraform_security_incremental(ctx, ctx.provider)
+
+
+def _merge_reports(reports: list) -> dict:
+    """
+    Agrège des rapports: une règle en violation dans une section l'est pour
+    l'ensemble (ressources concaténées); réussie si réussie partout
+    """
+    merged = {}
+    for report in reports:
+        for violation in report["violations"]:
+            current = merged.get(violation["rule"])
+            if current is None:
+                merged[violation["rule"]] = dict(violation)
+            else:
+                current["resources"] = (current["resources"] + violation["resources"])[:MAX_REPORTED_RESOURCES]
+                current["resource_count"] += violation["resource_count"]
+
+    violations = [merged[policy_id] for policy_id in SECURITY_POLICIES if policy_id in merged]
+    passed = [
+        policy_id for policy_id in SECURITY_POLICIES
+        if policy_id not in merged and all(policy_id in report["passed_checks"] for report in reports)
+    ]
+    # Fail-fast: non évaluée dans une section et sans violation ailleurs
+    skipped = [
+        policy_id for policy_id in SECURITY_POLICIES
+        if policy_id not in merged and any(policy_id in report.get("skipped_checks", ()) for report in reports)
+    ]
+    report = _build_report(violations, passed, skipped)
+
+    timings = [r["rule_timings"] for r in reports if "rule_timings" in r]
+    if timings:
+        report["rule_timings"] = {}
+        for section_timings in timings:
+            for policy_id, timing in section_timings.items():
+                _add_timing(report["rule_timings"], policy_id, timing["ms"], timing["blocks"], timing["violations"])
+    return report
+
+
+def _aggregate_sections(results: list) -> dict:
+    """
+    Rapport global + détail par provider à partir de [(provider, rapport)]
+    """
+    by_provider = {}
+    for provider, report in results:
+        by_provider.setdefault(provider, []).append(report)
+
+    report = _merge_reports([report for _, report in results])
+    report["by_provider"] = {}
+    for provider, reports in by_provider.items():
+        provider_report = reports[0] if len(reports) == 1 else _merge_reports(reports)
+        report["by_provider"][provider] = {
+            "security_score": provider_report["security_score"],
+            "security_grade": provider_report["security_grade"],
+            "total_issues": provider_report["total_issues"],
+            "violations": [violation["rule"] for violation in provider_report["violations"]]
+        }
+    return report
+
+
+def check_terraform_security_sections(terraform_code: str, max_workers: int = None,
+                                      use_processes: bool = None, fail_fast: bool = False,
+                                      debug: bool = False) -> dict:
+    """
+    Vérifie chaque section provider d'un fichier multi-cloud avec ses propres
+    règles, en parallèle, puis agrège scores et violations
+
+    Args:
+        terraform_code: Code Terraform (mono ou multi-provider)
+        max_workers: Nombre de threads (défaut: un par section; 1: en série)
+        use_processes: Pool de processus partagé plutôt que threads (défaut:
+            selon la taille); sur un seul CPU, les sections sont évaluées
+            l'une après l'autre
+        fail_fast: Chaque section s'arrête dès que son verdict est décidé
+            (voir check_terraform_security)
+        debug: Ajoute "rule_timings", cumulées sur les sections
+
+    Returns:
+        dict: Rapport global (comme check_terraform_security) + "by_provider"
+    """
+    sections = split_provider_sections(terraform_code)
+    if len(sections) == 1:
+        return _aggregate_sections([_check_section(sections[0], fail_fast, debug)])
+
+    fail_fasts, debugs = [fail_fast] * len(sections), [debug] * len(sections)
+    if max_workers == 1 and not use_processes:
+        return _aggregate_sections(list(map(_check_section, sections, fail_fasts, debugs)))
+    if use_processes is None:
+        if (os.cpu_count() or 1) == 1:
+            # Un seul CPU: ni processus ni threads ne gagnent quoi que ce soit
+            return _aggregate_sections(list(map(_check_section, sections, fail_fasts, debugs)))
+        use_processes = len(terraform_code) >= PARALLEL_SCAN_MIN_BYTES
+
+    if use_processes:
+        results = list(shared_process_pool().map(_check_section, sections, fail_fasts, debugs))
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers or len(sections)) as executor:
+            results = list(executor.map(_check_section, sections, fail_fasts, debugs))
+
+    return _aggregate_sections(results)
+
+
+# ============================================
+# VÉRIFICATION EN FLUX (mode grande échelle)
+# ============================================
+
+# Taille des fenêtres de scan: regrouper les petits morceaux limite le coût
+# fixe par appel tout en gardant la mémoire bornée
+_SCAN_WINDOW_SIZE = 64 * 1024
+
+_PROVIDERS = tuple(provider for provider, _ in _PROVIDER_PATTERNS)
+
+class _StreamSection:
+    """
+    Etat de vérification d'une section en flux
+    Le provider n'étant connu qu'à la fin de la section (priorité entre
+    providers détectés), chaque bloc est évalué pour chaque provider candidat.
+    """
+
+    def __init__(self, provider: str = None):
+        self.provider = provider
+        self.parser = HclParser(keep_text=True)
+        self.candidates = (provider,) if provider else _PROVIDERS
+        self.plans = [compile_rule_plan(p) for p in self.candidates]
+        self.failing = {(policy_id, p): [] for policy_id in registered_policies() for p in self.candidates}
+        self.counts = dict.fromkeys(self.failing, 0)
+        self.found_providers = set()
+
+    def feed(self, text_lower: str):
+        self.found_providers.update(_detect_providers(text_lower))
+        failing = self.failing
+        counts = self.counts
+        for block in self.parser.feed(text_lower):
+            for plan in self.plans:
+                p = plan.provider
+                for policy_id, check in plan.rules_for(block.kind, block.type):
+                    if check(block, p) is False:
+                        key = (policy_id, p)
+                        counts[key] += 1
+                        if counts[key] <= MAX_REPORTED_RESOURCES:
+                            failing[key].append(block.address)
+
+    def result(self) -> tuple:
+        provider = self.provider or next((p for p in _PROVIDERS if p in self.found_providers), "aws")
+        logger.info(f"Vérification sécurité (flux) pour provider: {provider}")
+
+        violations = []
+        passed = []
+        for policy_id in registered_policies():
+            count = self.counts[(policy_id, provider)]
+            if count:
+                violations.append(
+                    _violation(policy_id, SECURITY_POLICIES[policy_id], self.failing[(policy_id, provider)], count)
+                )
+            else:
+                passed.append(policy_id)
+
+        return provider, _build_report(violations, passed)
+
+
+def check_terraform_security_stream(chunks, provider: str = None) -> dict:
+    """
+    Equivalent de check_terraform_security_sections() sur un flux de morceaux
+    (ex: iter_terraform()), sans materialiser le fichier complet
+
+    Chaque bloc est évalué dès qu'il est complet puis oublié; seules les
+    adresses en violation sont conservées. Les sections provider sont
+    découpées sur les mêmes marqueurs, évaluées l'une après l'autre.
+    """
+    results = []
+    section = _StreamSection(provider)
+    markers = 0
+    carry = ""
+
+    def scan(window: str):
+        nonlocal section, markers
+        window_lower = window.lower()
+        # Les fenêtres sont coupées en fin de ligne: un marqueur n'est jamais coupé
+        begin = 0
+        for match in _SECTION_RE.finditer(window_lower):
+            markers += 1
+            if markers == 1:
+                continue
+            section.feed(window_lower[begin:match.start()])
+            results.append(section.result())
+            section = _StreamSection(provider)
+            begin = match.start()
+        section.feed(window_lower[begin:])
+
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= _SCAN_WINDOW_SIZE:
+            # Coupe à la dernière ligne complète, le reste passe à la fenêtre suivante
+            window = carry + "".join(pending)
+            cut = window.rfind("\n") + 1
+            scan(window[:cut])
+            carry = window[cut:]
+            pending = []
+            pending_size = 0
+
+    window = carry + "".join(pending)
+    scan(window if window.endswith("\n") else window + "\n")
+    results.append(section.result())
+
+    return _aggregate_sections(results)
+
+
+if __name__ == "__main__":
+    import sys
+    from .audit import main
+
+    sys.exit(main())
@@ -1,3 +1,7 @@
+import io
+import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from .security_rules import get_secure_settings
 
 # Configuration par provider
@@ -6,6 +10,7 @@ PROVIDER_CONFIGS = {
         "region": "us-east-1",
         "instance_type": "t2.micro",
         "db_class": "db.t2.micro",
+        "docdb_class": "db.t3.medium",
         "ami": "ami-0c55b159cbfafe1f0"
     },
     "azure": {
@@ -32,10 +37,11 @@ PROVIDER_CONFIGS = {
 }
 
 
-def generate_terraform_single_provider(provider_config: dict) -> str:
+def iter_terraform_single_provider(provider_config: dict):
     """
-    Genere le code Terraform pour un provider unique
-    Extrait de l'ancienne fonction generate_terraform()
+    Genere le code Terraform pour un provider unique, bloc par bloc
+    Un generateur (plutot que des concatenations) garde la generation lineaire
+    et permet de streamer la sortie sans materialiser tout le fichier
     """
     provider = provider_config.get("provider", "aws").lower()
     servers = provider_config.get("servers", 0)
@@ -48,7 +54,7 @@ def generate_terraform_single_provider(provider_config: dict) -> str:
     config = PROVIDER_CONFIGS.get(provider, PROVIDER_CONFIGS["aws"])
     
     # Header Terraform
-    code = f"""# Infrastructure as Code - {provider.upper()}
+    yield f"""# Infrastructure as Code - {provider.upper()}
 # Genere automatiquement avec politiques de securite
 
 terraform {{
@@ -59,57 +65,57 @@ terraform {{
     
     # Provider specifique
     if provider == "aws":
-        code += """    aws = {
+        yield """    aws = {
       source  = "hashicorp/aws"
       version = "~> 5.0"
     }
 """
     elif provider == "azure":
-        code += """    azurerm = {
+        yield """    azurerm = {
       source  = "hashicorp/azurerm"
       version = "~> 3.0"
     }
 """
     elif provider == "gcp":
-        code += """    google = {
+        yield """    google = {
       source  = "hashicorp/google"
       version = "~> 5.0"
     }
 """
     elif provider == "openstack":
-        code += """    openstack = {
+        yield """    openstack = {
       source  = "terraform-provider-openstack/openstack"
       version = "~> 1.0"
     }
 """
     
-    code += """  }
+    yield """  }
 }
 
 """
     
     # Configuration provider
     if provider == "aws":
-        code += f"""provider "aws" {{
+        yield f"""provider "aws" {{
   region = "{config["region"]}"
 }}
 
 """
     elif provider == "azure":
-        code += f"""provider "azurerm" {{
+        yield f"""provider "azurerm" {{
   features {{}}
 }}
 
 """
     elif provider == "gcp":
-        code += f"""provider "google" {{
+        yield f"""provider "google" {{
   project = var.gcp_project_id
   region  = "{config["region"]}"
 }}
 
 """
     elif provider == "openstack":
-        code += f"""provider "openstack" {{
+        yield f"""provider "openstack" {{
   auth_url = var.openstack_auth_url
 }}
 
@@ -118,7 +124,7 @@ terraform {{
     # Reseau - Multi-cloud
     if networks > 0:
         if provider == "aws":
-            code += """# Reseau VPC isole
+            yield """# Reseau VPC isole
 resource "aws_vpc" "main" {
   cidr_block           = "10.0.0.0/16"
   enable_dns_hostnames = true
@@ -142,7 +148,7 @@ resource "aws_subnet" "private" {
 
 """
         elif provider == "azure":
-            code += f"""# Groupe de ressources
+            yield f"""# Groupe de ressources
 resource "azurerm_resource_group" "main" {{
   name     = "rg-infrastructure"
   location = "{config["location"]}"
@@ -173,7 +179,7 @@ resource "azurerm_subnet" "private" {{
 
 """
         elif provider == "gcp":
-            code += f"""# Reseau VPC isole
+            yield f"""# Reseau VPC isole
 resource "google_compute_network" "main" {{
   name                    = "vpc-main"
   auto_create_subnetworks = false
@@ -188,7 +194,7 @@ resource "google_compute_subnetwork" "private" {{
 
 """
         elif provider == "openstack":
-            code += """# Reseau isole
+            yield """# Reseau isole
 resource "openstack_networking_network_v2" "main" {
   name = "network-main"
 }
@@ -204,7 +210,7 @@ resource "openstack_networking_subnet_v2" "private" {
     # Security Groups - Multi-cloud
     for i in range(security_groups):
         if provider == "aws":
-            code += f"""# Security Group {i+1}
+            yield f"""# Security Group {i+1}
 resource "aws_security_group" "sg_{i+1}" {{
   name        = "sg-{i+1}"
   description = "Security group avec principe du moindre privilege"
@@ -236,7 +242,7 @@ resource "aws_security_group" "sg_{i+1}" {{
     # Serveurs - Multi-cloud
     for i in range(servers):
         if provider == "aws":
-            code += f"""# Serveur {i+1}
+            yield f"""# Serveur {i+1}
 resource "aws_instance" "server_{i+1}" {{
   ami           = "{config["ami"]}"
   instance_type = "{config["instance_type"]}"
@@ -260,7 +266,7 @@ resource "aws_instance" "server_{i+1}" {{
 
 """
         elif provider == "azure":
-            code += f"""# VM {i+1} (Azure)
+            yield f"""# VM {i+1} (Azure)
 resource "azurerm_network_interface" "nic_{i+1}" {{
   name                = "nic-{i+1}"
   location            = azurerm_resource_group.main.location
@@ -292,6 +298,9 @@ resource "azurerm_linux_virtual_machine" "vm_{i+1}" {{
     storage_account_type = "Standard_LRS"
   }}
   
+  # Diagnostics de demarrage (compte de stockage gere) - politique de surveillance
+  boot_diagnostics {{}}
+  
   source_image_reference {{
     publisher = "{config["image_publisher"]}"
     offer     = "{config["image_offer"]}"
@@ -306,7 +315,7 @@ resource "azurerm_linux_virtual_machine" "vm_{i+1}" {{
 
 """
         elif provider == "gcp":
-            code += f"""# Instance {i+1} (GCP)
+            yield f"""# Instance {i+1} (GCP)
 resource "google_compute_instance" "server_{i+1}" {{
   name         = "server-{i+1}"
   machine_type = "{config["machine_type"]}"
@@ -322,6 +331,12 @@ resource "google_compute_instance" "server_{i+1}" {{
     subnetwork = google_compute_subnetwork.private.id
   }}
   
+  # Agents Cloud Logging et Cloud Monitoring (politique de surveillance)
+  metadata = {{
+    google-logging-enabled    = "true"
+    google-monitoring-enabled = "true"
+  }}
+  
   labels = {{
     environment = "production"
   }}
@@ -332,7 +347,7 @@ resource "google_compute_instance" "server_{i+1}" {{
     # Load Balancers - Multi-cloud
     for i in range(load_balancers):
         if provider == "aws":
-            code += f"""# Load Balancer {i+1} (AWS)
+            yield f"""# Load Balancer {i+1} (AWS)
 resource "aws_lb" "lb_{i+1}" {{
   name               = "lb-{i+1}"
   internal           = false
@@ -384,7 +399,7 @@ resource "aws_lb_listener" "listener_{i+1}" {{
 
 """
         elif provider == "azure":
-            code += f"""# Load Balancer {i+1} (Azure)
+            yield f"""# Load Balancer {i+1} (Azure)
 resource "azurerm_public_ip" "lb_ip_{i+1}" {{
   name                = "lb-ip-{i+1}"
   location            = azurerm_resource_group.main.location
@@ -439,7 +454,7 @@ resource "azurerm_lb_rule" "rule_{i+1}" {{
 
 """
         elif provider == "gcp":
-            code += f"""# Load Balancer {i+1} (GCP)
+            yield f"""# Load Balancer {i+1} (GCP)
 resource "google_compute_backend_service" "backend_{i+1}" {{
   name                  = "backend-{i+1}"
   protocol              = "HTTP"
@@ -502,22 +517,86 @@ resource "google_compute_global_forwarding_rule" "forwarding_rule_{i+1}" {{
 """
     
     # Bases de donnees - Multi-cloud avec politiques de securite
+    # Recupere les parametres securises (une fois pour toutes les DB)
+    secure_settings = get_secure_settings(provider) if databases > 0 else {}
     for i in range(databases):
-        # Recupere les parametres securises
-        secure_settings = get_secure_settings(provider)
-        
-        if provider == "aws":
+        if provider == "aws" and database_type == "mongodb":
+            # DocumentDB (compatible MongoDB): cluster, groupe de parametres de cluster et instance
+            yield f"""# Groupe de parametres du cluster {i+1} : connexions TLS obligatoires
+resource "aws_docdb_cluster_parameter_group" "db_{i+1}_params" {{
+  name   = "db-{i+1}-params"
+  family = "docdb5.0"
+  
+  parameter {{
+    name  = "tls"
+    value = "enabled"
+  }}
+}}
+
+# Cluster DocumentDB {i+1} (MONGODB) - Politiques de securite appliquees
+resource "aws_docdb_cluster" "db_{i+1}" {{
+  cluster_identifier = "db-{i+1}"
+  engine             = "docdb"
+  engine_version     = "5.0.0"
+  
+  master_username = "admin"
+  master_password = var.db_password
+  
+  vpc_security_group_ids = [aws_security_group.sg_1.id]
+  
+  # Politiques de securite injectees automatiquement
+  storage_encrypted               = {str(secure_settings.get("storage_encrypted", True)).lower()}
+  db_cluster_parameter_group_name = aws_docdb_cluster_parameter_group.db_{i+1}_params.name
+  
+  # Logs CloudWatch
+  enabled_cloudwatch_logs_exports = ["audit", "profiler"]
+  
+  # Sauvegardes
+  backup_retention_period = {secure_settings.get("backup_retention_period", 7)}
+  
+  tags = {{
+    Name        = "database-{i+1}"
+    Environment = "production"
+    DatabaseType = "{database_type}"
+  }}
+}}
+
+resource "aws_docdb_cluster_instance" "db_{i+1}_instance" {{
+  identifier         = "db-{i+1}-instance"
+  cluster_identifier = aws_docdb_cluster.db_{i+1}.id
+  instance_class     = "{config["docdb_class"]}"
+}}
+
+"""
+        elif provider == "aws":
             # Mapping des types de database vers engines AWS
             db_engines = {
                 "mysql": ("mysql", "8.0"),
                 "postgresql": ("postgres", "16.1"),
-                "mariadb": ("mariadb", "10.11"),
-                "mongodb": ("docdb", "5.0")  # DocumentDB pour MongoDB
+                "mariadb": ("mariadb", "10.11")
+            }
+            # Parametre imposant SSL/TLS aux connexions, par moteur (famille, nom, valeur)
+            tls_parameters = {
+                "mysql": ("mysql8.0", "require_secure_transport", "ON"),
+                "postgresql": ("postgres16", "rds.force_ssl", "1"),
+                "mariadb": ("mariadb10.11", "require_secure_transport", "ON")
             }
             
             engine, version = db_engines.get(database_type, ("mysql", "8.0"))
+            family, tls_parameter, tls_value = tls_parameters.get(database_type, tls_parameters["mysql"])
             
-            code += f"""# Base de donnees {i+1} ({database_type.upper()}) - Politiques de securite appliquees
+            yield f"""# Groupe de parametres de la base {i+1} : connexions SSL/TLS obligatoires
+resource "aws_db_parameter_group" "db_{i+1}_params" {{
+  name   = "db-{i+1}-params"
+  family = "{family}"
+  
+  parameter {{
+    name  = "{tls_parameter}"
+    value = "{tls_value}"
+  }}
+}}
+
+# Base de donnees {i+1} ({database_type.upper()}) - Politiques de securite appliquees
 resource "aws_db_instance" "db_{i+1}" {{
   identifier        = "db-{i+1}"
   engine            = "{engine}"
@@ -532,8 +611,9 @@ resource "aws_db_instance" "db_{i+1}" {{
   vpc_security_group_ids = [aws_security_group.sg_1.id]
   
   # Politiques de securite injectees automatiquement
-  publicly_accessible = {str(secure_settings.get("publicly_accessible", False)).lower()}
-  storage_encrypted   = {str(secure_settings.get("storage_encrypted", True)).lower()}
+  publicly_accessible  = {str(secure_settings.get("publicly_accessible", False)).lower()}
+  storage_encrypted    = {str(secure_settings.get("storage_encrypted", True)).lower()}
+  parameter_group_name = aws_db_parameter_group.db_{i+1}_params.name
   
   # Logs CloudWatch
   enabled_cloudwatch_logs_exports = {secure_settings.get("enabled_cloudwatch_logs_exports", ["error", "general", "slowquery"])}
@@ -552,7 +632,7 @@ resource "aws_db_instance" "db_{i+1}" {{
         elif provider == "azure":
             # Azure necessite des ressources differentes selon le type
             if database_type == "postgresql":
-                code += f"""# PostgreSQL Server {i+1} - Politiques de securite appliquees
+                yield f"""# PostgreSQL Server {i+1} - Politiques de securite appliquees
 resource "azurerm_postgresql_server" "db_{i+1}" {{
   name                = "postgresql-{i+1}"
   location            = azurerm_resource_group.main.location
@@ -573,6 +653,11 @@ resource "azurerm_postgresql_server" "db_{i+1}" {{
   # Sauvegardes
   backup_retention_days = {secure_settings.get("backup_retention_days", 7)}
   
+  # Surveillance : detection des menaces (Advanced Threat Protection)
+  threat_detection_policy {{
+    enabled = true
+  }}
+  
   tags = {{
     Environment = "production"
     DatabaseType = "postgresql"
@@ -581,7 +666,7 @@ resource "azurerm_postgresql_server" "db_{i+1}" {{
 
 """
             elif database_type == "mariadb":
-                code += f"""# MariaDB Server {i+1} - Politiques de securite appliquees
+                yield f"""# MariaDB Server {i+1} - Politiques de securite appliquees
 resource "azurerm_mariadb_server" "db_{i+1}" {{
   name                = "mariadb-{i+1}"
   location            = azurerm_resource_group.main.location
@@ -602,6 +687,11 @@ resource "azurerm_mariadb_server" "db_{i+1}" {{
   # Sauvegardes
   backup_retention_days = {secure_settings.get("backup_retention_days", 7)}
   
+  # Surveillance : detection des menaces (Advanced Threat Protection)
+  threat_detection_policy {{
+    enabled = true
+  }}
+  
   tags = {{
     Environment = "production"
     DatabaseType = "mariadb"
@@ -610,7 +700,7 @@ resource "azurerm_mariadb_server" "db_{i+1}" {{
 
 """
             else:  # mysql ou mongodb (Azure n'a pas MongoDB natif)
-                code += f"""# MySQL Server {i+1} - Politiques de securite appliquees
+                yield f"""# MySQL Server {i+1} - Politiques de securite appliquees
 resource "azurerm_mysql_server" "db_{i+1}" {{
   name                = "mysql-{i+1}"
   location            = azurerm_resource_group.main.location
@@ -631,6 +721,11 @@ resource "azurerm_mysql_server" "db_{i+1}" {{
   # Sauvegardes
   backup_retention_days = {secure_settings.get("backup_retention_days", 7)}
   
+  # Surveillance : detection des menaces (Advanced Threat Protection)
+  threat_detection_policy {{
+    enabled = true
+  }}
+  
   tags = {{
     Environment = "production"
     DatabaseType = "{database_type}"
@@ -649,7 +744,7 @@ resource "azurerm_mysql_server" "db_{i+1}" {{
             
             db_version = gcp_db_versions.get(database_type, "MYSQL_8_0")
             
-            code += f"""# Cloud SQL {i+1} ({database_type.upper()}) - Politiques de securite appliquees
+            yield f"""# Cloud SQL {i+1} ({database_type.upper()}) - Politiques de securite appliquees
 resource "google_sql_database_instance" "db_{i+1}" {{
   name             = "db-{i+1}"
   database_version = "{db_version}"
@@ -682,7 +777,7 @@ resource "google_sql_database_instance" "db_{i+1}" {{
 
 """
         elif provider == "openstack":
-            code += f"""# Base de donnees {i+1} ({database_type.upper()}) - Politiques de securite appliquees
+            yield f"""# Base de donnees {i+1} ({database_type.upper()}) - Politiques de securite appliquees
 resource "openstack_db_instance_v1" "db_{i+1}" {{
   name      = "db-{i+1}"
   flavor_id = "{config["db_flavor"]}"
@@ -698,7 +793,7 @@ resource "openstack_db_instance_v1" "db_{i+1}" {{
     
     # Variables sensibles si necessaire
     if databases > 0:
-        code += """# Variables sensibles
+        yield """# Variables sensibles
 variable "db_password" {
   description = "Mot de passe base de donnees"
   type        = string
@@ -710,14 +805,14 @@ variable "db_password" {
     # Variables pour load balancers
     if load_balancers > 0:
         if provider == "aws":
-            code += """variable "ssl_certificate_arn" {
+            yield """variable "ssl_certificate_arn" {
   description = "ARN du certificat SSL pour le load balancer"
   type        = string
 }
 
 """
         elif provider == "gcp":
-            code += """variable "gcp_ssl_certificate_id" {
+            yield """variable "gcp_ssl_certificate_id" {
   description = "ID du certificat SSL GCP"
   type        = string
 }
@@ -725,56 +820,138 @@ variable "db_password" {
 """
     
     if provider == "gcp":
-        code += """variable "gcp_project_id" {
+        yield """variable "gcp_project_id" {
   type = string
 }
 
 """
     elif provider == "openstack":
-        code += """variable "openstack_auth_url" {
+        yield """variable "openstack_auth_url" {
   type = string
 }
 
 """
     
     # Outputs
-    code += """# Outputs
+    yield """# Outputs
 output "infrastructure_id" {
   value = "infra-generated"
 }
 
 """
-    
-    return code
 
 
-def generate_terraform(infra: dict) -> str:
+def generate_terraform_single_provider(provider_config: dict) -> str:
     """
-    JSON infrastructure -> Code Terraform securise multi-cloud
-    Supporte mono et multi-provider
-    Format attendu: {"providers": [{"provider": "aws", "servers": 3, ...}]}
+    Genere le code Terraform pour un provider unique
+    Extrait de l'ancienne fonction generate_terraform()
+    """
+    return "".join(iter_terraform_single_provider(provider_config))
+
+
+def iter_terraform(infra: dict):
+    """
+    JSON infrastructure -> Code Terraform securise multi-cloud, en flux
+    Produit les memes morceaux que generate_terraform(), sans jamais
+    construire le fichier complet (mode grande echelle)
     """
     providers = infra.get("providers", [])
     
     # Si pas de providers, retourne vide
     if not providers:
-        return "# Erreur: aucun provider specifie\n"
+        yield "# Erreur: aucun provider specifie\n"
+        return
     
     # Cas mono-provider: genere directement
     if len(providers) == 1:
-        return generate_terraform_single_provider(providers[0])
+        yield from iter_terraform_single_provider(providers[0])
+        return
     
-    # Cas multi-provider: concatene les codes Terraform
-    terraform_code = "# Infrastructure Multi-Cloud\n"
-    terraform_code += "# Genere automatiquement avec politiques de securite\n\n"
-    terraform_code += "# ATTENTION: Ce fichier contient plusieurs providers\n"
-    terraform_code += "# Il peut etre necessaire de le separer en plusieurs fichiers pour terraform apply\n\n"
+    # Cas multi-provider: enchaine les sections
+    yield "# Infrastructure Multi-Cloud\n"
+    yield "# Genere automatiquement avec politiques de securite\n\n"
+    yield "# ATTENTION: Ce fichier contient plusieurs providers\n"
+    yield "# Il peut etre necessaire de le separer en plusieurs fichiers pour terraform apply\n\n"
     
     for idx, provider_config in enumerate(providers, 1):
         provider_name = provider_config.get("provider", "unknown").upper()
-        terraform_code += f"\n{'#' * 80}\n"
-        terraform_code += f"# SECTION {idx}: {provider_name}\n"
-        terraform_code += f"{'#' * 80}\n\n"
-        terraform_code += generate_terraform_single_provider(provider_config)
+        yield f"\n{'#' * 80}\n"
+        yield f"# SECTION {idx}: {provider_name}\n"
+        yield f"{'#' * 80}\n\n"
+        yield from iter_terraform_single_provider(provider_config)
+
+
+def generate_terraform(infra: dict) -> str:
+    """
+    JSON infrastructure -> Code Terraform securise multi-cloud
+    Supporte mono et multi-provider
+    Format attendu: {"providers": [{"provider": "aws", "servers": 3, ...}]}
+    """
+    return "".join(iter_terraform(infra))
+
+
+def _section_dirname(idx: int, provider_config: dict) -> str:
+    """Nom du dossier d'une section (prefixe par l'index pour rester unique)"""
+    provider = provider_config.get("provider", "aws").lower()
+    return f"{idx:02d}_{provider}"
+
+
+def generate_terraform_sections(infra: dict, max_workers: int = None, use_processes: bool = False) -> list:
+    """
+    Genere chaque section provider en parallele, une section = un module Terraform
+    
+    Args:
+        infra: Infrastructure au format {"providers": [...]}
+        max_workers: Taille du pool (defaut: un worker par provider)
+        use_processes: ProcessPoolExecutor au lieu de threads (utile pour les
+            grosses sections, la generation etant du Python pur soumis au GIL)
+    
+    Returns:
+        list: [(nom_dossier, code_terraform)] dans l'ordre des providers
+    """
+    providers = infra.get("providers", [])
+    if not providers:
+        return []
+    
+    # Une seule section: pas besoin de pool
+    if len(providers) == 1:
+        return [(_section_dirname(1, providers[0]), generate_terraform_single_provider(providers[0]))]
+    
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers=max_workers or len(providers)) as executor:
+        # map conserve l'ordre des providers
+        codes = list(executor.map(generate_terraform_single_provider, providers))
+    
+    return [
+        (_section_dirname(idx, provider_config), code)
+        for idx, (provider_config, code) in enumerate(zip(providers, codes), 1)
+    ]
+
+
+def generate_terraform_archive(infra: dict, max_workers: int = None, use_processes: bool = False) -> bytes:
+    """
+    JSON infrastructure -> archive zip en memoire, un dossier par provider
+    Chaque dossier contient un main.tf autonome: plan/apply possibles en parallele
+    
+    Structure:
+        manifest.json
+        01_aws/main.tf
+        02_gcp/main.tf
+        ...
+    """
+    sections = generate_terraform_sections(infra, max_workers=max_workers, use_processes=use_processes)
+    
+    manifest = {
+        "sections": [
+            {"directory": dirname, "provider": provider_config.get("provider", "aws").lower()}
+            for (dirname, _), provider_config in zip(sections, infra.get("providers", []))
+        ]
+    }
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        for dirname, code in sections:
+            archive.writestr(f"{dirname}/main.tf", code)
     
-    return terraform_code
\ No newline at end of file
+    return buffer.getvalue()
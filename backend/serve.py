@@ -0,0 +1,111 @@
+"""
+Serveur de production (gunicorn, prefork)
+
+Le maître importe l'application avant de forker les workers : politiques,
+table de conformité, plans de règles, modèles Pydantic et caches sont
+construits une fois et partagés en copie sur écriture. gc.freeze() range
+ces objets hors de portée du ramasse-miettes, qui sinon réécrirait leurs
+pages dans chaque worker. Les threads d'écriture (journal, historique) et
+le pool des jobs ne survivent pas au fork : arrêtés dans le maître,
+relancés dans chaque worker. Un worker recyclé (--max-requests) ou arrêté
+(SIGTERM) termine ses jobs en cours et écrit les runs en attente avant de
+sortir.
+
+Usage (depuis backend/):
+    python serve.py --workers 4 --threads 4
+"""
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+# Appel Gemini borné à 30 s (nlp.GEMINI_TIMEOUT): marge avant qu'un worker ne soit tué
+DEFAULT_TIMEOUT = 60
+
+
+def post_fork(server, worker):
+    """Worker: ramasse-miettes réactivé, threads d'écriture et pool des jobs relancés"""
+    gc.enable()
+    from app import job_queue, run_journal, runs_history
+    run_journal.start()
+    runs_history.start()
+    job_queue.start()
+
+
+def worker_exit(server, worker):
+    """Arrêt ou recyclage du worker: jobs en cours terminés, runs en attente écrits sur disque"""
+    from app import job_queue, run_journal, runs_history
+    from modules.security_rules import shutdown_process_pool
+    job_queue.close(timeout=server.cfg.graceful_timeout)
+    run_journal.close()
+    runs_history.close()
+    shutdown_process_pool()
+
+
+class ProductionServer(BaseApplication):
+    """Application gunicorn configurée par un dictionnaire d'options"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if not self.cfg.preload_app:
+            from app import app
+            return app
+
+        # Maître: tout ce qui est construit à l'import reste partagé par les workers
+        gc.disable()
+        from app import app, job_queue, run_journal, runs_history
+        job_queue.close()
+        run_journal.close()
+        runs_history.close()
+        gc.freeze()
+        return app
+
+
+def server_options(args: argparse.Namespace) -> dict:
+    """Options gunicorn (threads > 1: workers gthread, sinon sync)"""
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "preload_app": args.preload,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Serveur de production du backend (gunicorn)")
+    parser.add_argument("--bind", default=os.getenv("SERVE_BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("SERVE_WORKERS") or 2 * (os.cpu_count() or 1) + 1))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SERVE_THREADS", "4")),
+                        help="Threads par worker (attente de Gemini)")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("SERVE_MAX_REQUESTS", "1000")),
+                        help="Requêtes avant recyclage d'un worker (0 = jamais)")
+    parser.add_argument("--max-requests-jitter", type=int,
+                        default=int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "100")),
+                        help="Écart aléatoire pour que les workers ne redémarrent pas ensemble")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("SERVE_TIMEOUT", str(DEFAULT_TIMEOUT))))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30")),
+                        help="Délai laissé aux requêtes en cours à l'arrêt")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        default=os.getenv("SERVE_PRELOAD", "1") != "0",
+                        help="Chaque worker importe l'application (pas de partage)")
+    ProductionServer(server_options(parser.parse_args(argv))).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Configuration commune des tests
+
+Les bases SQLite, le journal et le stockage du Terraform créés à l'import de
+app pointent vers un dossier temporaire propre à la session, supprimé à la
+fin: rien n'est écrit dans backend/logs/ ni conservé d'une exécution à l'autre.
+"""
+import os
+import shutil
+import tempfile
+
+_LOG_PATHS = {
+    "QUOTA_DB": "quota.db",
+    "HISTORY_DB": "history.db",
+    "HISTORY_LEGACY_FILE": "history.json",
+    "IDEMPOTENCY_DB": "idempotency.db",
+    "JOBS_DB": "jobs.db",
+    "JOURNAL_DIR": "journal",
+    "TERRAFORM_STORE_DIR": "terraform",
+}
+
+_logs_dir = None
+
+
+def pytest_configure(config):
+    """Avant l'import des modules de test (et donc de app)"""
+    global _logs_dir
+    _logs_dir = tempfile.mkdtemp(prefix="backend-tests-")
+    for variable, name in _LOG_PATHS.items():
+        os.environ[variable] = os.path.join(_logs_dir, name)
+    os.environ["RATELIMIT_STORAGE_URI"] = "sqlite:///" + os.path.join(_logs_dir, "ratelimit.db")
+
+
+def pytest_unconfigure(config):
+    if _logs_dir is not None:
+        shutil.rmtree(_logs_dir, ignore_errors=True)
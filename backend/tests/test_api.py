@@ -3,7 +3,8 @@ Tests d'intégration pour l'API Flask
 """
 import pytest
 import os
-from app import app
+import json
+from app import app, runs_history
 
 
 @pytest.fixture
@@ -56,6 +57,25 @@ class TestAPI:
         assert "security" in data
         assert "terraform" in data
     
+    def test_generate_zip_format(self, client):
+        """Test génération avec archive zip"""
+        os.environ["AI_MODE"] = "mock"
+        response = client.post('/generate?format=zip',
+                              json={"description": "Je veux un serveur AWS"})
+        assert response.status_code == 200
+        assert response.mimetype == "application/zip"
+        assert response.data[:2] == b"PK"
+    
+    def test_generate_large_scale_stream(self, client):
+        """Test mode grande échelle: Terraform streamé, verdict en en-têtes"""
+        os.environ["AI_MODE"] = "mock"
+        response = client.post('/generate',
+                              json={"description": "Je veux 200 serveurs AWS", "large_scale": True})
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        assert response.headers["X-Security-Status"] == "OK"
+        assert response.get_data(as_text=True).count('resource "aws_instance"') == 200
+    
     def test_history_endpoint(self, client):
         """Test endpoint history"""
         response = client.get('/api/history')
@@ -63,3 +83,62 @@ class TestAPI:
         data = response.get_json()
         assert "runs" in data
         assert "total" in data
+        assert "next_cursor" in data
+
+    def test_history_filters(self, client):
+        """Test history filtré par provider et statut, pagination par curseur"""
+        os.environ["AI_MODE"] = "mock"
+        for _ in range(3):
+            client.post('/generate', json={"description": "Je veux un serveur AWS"})
+        assert runs_history.flush()
+        response = client.get('/api/history?provider=aws&security_status=OK&limit=2')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert len(data["runs"]) == 2
+        assert data["next_cursor"] is not None
+        assert all(run["security_status"] == "OK" for run in data["runs"])
+
+        older = client.get(f'/api/history?provider=aws&limit=2&cursor={data["next_cursor"]}').get_json()
+        assert older["runs"] and older["runs"][-1]["timestamp"] <= data["runs"][0]["timestamp"]
+        assert client.get('/api/history?since=hier').status_code == 400
+    
+    def test_stats_endpoint(self, client):
+        """Test statistiques agrégées: compteurs et latences par étape, fenêtre de temps"""
+        os.environ["AI_MODE"] = "mock"
+        client.post('/generate', json={"description": "Je veux un serveur AWS"})
+        data = client.get('/api/stats').get_json()
+        assert data["runs"] >= 1
+        assert data["providers"]["aws"] >= 1
+        assert {"extraction", "generation", "validation", "total"} <= set(data["stages"])
+
+        windowed = client.get('/api/stats?window=300').get_json()
+        assert windowed["runs"] >= 1
+        assert windowed["timeline"][-1]["runs"] >= 1
+        assert client.get('/api/stats?window=0').status_code == 400
+
+    def test_metrics_endpoint(self, client):
+        """Test endpoint metrics: statistiques du cache des verdicts"""
+        response = client.get('/api/metrics')
+        assert response.status_code == 200
+        data = response.get_json()
+        for cache in (data["verdict_cache"], data["block_cache"]):
+            assert {"hits", "misses", "hit_ratio", "saved_ms", "size"} <= set(cache)
+        # Latence par règle: histogrammes et règles les plus coûteuses
+        assert {"rules", "slowest"} <= set(data["rules"])
+        assert {"written", "dropped", "pending"} <= set(data["journal"])
+    
+    def test_audit_endpoint(self, client, tmp_path, monkeypatch):
+        """Test audit NDJSON limité à AUDIT_ROOT"""
+        (tmp_path / "infra").mkdir()
+        (tmp_path / "infra" / "main.tf").write_text('resource "aws_instance" "web" {\n  monitoring = true\n}\n')
+        monkeypatch.setenv("AUDIT_ROOT", str(tmp_path))
+
+        response = client.post('/api/audit', json={"path": "infra"})
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert lines[0]["file"] == "infra/main.tf"
+        assert lines[-1]["summary"]["files"] == 1
+
+        response = client.post('/api/audit', json={"path": "../"})
+        assert response.status_code == 400
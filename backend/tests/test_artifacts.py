@@ -0,0 +1,121 @@
+"""
+Tests pour le stockage du Terraform par empreinte (modules/artifacts.py, /terraform/<sha256>)
+"""
+import gzip
+import hashlib
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("AI_MODE", "mock")
+
+from app import app
+from modules.artifacts import CHUNK_BYTES, TerraformStore
+
+TERRAFORM = 'resource "aws_instance" "web" {\n  ami = "ami-123"\n}\n' * 5000
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+class TestTerraformStore:
+    """Tests pour l'écriture, la lecture et la purge"""
+
+    def test_put_is_content_addressed(self, tmp_path):
+        store = TerraformStore(str(tmp_path))
+        digest = store.put(TERRAFORM)
+        assert digest == hashlib.sha256(TERRAFORM.encode()).hexdigest()
+        assert store.put(TERRAFORM) == digest
+        assert store.stats()["writes"] == 1 and store.stats()["puts"] == 2
+
+        path, size, encoding = store.locate(digest)
+        assert encoding is None and size == len(TERRAFORM.encode())
+        chunks = list(store.read(path))
+        assert len(chunks) == -(-size // CHUNK_BYTES)
+        assert b"".join(chunks).decode() == TERRAFORM
+
+    def test_gzip_variant(self, tmp_path):
+        store = TerraformStore(str(tmp_path))
+        digest = store.put(TERRAFORM)
+        path, size, encoding = store.locate(digest, accept_gzip=True)
+        assert encoding == "gzip"
+        assert size < len(TERRAFORM) / 10
+        assert gzip.decompress(b"".join(store.read(path))).decode() == TERRAFORM
+
+    def test_unknown_or_invalid_digest(self, tmp_path):
+        store = TerraformStore(str(tmp_path))
+        assert store.locate("0" * 64) is None
+        assert store.locate("../../etc/passwd") is None
+        assert store.locate("A" * 64) is None
+
+    def test_prune_oldest_first(self, tmp_path):
+        """Test purge des artefacts les plus anciens au-delà de max_bytes, récents gardés"""
+        store = TerraformStore(str(tmp_path), max_bytes=3000)
+        digests = []
+        for index in range(4):
+            digests.append(store.put(f"# module {index}\n" + "x" * 1000))
+            path = store.locate(digests[-1])[0]
+            os.utime(path, (time.time() - 100 + index, time.time() - 100 + index))
+        # Réécriture: le premier redevient le plus récent
+        store.put("# module 0\n" + "x" * 1000)
+        store.prune()
+        assert store.locate(digests[0]) is not None
+        assert store.locate(digests[1]) is None
+        assert store.locate(digests[3]) is not None
+        assert store.stats()["pruned"] >= 1
+
+
+class TestTerraformAPI:
+    """Tests pour /generate?format=ref et GET /terraform/<sha256>"""
+
+    def test_lean_response_and_fetch(self, client):
+        """Test réponse sans Terraform, contenu identique servi par empreinte"""
+        body = {"description": "Je veux 3 serveurs AWS avec une base postgresql (ref)"}
+        environ = {"REMOTE_ADDR": "10.0.6.1"}
+        inline = client.post('/generate', json=body, environ_base=environ).get_json()
+        lean = client.post('/generate?format=ref', json=body, environ_base=environ).get_json()
+
+        assert "terraform" not in lean
+        assert lean["json"] == inline["json"]
+        assert lean["security"] == "OK"
+        assert lean["terraform_sha256"] == hashlib.sha256(inline["terraform"].encode()).hexdigest()
+        assert lean["terraform_size"] == len(inline["terraform"].encode())
+
+        response = client.get(lean["terraform_url"])
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == inline["terraform"]
+        assert response.headers["ETag"] == f'"{lean["terraform_sha256"]}"'
+        assert "immutable" in response.headers["Cache-Control"]
+
+    def test_conditional_and_gzip(self, client):
+        """Test 304 si l'ETag correspond, variante gzip selon Accept-Encoding"""
+        lean = client.post('/generate?format=ref', json={"description": "Je veux 2 serveurs GCP (ref gzip)"},
+                           environ_base={"REMOTE_ADDR": "10.0.6.2"}).get_json()
+        url = lean["terraform_url"]
+        first = client.get(url)
+        cached = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        assert cached.status_code == 304
+        assert cached.get_data() == b""
+        assert cached.headers["ETag"] == first.headers["ETag"]
+
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert compressed.headers["Vary"] == "Accept-Encoding"
+        assert int(compressed.headers["Content-Length"]) == len(compressed.get_data())
+        assert gzip.decompress(compressed.get_data()) == first.get_data()
+        assert client.get(url, headers={"Accept-Encoding": "gzip",
+                                        "If-None-Match": compressed.headers["ETag"]}).status_code == 304
+
+    def test_blocked_and_unknown(self, client):
+        """Test verdict NOT_OK inchangé, empreinte inconnue ou invalide: 404"""
+        blocked = client.post('/generate?format=ref', json={"description": "Je veux une base de donnees MySQL publique"},
+                              environ_base={"REMOTE_ADDR": "10.0.6.3"}).get_json()
+        assert blocked["terraform"] == "BLOCKED"
+        assert "terraform_sha256" not in blocked
+        assert client.get(f"/terraform/{'0' * 64}").status_code == 404
+        assert client.get("/terraform/pas-une-empreinte").status_code == 404
@@ -0,0 +1,153 @@
+"""
+Tests d'intégration pour le point d'entrée ASGI (/generate asynchrone)
+"""
+import asyncio
+import hashlib
+import io
+import os
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+os.environ.setdefault("AI_MODE", "mock")
+
+import app as app_module
+from app import app
+import asgi
+from asgi import application
+from modules.rate_limit import MemoryBucketStore, TokenBucketLimiter
+
+
+def call(method: str, path: str, client_ip: str, **kwargs) -> httpx.Response:
+    """Requête sur l'application ASGI, depuis l'adresse client_ip (limite par IP)"""
+    async def send():
+        transport = httpx.ASGITransport(app=application, client=(client_ip, 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+class TestASGI:
+    """Tests pour le contrat de /generate en mode ASGI"""
+
+    def test_generate_same_contract_as_flask(self):
+        """Test même corps JSON qu'en mode WSGI (hors horodatage du rapport)"""
+        os.environ["AI_MODE"] = "mock"
+        body = {"description": "Je veux 3 serveurs AWS avec une base postgresql"}
+        response = call("POST", "/generate", "10.0.0.1", json=body)
+        assert response.status_code == 200
+        assert response.headers["access-control-allow-origin"] == "*"
+        data = response.json()
+
+        with app.test_client() as client:
+            expected = client.post('/generate', json=body, environ_base={"REMOTE_ADDR": "10.0.1.1"}).get_json()
+        assert data.keys() == expected.keys()
+        assert data["json"] == expected["json"]
+        assert data["terraform"] == expected["terraform"]
+        assert data["security_report"]["score"] == expected["security_report"]["score"]
+
+    def test_generate_errors(self):
+        """Test erreurs 400 identiques (JSON invalide, description vide)"""
+        response = call("POST", "/generate", "10.0.0.2", content=b"{pas du json",
+                        headers={"content-type": "application/json"})
+        assert response.status_code == 400
+        assert response.json()["error"] == "JSON invalide"
+        response = call("POST", "/generate", "10.0.0.2", json={"description": "  "})
+        assert response.status_code == 400
+        assert response.json()["error"] == "Description vide"
+
+    def test_no_request_limit_on_generate(self):
+        """Test pas de limite en requêtes sur /generate (quota seul), limite par défaut sur les autres routes"""
+        body = {"description": "Je veux 2 serveurs GCP (asgi sans limite)"}
+        statuses = [call("POST", "/generate", "10.0.0.3", json=body).status_code for _ in range(30)]
+        assert statuses == [200] * 30
+        # Routes servies par Flask: 10 requêtes par minute et par IP
+        statuses = [call("GET", "/api/stats", "10.0.0.4").status_code for _ in range(11)]
+        assert statuses == [200] * 10 + [429]
+
+    def test_quota_shared_with_flask(self, monkeypatch):
+        """Test extractions WSGI et ASGI d'une même IP débitées du même quota"""
+        monkeypatch.setattr(app_module, "quota", TokenBucketLimiter(2, 1 / 60, MemoryBucketStore()))
+        environ = {"REMOTE_ADDR": "10.0.0.10"}
+        with app.test_client() as flask_client:
+            assert flask_client.post("/generate", json={"description": "Je veux 1 serveur Azure (partage)"},
+                                     environ_base=environ).status_code == 200
+            assert call("POST", "/generate", "10.0.0.10",
+                        json={"description": "Je veux 2 serveurs Azure (partage)"}).status_code == 200
+            assert call("POST", "/generate", "10.0.0.10",
+                        json={"description": "Je veux 3 serveurs Azure (partage)"}).status_code == 429
+            assert flask_client.post("/generate", json={"description": "Je veux 4 serveurs Azure (partage)"},
+                                     environ_base=environ).status_code == 429
+
+    def test_lifespan_shutdown_closes_jobs(self, monkeypatch):
+        """Test arrêt (lifespan): pool des jobs fermé, runs en attente écrits"""
+        closed = []
+        monkeypatch.setattr(app_module.job_queue, "close", lambda *args, **kwargs: closed.append("jobs"))
+        monkeypatch.setattr(asgi, "executor", ThreadPoolExecutor(max_workers=1))
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(application({"type": "lifespan"}, receive, send))
+        assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+        assert closed == ["jobs"]
+
+    def test_quota_spares_cache_hits(self, monkeypatch):
+        """Test quota épuisé: 429 avec Retry-After, description en cache toujours servie"""
+        monkeypatch.setattr(app_module, "quota", TokenBucketLimiter(2, 1 / 60, MemoryBucketStore()))
+        descriptions = [f"Je veux {n} serveurs AWS derriere un load balancer (asgi)" for n in (1, 2, 3)]
+        assert call("POST", "/generate", "10.0.0.7", json={"description": descriptions[0]}).status_code == 200
+        assert call("POST", "/generate", "10.0.0.7", json={"description": descriptions[1]}).status_code == 200
+        response = call("POST", "/generate", "10.0.0.7", json={"description": descriptions[2]})
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) == response.json()["retry_after"] >= 1
+        for _ in range(5):
+            assert call("POST", "/generate", "10.0.0.7", json={"description": descriptions[0]}).status_code == 200
+
+    def test_idempotency_key_replayed(self):
+        """Test copie avec la même Idempotency-Key: réponse rejouée à l'identique"""
+        body = {"description": "Je veux 2 serveurs GCP et un load balancer (asgi idempotence)"}
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        first = call("POST", "/generate", "10.0.0.8", json=body, headers=headers)
+        second = call("POST", "/generate", "10.0.0.8", json=body, headers=headers)
+        assert first.status_code == second.status_code == 200
+        assert second.content == first.content
+        assert second.headers["idempotent-replayed"] == "true"
+        assert second.headers["content-type"] == "application/json"
+
+    def test_terraform_reference(self):
+        """Test ?format=ref: Terraform servi par empreinte (route Flask déléguée)"""
+        body = {"description": "Je veux 2 serveurs AWS et une base postgresql (asgi ref)"}
+        lean = call("POST", "/generate?format=ref", "10.0.0.9", json=body).json()
+        assert "terraform" not in lean
+        terraform = call("GET", lean["terraform_url"], "10.0.0.9")
+        assert terraform.status_code == 200
+        assert hashlib.sha256(terraform.content).hexdigest() == lean["terraform_sha256"]
+        cached = call("GET", lean["terraform_url"], "10.0.0.9", headers={"If-None-Match": terraform.headers["etag"]})
+        assert cached.status_code == 304
+
+    def test_zip_and_large_scale_stream(self):
+        """Test archive zip et Terraform streamé en mode grande échelle"""
+        os.environ["AI_MODE"] = "mock"
+        response = call("POST", "/generate?format=zip", "10.0.0.5", json={"description": "Je veux un serveur AWS"})
+        assert response.headers["content-type"] == "application/zip"
+        assert zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+
+        response = call("POST", "/generate", "10.0.0.5",
+                        json={"description": "Je veux 300 serveurs AWS", "large_scale": True})
+        assert response.status_code == 200
+        assert response.headers["x-security-status"] == "OK"
+        assert response.text.count('resource "aws_instance"') == 300
+
+    def test_other_routes_served_by_flask(self):
+        """Test routes hors /generate déléguées à l'application Flask"""
+        response = call("GET", "/health", "10.0.0.6")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ok"
@@ -0,0 +1,66 @@
+"""
+Tests unitaires pour le module Audit
+"""
+import pytest
+import json
+from modules.audit import audit_tree, iter_tf_files, main
+from modules.terraform_gen import generate_terraform, generate_terraform_single_provider
+
+
+@pytest.fixture
+def tf_tree(tmp_path):
+    """Arborescence .tf: un module AWS généré, une base Azure non conforme, un .terraform ignoré"""
+    (tmp_path / "web").mkdir()
+    (tmp_path / "web" / "main.tf").write_text(generate_terraform_single_provider({"provider": "aws", "servers": 2}))
+    (tmp_path / "db").mkdir()
+    (tmp_path / "db" / "db.tf").write_text(
+        'resource "azurerm_mysql_server" "db" {\n'
+        '  public_network_access_enabled = true\n'
+        '  administrator_login_password  = "hunter2"\n'
+        '}\n'
+    )
+    (tmp_path / "web" / ".terraform").mkdir()
+    (tmp_path / "web" / ".terraform" / "vendored.tf").write_text("ignore")
+    (tmp_path / "README.md").write_text("pas du terraform")
+    return tmp_path
+
+
+class TestAudit:
+    """Tests pour l'audit de fichiers Terraform existants"""
+
+    def test_iter_tf_files(self, tf_tree):
+        """Test parcours: seuls les .tf, hors .terraform"""
+        files = [path.replace(str(tf_tree), "") for path in iter_tf_files(str(tf_tree))]
+        assert files == ["/db/db.tf", "/web/main.tf"]
+
+    def test_audit_tree(self, tf_tree):
+        """Test un résultat par fichier puis le résumé"""
+        results = list(audit_tree(str(tf_tree), max_workers=2))
+        files = {r["file"].replace(str(tf_tree), ""): r for r in results[:-1]}
+        assert files["/web/main.tf"]["status"] == "OK"
+        db = files["/db/db.tf"]
+        # Pas de bloc provider: déduit des types de ressources
+        assert db["provider"] == "azure"
+        assert db["status"] == "NOT_OK"
+        assert "no_hardcoded_credentials" in [v["rule"] for v in db["violations"]]
+
+        summary = results[-1]["summary"]
+        assert summary["files"] == 2 and summary["ok"] == 1 and summary["not_ok"] == 1
+        assert summary["files_per_sec"] > 0
+
+    def test_audit_multi_cloud_file(self, tmp_path):
+        """Test fichier multi-cloud: chaque section avec les règles de son provider, pool partagé"""
+        infra = {"providers": [{"provider": p, "servers": 2, "databases": 1} for p in ["aws", "openstack"]]}
+        (tmp_path / "main.tf").write_text(generate_terraform(infra))
+        results = list(audit_tree(str(tmp_path)))
+        result = results[0]
+        assert result["provider"] == "multi-cloud"
+        assert set(result["by_provider"]) == {"aws", "openstack"}
+        assert result["security_score"] == 100 and result["violations"] == []
+
+    def test_cli(self, tf_tree, capsys):
+        """Test CLI: NDJSON sur stdout, code de sortie 1 si un fichier est bloqué"""
+        assert main(["audit", str(tf_tree / "web"), "--workers", "1"]) == 0
+        assert main(["audit", str(tf_tree), "--workers", "1"]) == 1
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert "summary" in lines[-1]
@@ -0,0 +1,114 @@
+"""
+Tests pour la génération par lots (/generate/batch)
+"""
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("AI_MODE", "mock")
+
+import app as app_module
+from app import app, parse_batch_request, GenerateError
+from modules.rate_limit import MemoryBucketStore, TokenBucketLimiter
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def post_batch(client, descriptions, ip: str, **extra):
+    response = client.post('/generate/batch', json=dict(extra, descriptions=descriptions),
+                           environ_base={"REMOTE_ADDR": ip})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()] \
+        if response.mimetype == "application/x-ndjson" else []
+    return response, lines
+
+
+class TestBatchParsing:
+    """Tests pour la validation et la déduplication du lot"""
+
+    def test_duplicates_grouped(self):
+        descriptions, unique = parse_batch_request({"descriptions": [
+            "Je veux un serveur AWS", "  Je veux  un serveur AWS ", "Je veux un serveur GCP"
+        ]})
+        assert len(descriptions) == 3
+        assert unique == {"Je veux un serveur AWS": [0, 1], "Je veux un serveur GCP": [2]}
+
+    @pytest.mark.parametrize("data,status", [
+        (None, 400),
+        ({"descriptions": []}, 400),
+        ({"descriptions": "un serveur"}, 400),
+        ({"descriptions": ["un serveur", ""]}, 400),
+        ({"descriptions": ["un serveur", 3]}, 400),
+        ({"descriptions": ["un serveur"], "large_scale": True}, 400),
+        ({"descriptions": ["un serveur"] * 51}, 413),
+    ])
+    def test_invalid_batches(self, data, status):
+        with pytest.raises(GenerateError) as error:
+            parse_batch_request(data)
+        assert error.value.status == status
+
+
+class TestBatchAPI:
+    """Tests pour la réponse NDJSON et la limite de débit"""
+
+    def test_items_carry_generate_fields(self, client):
+        """Test une ligne par description (mêmes champs que /generate), doublon, résumé"""
+        descriptions = [
+            "Je veux 2 serveurs AWS avec une base postgresql",
+            "Je veux une base de donnees MySQL publique",
+            "Je veux 2 serveurs AWS avec une base postgresql",
+        ]
+        response, lines = post_batch(client, descriptions, "10.0.3.1")
+        assert response.status_code == 200
+        items, summary = lines[:-1], lines[-1]["summary"]
+        assert sorted(item["index"] for item in items) == [0, 1, 2]
+        assert summary == {"items": 3, "unique": 2, "ok": 2, "not_ok": 1, "errors": 0}
+
+        by_index = {item["index"]: item for item in items}
+        assert by_index[2]["duplicate_of"] == 0
+        assert by_index[1]["security"] == "NOT_OK"
+        expected = client.post('/generate', json={"description": descriptions[0]},
+                               environ_base={"REMOTE_ADDR": "10.0.3.2"}).get_json()
+        for index in (0, 2):
+            assert by_index[index]["http_status"] == 200
+            for field in ("json", "security", "terraform"):
+                assert by_index[index][field] == expected[field]
+
+    def test_item_errors_reported_inline(self, client):
+        """Test erreur d'une description (limite pédagogique) sans interrompre le lot"""
+        response, lines = post_batch(client, ["Je veux 1000 serveurs AWS", "Je veux un serveur AWS"], "10.0.3.3")
+        assert response.status_code == 200
+        failed = [line for line in lines[:-1] if line["http_status"] != 200]
+        assert len(failed) == 1
+        assert failed[0]["http_status"] == 422
+        assert "error" in failed[0] and "security" not in failed[0]
+        assert lines[-1]["summary"]["errors"] == 1
+
+    def test_quota_counts_distinct_extractions(self, client, monkeypatch):
+        """Test quota débité par extraction faite: doublons et descriptions en cache gratuits"""
+        quota = TokenBucketLimiter(capacity=30, refill_per_second=1 / 60, store=MemoryBucketStore())
+        monkeypatch.setattr(app_module, "quota", quota)
+        ip = "10.0.3.4"
+        # 40 doublons: une seule extraction
+        assert post_batch(client, ["Je veux 7 serveurs AWS et un bucket (lot)"] * 40, ip)[0].status_code == 200
+        assert quota.charged == 1
+        # Coût estimé (40 extractions) au-delà de la capacité: jamais admissible
+        distinct = [f"Je veux {n} serveurs GCP et une base mysql (lot)" for n in range(1, 41)]
+        response, _ = post_batch(client, distinct, ip)
+        assert response.status_code == 413
+        assert quota.charged == 1
+        # Lot admis si le solde (29) couvre son coût estimé, débité ensuite
+        assert post_batch(client, distinct[:25], ip)[0].status_code == 200
+        assert quota.charged == 26
+        response, _ = post_batch(client, distinct[25:30], ip)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        # Descriptions déjà extraites: admises sans débit, les nouvelles si le solde les couvre
+        assert post_batch(client, distinct[:20], ip)[0].status_code == 200
+        assert post_batch(client, distinct[20:29], ip)[0].status_code == 200
+        assert quota.charged == 30
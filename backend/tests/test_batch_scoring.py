@@ -0,0 +1,94 @@
+"""
+Tests unitaires pour l'évaluation vectorisée des politiques (lots de configurations)
+"""
+import itertools
+
+from modules.batch_scoring import encode_specs, score_batch
+from modules.security_rules import SECURITY_POLICIES, check_terraform_security, check_terraform_security_sections
+from modules.terraform_gen import generate_terraform
+
+KINDS = ["servers", "databases", "load_balancers", "networks", "security_groups"]
+
+
+def config_matrix() -> list:
+    """Toutes les configurations mono-provider: providers x types de base x présence de chaque ressource"""
+    return [
+        {"providers": [dict(provider=provider, database_type=database_type, **dict(zip(KINDS, counts)))]}
+        for provider in ["aws", "azure", "gcp", "openstack"]
+        for database_type in ["mysql", "postgresql", "mariadb", "mongodb"]
+        for counts in itertools.product([0, 2], [0, 1], [0, 3], [0, 1], [0, 2])
+    ]
+
+
+class TestBatchScoring:
+    """Tests pour la notation de lots sans génération de Terraform"""
+
+    def test_parity_with_text_scan_on_config_matrix(self):
+        """Test scores, grades et violations identiques à l'analyse du Terraform généré"""
+        specs = config_matrix()
+        result = score_batch(specs)
+        assert result["fallbacks"] == 0
+        for index, spec in enumerate(specs):
+            report = check_terraform_security(generate_terraform(spec))
+            assert result["security_score"][index] == report["security_score"]
+            assert result["security_grade"][index] == report["security_grade"]
+            failing = [p for p, failed in zip(result["policies"], result["violations"][index]) if failed]
+            assert failing == [violation["rule"] for violation in report["violations"]]
+
+    def test_parity_with_relaxed_policies(self, monkeypatch):
+        """Test parité sous 100: politiques assouplies sur place (base publique, non chiffrée, sans sauvegarde)"""
+        settings = {
+            "db_no_public_ip": {"aws": {"publicly_accessible": True}, "azure": {"public_network_access_enabled": True}},
+            "encryption_at_rest": {"aws": {"storage_encrypted": False, "encrypted": False}},
+            "backup_enabled": {"aws": {"backup_retention_period": 0}, "azure": {"backup_retention_days": 0}},
+        }
+        for policy_id, providers in settings.items():
+            for provider, values in providers.items():
+                monkeypatch.setitem(SECURITY_POLICIES[policy_id]["terraform_settings"], provider, values)
+
+        specs = config_matrix() + [
+            {"providers": [{"provider": "aws", "databases": 1}, {"provider": "azure", "servers": 2, "databases": 1}]},
+            {"providers": [{"provider": "aws", "databases": 2, "database_type": "oracle"}]},
+        ]
+        result = score_batch(specs)
+        assert result["fallbacks"] == 1
+        severities = set()
+        for index, spec in enumerate(specs):
+            report = check_terraform_security_sections(generate_terraform(spec))
+            assert result["security_score"][index] == report["security_score"]
+            assert result["security_grade"][index] == report["security_grade"]
+            failing = [p for p, failed in zip(result["policies"], result["violations"][index]) if failed]
+            assert failing == [violation["rule"] for violation in report["violations"]]
+            severities.update(violation["severity"] for violation in report["violations"])
+
+        assert severities == {"HIGH", "MEDIUM"}
+        # Base AWS publique (HIGH), non chiffrée (HIGH), sans sauvegarde (MEDIUM)
+        aws_mysql = specs.index({"providers": [dict(provider="aws", database_type="mysql", **dict(zip(KINDS, [2, 1, 3, 1, 2])))]})
+        assert result["security_score"][aws_mysql] == 50
+        assert result["security_grade"][aws_mysql] == "D"
+        assert result["security_score"][-2] == result["security_score"][-1] == 50
+
+    def test_multi_cloud_and_fallback(self):
+        """Test multi-cloud (union des sections) et valeurs hors enum analysées en texte"""
+        specs = [
+            {"providers": [{"provider": "aws", "databases": 1}, {"provider": "openstack", "servers": 2, "databases": 1}]},
+            {"providers": [{"provider": "gcp", "databases": 2, "database_type": "oracle"}]},
+            {"providers": []},
+        ]
+        result = score_batch(specs)
+        assert result["fallbacks"] == 1
+        for index, spec in enumerate(specs):
+            report = check_terraform_security_sections(generate_terraform(spec))
+            assert result["security_score"][index] == report["security_score"]
+            assert result["security_grade"][index] == report["security_grade"]
+
+    def test_encode_specs(self):
+        """Test encodage: une ligne par section, défauts du générateur, type de base ignoré sans base"""
+        features = encode_specs([
+            {"providers": [{"provider": "azure", "servers": 3}, {"provider": "gcp", "databases": 1}]},
+            {"providers": [{"provider": "azure", "servers": 3, "database_type": "mongodb"}]},
+        ])
+        assert features["config"].tolist() == [0, 0, 1]
+        assert features["counts"].tolist()[0] == [3, 0, 0, 1, 1]
+        assert features["code"][0] == features["code"][2]
+        assert (features["code"] >= 0).all()
@@ -0,0 +1,217 @@
+"""
+Tests unitaires pour l'historique des runs (tampon circulaire indexé)
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from modules.history import CompactRun, RunHistory, SQLiteRunHistory
+
+
+def make_run(index: int, provider: str = "aws", status: str = "OK") -> dict:
+    return {
+        "timestamp": f"2026-01-01T00:{index // 60:02d}:{index % 60:02d}",
+        "phrase": f"run {index}",
+        "infra": {"providers": [{"provider": provider, "servers": 1}]},
+        "security_status": status,
+        "terraform_status": "GENERATED" if status == "OK" else "BLOCKED",
+    }
+
+
+def phrases(page: dict) -> list:
+    return [run["phrase"] for run in page["runs"]]
+
+
+class TestRunHistory:
+    """Tests pour l'éviction, les filtres indexés et la pagination par curseur"""
+
+    def test_ring_buffer_evicts_oldest(self):
+        """Test capacité fixe: les plus anciens runs (et leurs entrées d'index) disparaissent"""
+        history = RunHistory(capacity=5)
+        for index in range(12):
+            history.add(make_run(index, provider="gcp" if index < 6 else "aws"))
+        assert len(history) == 5
+        assert phrases(history.query(limit=10)) == [f"run {index}" for index in range(7, 12)]
+        assert history.query(provider="gcp")["runs"] == []
+        assert history.counts("provider") == {"aws": 5}
+
+    def test_filters_and_cursor_pagination(self):
+        """Test filtres combinés et pages successives sans doublon ni trou"""
+        history = RunHistory(capacity=1000)
+        for index in range(300):
+            provider = ("aws", "azure", "gcp")[index % 3]
+            history.add(make_run(index, provider=provider, status="NOT_OK" if index % 5 == 0 else "OK"))
+        expected = [f"run {index}" for index in range(300) if index % 3 == 1 and index % 5 == 0]
+
+        collected = []
+        cursor = None
+        while True:
+            page = history.query(limit=7, cursor=cursor, provider="AZURE", security_status="NOT_OK")
+            collected = phrases(page) + collected
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert collected == expected
+        assert phrases(history.query(limit=2, terraform_status="BLOCKED")) == ["run 290", "run 295"]
+
+    def test_time_range(self):
+        """Test plage since (inclus) / until (exclu) par dichotomie sur les horodatages"""
+        history = RunHistory(capacity=100)
+        for index in range(150):
+            history.add(make_run(index))
+        page = history.query(limit=100, since="2026-01-01T00:01:00", until="2026-01-01T00:01:05")
+        assert phrases(page) == [f"run {index}" for index in range(60, 65)]
+        # Début de plage déjà évincé: borné au plus ancien run en mémoire
+        page = history.query(limit=100, until="2026-01-01T00:00:55", provider="aws")
+        assert phrases(page) == [f"run {index}" for index in range(50, 55)]
+
+    def test_time_range_out_of_order(self):
+        """Test horodatages non monotones (workers entrelacés, horloge reculée): aucun run perdu"""
+        history = RunHistory(capacity=8)
+        order = [0, 1, 2, 30, 3, 4, 31, 5, 6, 7, 8, 9, 10, 11]
+        for index in order:
+            history.add(make_run(index))
+        # En mémoire: 31, 5, ..., 11 (le recul 30 -> 3 est évincé, 31 -> 5 reste)
+        assert history._disorder == 1
+        page = history.query(limit=100, since="2026-01-01T00:00:05", until="2026-01-01T00:00:31")
+        assert phrases(page) == [f"run {index}" for index in range(5, 12)]
+        page = history.query(limit=100, since="2026-01-01T00:00:31")
+        assert phrases(page) == ["run 31"]
+        # Curseur et filtres combinés avec le filtre linéaire
+        page = history.query(limit=3, until="2026-01-01T00:00:10", provider="aws")
+        assert phrases(page) == ["run 7", "run 8", "run 9"]
+        assert phrases(history.query(limit=10, cursor=page["next_cursor"], until="2026-01-01T00:00:10")) == [
+            "run 5", "run 6"
+        ]
+
+        # Le recul sorti du tampon: retour à la dichotomie
+        for index in range(12, 20):
+            history.add(make_run(index))
+        assert history._disorder == 0
+        page = history.query(limit=100, since="2026-01-01T00:00:14", until="2026-01-01T00:00:16")
+        assert phrases(page) == ["run 14", "run 15"]
+
+    def test_compact_records(self):
+        """Test runs de log_run() gardés compacts, servis à l'identique; autres formes gardées telles quelles"""
+        section = {"provider": "aws", "servers": 3, "databases": 1, "database_type": "mysql",
+                   "networks": 1, "load_balancers": 0, "security_groups": 1}
+        run = {"timestamp": "2026-01-27T10:20:34.108474", "phrase": "Je veux 3 serveurs",
+               "infra": {"providers": [section]}, "security_status": "OK",
+               "terraform_status": "GENERATED", "security_score": 90}
+        first, second = CompactRun.from_run(run), CompactRun.from_run(dict(run, phrase="autre"))
+        assert first.expand() == run
+        # Configurations identiques: une seule copie des sections
+        assert first.sections is second.sections
+        assert CompactRun.from_run(dict(run, timestamp="2026-01-27T10:20:34+02:00")) is None
+        assert CompactRun.from_run(make_run(1)) is None
+
+        history = RunHistory(capacity=10)
+        history.add(make_run(1))
+        history.add(run)
+        page = history.query(limit=10, provider="aws")
+        assert page["runs"] == [make_run(1), run]
+        assert phrases(history.query(since="2026-01-27T10:20:34.108474")) == ["Je veux 3 serveurs"]
+
+    def test_unknown_filter(self):
+        """Test filtre non indexé refusé"""
+        with pytest.raises(ValueError):
+            RunHistory(capacity=10).query(phrase="run 1")
+
+    def test_concurrent_writers(self):
+        """Test ajouts concurrents: aucun run perdu, index cohérents"""
+        history = RunHistory(capacity=10000)
+
+        def writer(offset: int):
+            for index in range(1000):
+                history.add(make_run(offset + index, provider=("aws", "gcp")[offset // 1000 % 2]))
+
+        threads = [threading.Thread(target=writer, args=(offset * 1000,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(history) == 4000
+        assert history.counts("provider") == {"aws": 2000, "gcp": 2000}
+
+
+class TestSQLiteRunHistory:
+    """Tests pour l'historique SQLite partagé (écriture par lots, même contrat de requête)"""
+
+    def test_same_results_as_memory(self, tmp_path):
+        """Test filtres, plage de temps et pagination identiques au tampon en mémoire"""
+        store = SQLiteRunHistory(str(tmp_path / "history.db")).start()
+        memory = RunHistory(capacity=1000)
+        for index in range(200):
+            run = make_run(index, provider=("aws", "azure", "gcp")[index % 3],
+                           status="NOT_OK" if index % 4 == 0 else "OK")
+            assert store.add(run)
+            memory.add(run)
+        assert store.flush()
+        assert len(store) == 200
+        # Runs stockés en JSON compact (sans espaces entre les éléments)
+        with sqlite3.connect(str(tmp_path / "history.db")) as connection:
+            data = connection.execute("SELECT data FROM runs LIMIT 1").fetchone()[0]
+        assert json.loads(data) == make_run(0, provider="aws", status="NOT_OK") and ", " not in data
+
+        cases = ({}, {"provider": "GCP"}, {"security_status": "NOT_OK", "provider": "aws"},
+                 {"since": "2026-01-01T00:01:00", "until": "2026-01-01T00:02:30"})
+        for filters in cases:
+            expected, collected = [], []
+            for history, pages in ((memory, expected), (store, collected)):
+                page = {"next_cursor": None}
+                while True:
+                    page = history.query(limit=9, cursor=page["next_cursor"], **filters)
+                    pages[:0] = phrases(page)
+                    if page["next_cursor"] is None:
+                        break
+            assert collected == expected
+        store.close()
+
+    def test_time_bounds_normalized(self, tmp_path, monkeypatch):
+        """Test since / until avec fuseau, espace ou microsecondes: mêmes runs que le tampon en mémoire"""
+        monkeypatch.setenv("TZ", "UTC")
+        time.tzset()
+        store = SQLiteRunHistory(str(tmp_path / "history.db")).start()
+        memory = RunHistory(capacity=1000)
+        for index in range(180):
+            run = make_run(index)
+            if index % 2:
+                # Horodatages de log_run(): microsecondes écrites seulement si non nulles
+                run["timestamp"] += ".250000"
+            store.add(run)
+            memory.add(run)
+        assert store.flush()
+
+        cases = ({"since": "2026-01-01T02:01:00+02:00"}, {"until": "2026-01-01T00:00:30Z"},
+                 {"since": "2026-01-01 00:01:00.5", "until": "2026-01-01T01:02:00+01:00"},
+                 {"since": "2026-01-01T00:02", "until": "2025-12-31T23:03:00-01:00"})
+        try:
+            for filters in cases:
+                expected = phrases(memory.query(limit=200, **filters))
+                assert expected
+                assert phrases(store.query(limit=200, **filters)) == expected
+            assert phrases(store.query(limit=200, since="2026-01-01T02:01:00+02:00"))[0] == "run 60"
+        finally:
+            store.close()
+            monkeypatch.undo()
+            time.tzset()
+
+    def test_shared_and_durable(self, tmp_path):
+        """Test deux instances (deux workers) sur la même base, données conservées, rétention"""
+        path = str(tmp_path / "history.db")
+        first = SQLiteRunHistory(path, max_runs=100).start()
+        second = SQLiteRunHistory(path, max_runs=100).start()
+        for index in range(150):
+            (first if index % 2 else second).add(make_run(index))
+        assert first.flush() and second.flush()
+        first.close()
+        second.close()
+
+        reopened = SQLiteRunHistory(path)
+        assert 100 <= len(reopened) <= 150
+        assert reopened.query(limit=1)["runs"][0]["phrase"] in ("run 148", "run 149")
+        # Base non vide: l'import depuis le journal n'a pas lieu
+        assert reopened.seed([make_run(999)]) == 0
@@ -0,0 +1,214 @@
+"""
+Tests pour les clés d'idempotence (modules/idempotency.py, en-tête Idempotency-Key)
+"""
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+os.environ.setdefault("AI_MODE", "mock")
+
+import app as app_module
+from app import app
+from modules.idempotency import IdempotencyKeys, IdempotencyStore, SQLiteIdempotencyStore
+
+RESPONSE = {"status": 200, "headers": [["Content-Type", "application/json"]], "body": b'{"ok": true}\n'}
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Compte les runs journalisés (un par génération réellement faite)"""
+    logged = []
+    original = app_module.log_run
+
+    def log_run(phrase, *args, **kwargs):
+        logged.append(phrase)
+        original(phrase, *args, **kwargs)
+
+    monkeypatch.setattr(app_module, "log_run", log_run)
+    return logged
+
+
+def new_key() -> str:
+    # Clés uniques: la base SQLite est partagée par tous les tests de la session
+    return str(uuid.uuid4())
+
+
+class TestIdempotencyStores:
+    """Tests pour la conservation des réservations et des réponses"""
+
+    def test_memory_store_reserve_complete_expire(self):
+        now = [1000.0]
+        store = IdempotencyStore(ttl=60, pending_ttl=10, clock=lambda: now[0])
+        assert store.reserve("k", "f1") is None
+        assert store.reserve("k", "f1") == {"fingerprint": "f1", "response": None}
+        store.complete("k", RESPONSE)
+        assert store.get("k")["response"] == RESPONSE
+
+        now[0] += 61
+        assert store.get("k") is None
+        assert store.reserve("k", "f2") is None
+
+    def test_orphan_reservation_expires(self):
+        """Test réservation d'un worker arrêté en plein traitement reprise après pending_ttl"""
+        now = [1000.0]
+        store = IdempotencyStore(ttl=60, pending_ttl=10, clock=lambda: now[0])
+        store.reserve("k", "f")
+        now[0] += 11
+        assert store.reserve("k", "f") is None
+
+    def test_evicted_reservation_wakes_waiters(self):
+        """Test réservation évincée (max_entries): attente terminée et événement oublié"""
+        store = IdempotencyStore(max_entries=2)
+        store.reserve("k1", "f")
+        waited = {}
+        waiter = threading.Thread(target=lambda: waited.update(entry=store.wait("k1", timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        store.reserve("k2", "f")
+        store.reserve("k3", "f")
+        waiter.join(1)
+        assert not waiter.is_alive() and waited["entry"] is None
+        assert set(store._events) == {"k2", "k3"}
+
+    def test_sqlite_store_shared_between_workers(self, tmp_path):
+        """Test réservation et réponse visibles d'une autre instance (autre worker)"""
+        now = [1000.0]
+        path = str(tmp_path / "idempotency.db")
+        first = SQLiteIdempotencyStore(path, ttl=60, pending_ttl=10, clock=lambda: now[0])
+        second = SQLiteIdempotencyStore(path, ttl=60, pending_ttl=10, clock=lambda: now[0])
+
+        assert first.reserve("k", "f") is None
+        assert second.reserve("k", "f") == {"fingerprint": "f", "response": None}
+        first.complete("k", RESPONSE)
+        assert second.wait("k", 1)["response"] == RESPONSE
+
+        assert first.reserve("libre", "f") is None
+        first.release("libre")
+        assert second.get("libre") is None
+
+        now[0] += 61
+        assert second.get("k") is None
+        assert second.stats() == {"backend": "sqlite", "size": 1}
+
+
+class TestIdempotencyKeys:
+    """Tests pour la réservation, l'attente et le rejeu"""
+
+    def test_concurrent_copy_waits_for_response(self):
+        keys = IdempotencyKeys(IdempotencyStore(), wait_timeout=5)
+        assert keys.claim("k", "f") == ("execute", None)
+        outcome = {}
+        waiter = threading.Thread(target=lambda: outcome.update(result=keys.claim("k", "f")))
+        waiter.start()
+        time.sleep(0.05)
+        keys.complete("k", RESPONSE)
+        waiter.join(5)
+        assert outcome["result"] == ("replay", RESPONSE)
+        assert keys.stats()["waited"] == 1
+
+    def test_released_key_taken_over(self):
+        """Test copie en attente traitée si la première requête libère la clé"""
+        keys = IdempotencyKeys(IdempotencyStore(), wait_timeout=5)
+        keys.claim("k", "f")
+        threading.Timer(0.05, keys.release, ("k",)).start()
+        assert keys.claim("k", "f") == ("execute", None)
+
+    def test_mismatch_and_timeout(self):
+        keys = IdempotencyKeys(IdempotencyStore(), wait_timeout=0.05)
+        keys.claim("k", "f")
+        assert keys.claim("k", "autre corps") == ("mismatch", None)
+        assert keys.claim("k", "f") == ("in_progress", None)
+
+
+class TestIdempotencyAPI:
+    """Tests pour Idempotency-Key sur /generate et /jobs"""
+
+    def test_retry_replayed_without_new_run(self, client, runs):
+        """Test copie: même réponse, rejouée, un seul run journalisé"""
+        body = {"description": "Je veux 2 serveurs AWS et une base postgresql (idempotence)"}
+        headers = {"Idempotency-Key": new_key()}
+        first = client.post('/generate', json=body, headers=headers, environ_base={"REMOTE_ADDR": "10.0.5.1"})
+        second = client.post('/generate', json=body, headers=headers, environ_base={"REMOTE_ADDR": "10.0.5.1"})
+        assert first.status_code == second.status_code == 200
+        assert second.get_data() == first.get_data()
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert len(runs) == 1
+
+        # Même clé pour une autre requête, ou venant d'un autre client
+        other = client.post('/generate', json={"description": "Je veux un serveur GCP"}, headers=headers,
+                            environ_base={"REMOTE_ADDR": "10.0.5.1"})
+        assert other.status_code == 422
+        assert client.post('/generate', json=body, headers=headers,
+                           environ_base={"REMOTE_ADDR": "10.0.5.2"}).status_code == 200
+        assert len(runs) == 2
+
+    def test_concurrent_duplicates_computed_once(self, client, runs, monkeypatch):
+        """Test copies simultanées: une génération, les autres attendent sa réponse"""
+        extract = app_module.extract_infrastructure
+
+        def slow_extract(*args, **kwargs):
+            time.sleep(0.2)
+            return extract(*args, **kwargs)
+
+        monkeypatch.setattr(app_module, "extract_infrastructure", slow_extract)
+        body = {"description": "Je veux 3 serveurs Azure et une base mysql (idempotence)"}
+        headers = {"Idempotency-Key": new_key()}
+        responses = []
+
+        def post():
+            with app.test_client() as own:
+                responses.append(own.post('/generate', json=body, headers=headers,
+                                          environ_base={"REMOTE_ADDR": "10.0.5.3"}))
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert [response.status_code for response in responses] == [200] * 4
+        assert len({response.get_data() for response in responses}) == 1
+        assert sum("Idempotent-Replayed" in response.headers for response in responses) == 3
+        assert len(runs) == 1
+
+    def test_server_error_not_kept(self, client, monkeypatch):
+        """Test erreur serveur non conservée: la copie est traitée à nouveau"""
+        calls = []
+
+        def failing_extract(*args, **kwargs):
+            calls.append(args)
+            raise RuntimeError("panne")
+
+        monkeypatch.setattr(app_module, "extract_infrastructure", failing_extract)
+        headers = {"Idempotency-Key": new_key()}
+        for _ in range(2):
+            response = client.post('/generate', json={"description": "Je veux un serveur AWS (panne)"},
+                                   headers=headers, environ_base={"REMOTE_ADDR": "10.0.5.4"})
+            assert response.status_code == 500
+            assert "Idempotent-Replayed" not in response.headers
+        assert len(calls) == 2
+
+    def test_job_submission_replayed(self, client):
+        """Test copie de POST /jobs: même job, pas de second job en file"""
+        body = {"description": "Je veux un serveur AWS (job idempotent)"}
+        headers = {"Idempotency-Key": new_key()}
+        first = client.post('/jobs', json=body, headers=headers, environ_base={"REMOTE_ADDR": "10.0.5.5"})
+        second = client.post('/jobs', json=body, headers=headers, environ_base={"REMOTE_ADDR": "10.0.5.5"})
+        assert first.status_code == second.status_code == 202
+        assert second.get_json()["job_id"] == first.get_json()["job_id"]
+        assert second.headers["Location"] == first.headers["Location"]
+
+    def test_invalid_key(self, client):
+        response = client.post('/generate', json={"description": "Je veux un serveur AWS"},
+                               headers={"Idempotency-Key": "x" * 256}, environ_base={"REMOTE_ADDR": "10.0.5.6"})
+        assert response.status_code == 400
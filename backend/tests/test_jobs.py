@@ -0,0 +1,226 @@
+"""
+Tests pour les jobs de génération asynchrones (modules/jobs.py, /jobs)
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("AI_MODE", "mock")
+
+import app as app_module
+from app import app
+from modules.jobs import JobQueue, JobStore, SQLiteJobStore
+
+
+def wait_for(queue: JobQueue, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} non termine")
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+class TestJobQueue:
+    """Tests pour la file bornée et le pool"""
+
+    def test_job_result_and_timings(self):
+        """Test résultat, temps d'attente et de service d'un job"""
+        queue = JobQueue(lambda phrase: (200, {"echo": phrase}), JobStore(), workers=2).start()
+        try:
+            job = queue.submit("bonjour")
+            assert job["status"] == "queued"
+            done = wait_for(queue, job["job_id"])
+            assert done["status"] == "done"
+            assert done["result"] == {"echo": "bonjour"}
+            assert done["http_status"] == 200
+            assert done["wait_ms"] >= 0 and done["service_ms"] >= 0
+            assert done["created"] <= done["started"] <= done["finished"]
+        finally:
+            queue.close()
+
+        stats = queue.stats()
+        assert stats["completed"] == 1
+        assert stats["wait"]["count"] == stats["service"]["count"] == 1
+
+    def test_failed_jobs(self):
+        """Test erreur de /generate et exception du traitement"""
+        def handler(phrase):
+            if phrase == "boom":
+                raise RuntimeError("boom")
+            return 422, {"error": "Limite dépassée"}
+
+        queue = JobQueue(handler, JobStore(), workers=1).start()
+        try:
+            rejected = wait_for(queue, queue.submit("1000 serveurs")["job_id"])
+            crashed = wait_for(queue, queue.submit("boom")["job_id"])
+        finally:
+            queue.close()
+        assert rejected["status"] == "failed"
+        assert rejected["http_status"] == 422
+        assert rejected["error"] == {"error": "Limite dépassée"}
+        assert crashed["http_status"] == 500
+        assert queue.stats()["failed"] == 2
+
+    def test_store_error_keeps_worker(self):
+        """Test erreur du stockage à l'état running: job échoué, worker toujours actif"""
+        class FlakyStore(JobStore):
+            failures = 1
+
+            def save(self, job):
+                if job["status"] == "running" and self.failures:
+                    self.failures -= 1
+                    raise sqlite3.OperationalError("database is locked")
+                super().save(job)
+
+        queue = JobQueue(lambda phrase: (200, {"echo": phrase}), FlakyStore(), workers=1).start()
+        try:
+            crashed = wait_for(queue, queue.submit("panne")["job_id"])
+            done = wait_for(queue, queue.submit("bonjour")["job_id"])
+        finally:
+            queue.close()
+        assert crashed["status"] == "failed" and crashed["http_status"] == 500
+        assert done["result"] == {"echo": "bonjour"}
+        stats = queue.stats()
+        assert stats["running"] == 0
+        assert stats["failed"] == stats["completed"] == 1
+
+    def test_full_queue_rejects(self):
+        """Test refus au-delà de la file, Retry-After estimé"""
+        release = threading.Event()
+        queue = JobQueue(lambda phrase: (release.wait(5), (200, {}))[1], JobStore(), workers=1, queue_size=2)
+        queue.start()
+        try:
+            first = queue.submit("a")
+            # Le premier job occupe l'unique thread, les deux suivants remplissent la file
+            deadline = time.monotonic() + 5
+            while queue.get(first["job_id"])["status"] != "running" and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert queue.submit("b") is not None
+            assert queue.submit("c") is not None
+            assert queue.submit("d") is None
+
+            stats = queue.stats()
+            assert stats["depth"] == 2
+            assert stats["running"] == 1
+            assert stats["rejected"] == 1
+            assert queue.retry_after() >= 1
+        finally:
+            release.set()
+            queue.close()
+
+    def test_close_abandons_queued_jobs(self):
+        """Test jobs encore en file marqués échoués (503) à l'arrêt"""
+        release = threading.Event()
+        queue = JobQueue(lambda phrase: (release.wait(5), (200, {}))[1], JobStore(), workers=1).start()
+        running = queue.submit("a")
+        while queue.get(running["job_id"])["status"] != "running":
+            time.sleep(0.01)
+        queued = queue.submit("b")
+        threading.Timer(0.1, release.set).start()
+        queue.close()
+
+        assert queue.get(running["job_id"])["status"] == "done"
+        abandoned = queue.get(queued["job_id"])
+        assert abandoned["status"] == "failed"
+        assert abandoned["http_status"] == 503
+
+
+class TestJobStores:
+    """Tests pour la conservation des états"""
+
+    def test_memory_store_ttl_and_capacity(self):
+        now = [1000.0]
+        store = JobStore(ttl=60, max_jobs=2, clock=lambda: now[0])
+        for job_id in ("a", "b", "c"):
+            store.save({"job_id": job_id, "status": "queued"})
+        assert store.get("a") is None
+        assert store.get("c")["status"] == "queued"
+
+        now[0] += 61
+        assert store.get("c") is None
+
+    def test_sqlite_store_shared_between_workers(self, tmp_path):
+        """Test état visible d'une autre instance (autre worker), expiration"""
+        now = [1000.0]
+        path = str(tmp_path / "jobs.db")
+        accepting = SQLiteJobStore(path, ttl=60, clock=lambda: now[0])
+        polling = SQLiteJobStore(path, ttl=60, clock=lambda: now[0])
+
+        accepting.save({"job_id": "a", "status": "queued"})
+        assert polling.get("a") == {"job_id": "a", "status": "queued"}
+        accepting.save({"job_id": "a", "status": "done", "result": {"security": "OK"}})
+        assert polling.get("a")["result"] == {"security": "OK"}
+
+        now[0] += 61
+        assert polling.get("a") is None
+        accepting.save({"job_id": "b", "status": "queued"})
+        assert polling.stats()["size"] == 1
+
+
+class TestJobsAPI:
+    """Tests pour POST /jobs et GET /jobs/<id>"""
+
+    def test_job_matches_generate(self, client):
+        """Test 202 immédiat puis même corps que /generate"""
+        body = {"description": "Je veux 2 serveurs AWS avec une base postgresql"}
+        response = client.post('/jobs', json=body, environ_base={"REMOTE_ADDR": "10.0.2.1"})
+        assert response.status_code == 202
+        job = response.get_json()
+        assert response.headers["Location"] == job["status_url"] == f"/jobs/{job['job_id']}"
+
+        deadline = time.monotonic() + 10
+        while True:
+            data = client.get(job["status_url"]).get_json()
+            if data["status"] in ("done", "failed") or time.monotonic() > deadline:
+                break
+            time.sleep(0.02)
+        assert data["status"] == "done"
+
+        expected = client.post('/generate', json=body, environ_base={"REMOTE_ADDR": "10.0.2.2"}).get_json()
+        assert data["result"].keys() == expected.keys()
+        assert data["result"]["json"] == expected["json"]
+        assert data["result"]["terraform"] == expected["terraform"]
+
+    def test_invalid_jobs(self, client):
+        """Test 400 (description vide, grande échelle), 404 (job inconnu)"""
+        environ = {"REMOTE_ADDR": "10.0.2.3"}
+        assert client.post('/jobs', json={"description": ""}, environ_base=environ).status_code == 400
+        for body, error in (([], "JSON invalide"), ("texte", "JSON invalide"),
+                            ({"description": 42}, "Description invalide")):
+            response = client.post('/jobs', json=body, environ_base=environ)
+            assert response.status_code == 400
+            assert response.get_json() == client.post('/generate', json=body, environ_base=environ).get_json()
+            assert response.get_json()["error"] == error
+        response = client.post('/jobs', json={"description": "2500 serveurs", "large_scale": True},
+                               environ_base=environ)
+        assert response.status_code == 400
+        assert client.get('/jobs/inconnu').status_code == 404
+
+    def test_full_queue_503(self, client, monkeypatch):
+        """Test 503 avec Retry-After quand la file est pleine"""
+        release = threading.Event()
+        blocked = JobQueue(lambda phrase: (release.wait(5), (200, {}))[1], JobStore(), workers=1, queue_size=1)
+        monkeypatch.setattr(app_module, "job_queue", blocked)
+        environ = {"REMOTE_ADDR": "10.0.2.4"}
+        try:
+            # Pool non démarré: le premier job remplit la file
+            assert client.post('/jobs', json={"description": "a"}, environ_base=environ).status_code == 202
+            response = client.post('/jobs', json={"description": "b"}, environ_base=environ)
+            assert response.status_code == 503
+            assert int(response.headers["Retry-After"]) >= 1
+            assert response.get_json()["retry_after"] == int(response.headers["Retry-After"])
+            assert client.get('/api/metrics').get_json()["jobs"]["rejected"] == 1
+        finally:
+            release.set()
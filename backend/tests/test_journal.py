@@ -0,0 +1,96 @@
+"""
+Tests unitaires pour le journal des runs (JSONL en ajout seul)
+"""
+import gzip
+import json
+import multiprocessing
+import os
+
+from modules.journal import RunJournal
+
+
+def make_run(index: int) -> dict:
+    return {"timestamp": f"2026-01-01T00:00:{index:02d}", "phrase": f"run {index}", "security_status": "OK"}
+
+
+def write_runs(directory: str, offset: int, count: int):
+    """Processus écrivain: un lot par run pour entrelacer les écritures et les rotations"""
+    journal = RunJournal(directory, segment_bytes=300, compress=True, max_segments=0).start()
+    for index in range(offset, offset + count):
+        journal.append(make_run(index))
+        journal.flush()
+    journal.close()
+
+
+class TestRunJournal:
+    """Tests pour l'écriture en arrière-plan, la rotation et la relecture"""
+
+    def test_append_and_reload(self, tmp_path):
+        """Test enregistrements écrits par le thread dédié puis relus dans l'ordre"""
+        journal = RunJournal(str(tmp_path)).start()
+        for index in range(5):
+            assert journal.append(make_run(index))
+        assert journal.flush()
+        journal.close()
+        assert journal.stats()["written"] == 5
+        assert journal.fsyncs >= 1
+
+        reopened = RunJournal(str(tmp_path))
+        assert [run["phrase"] for run in reopened.load(3)] == ["run 2", "run 3", "run 4"]
+
+    def test_rotation_compression_and_retention(self, tmp_path):
+        """Test segments bornés en taille, compressés une fois fermés, les plus anciens supprimés"""
+        journal = RunJournal(str(tmp_path), segment_bytes=200, compress=True, max_segments=3).start()
+        for index in range(40):
+            journal.append(make_run(index))
+            journal.flush()
+        journal.close()
+
+        names = sorted(os.listdir(tmp_path))
+        assert len(names) == 3
+        assert all(name.endswith(".jsonl.gz") for name in names[:-1])
+        with gzip.open(tmp_path / names[0], "rt") as f:
+            assert json.loads(f.readline())["phrase"].startswith("run ")
+        # Relecture à travers segments compressés et segment courant
+        assert RunJournal(str(tmp_path)).load(2) == [make_run(38), make_run(39)]
+
+    def test_append_never_blocks(self, tmp_path):
+        """Test file pleine: l'enregistrement est abandonné et compté, la requête n'attend pas"""
+        journal = RunJournal(str(tmp_path), queue_size=2)
+        assert journal.append(make_run(0)) and journal.append(make_run(1))
+        assert not journal.append(make_run(2))
+        assert journal.stats()["dropped"] == 1
+
+    def test_truncated_line_and_legacy_history(self, tmp_path):
+        """Test ligne incomplète (arrêt brutal) ignorée; ancien history.json relu si journal vide"""
+        legacy = tmp_path / "history.json"
+        legacy.write_text(json.dumps([make_run(1), make_run(2)]))
+        journal_dir = tmp_path / "journal"
+        assert RunJournal(str(journal_dir)).load(10, legacy_file=str(legacy)) == [make_run(1), make_run(2)]
+
+        journal_dir.mkdir()
+        (journal_dir / "runs-000001.jsonl").write_text(json.dumps(make_run(3)) + "\n" + '{"phrase": "cou')
+        assert RunJournal(str(journal_dir)).load(10, legacy_file=str(legacy)) == [make_run(3)]
+
+    def test_two_processes_same_journal(self, tmp_path):
+        """Test deux processus sur le même dossier: aucun run perdu ni ligne mêlée, relecture complète"""
+        context = multiprocessing.get_context("fork")
+        writers = [context.Process(target=write_runs, args=(str(tmp_path), offset, 200)) for offset in (0, 1000)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(60)
+            assert writer.exitcode == 0
+
+        runs = RunJournal(str(tmp_path)).load(1000)
+        assert sorted(run["phrase"] for run in runs) == sorted(
+            f"run {index}" for index in list(range(200)) + list(range(1000, 1200))
+        )
+        # Chaque processus garde son ordre d'écriture
+        indexes = [int(run["phrase"].split()[1]) for run in runs]
+        for offset in (0, 1000):
+            own = [index for index in indexes if offset <= index < offset + 200]
+            assert own == sorted(own)
+        # Un seul segment ouvert, les autres compressés
+        names = sorted(os.listdir(tmp_path))
+        assert all(name.endswith(".jsonl.gz") for name in names[:-1])
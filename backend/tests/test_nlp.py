@@ -3,7 +3,7 @@ Tests unitaires pour le module NLP
 """
 import pytest
 import os
-from modules.nlp import extract_infrastructure, InfrastructureSchema, ProviderConfig, mock_extract_infrastructure
+from modules.nlp import extract_infrastructure, InfrastructureSchema, ProviderConfig, mock_extract_infrastructure, LargeScaleInfrastructureSchema, LARGE_SCALE_LIMITS
 
 class TestNLP:
     """Tests pour l'extraction d'infrastructure"""
@@ -94,4 +94,22 @@ class TestNLP:
             ]
         }
         with pytest.raises(Exception):  # Pydantic devrait lever une erreur
-            InfrastructureSchema(**data)
\ No newline at end of file
+            InfrastructureSchema(**data)
+    
+    def test_large_scale_schema_limits(self):
+        """Test limites grande échelle: au-delà de 50 serveurs, jusqu'à la limite configurée"""
+        data = {"providers": [{"provider": "aws", "servers": 2500, "networks": 1, "security_groups": 1}]}
+        with pytest.raises(Exception):
+            InfrastructureSchema(**data)
+        schema = LargeScaleInfrastructureSchema(**data)
+        assert schema.providers[0].servers == 2500
+        
+        data["providers"][0]["servers"] = LARGE_SCALE_LIMITS["servers"] + 1
+        with pytest.raises(Exception):
+            LargeScaleInfrastructureSchema(**data)
+    
+    def test_extract_large_scale_mock(self):
+        """Test extraction mock en mode grande échelle"""
+        os.environ["AI_MODE"] = "mock"
+        result = extract_infrastructure("Je veux 2500 serveurs AWS", large_scale=True)
+        assert result["providers"][0]["servers"] == 2500
@@ -0,0 +1,191 @@
+"""
+Tests pour le quota de génération (modules/rate_limit.py) et son coût par extraction
+"""
+import os
+import time
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+os.environ.setdefault("AI_MODE", "mock")
+
+import app as app_module
+from app import app, extraction_cost, QUOTA_COST_LOCAL, QUOTA_COST_MODEL_CALL, QUOTA_COST_PER_1K_TOKENS
+from modules.nlp import extract_infrastructure, is_extraction_cached
+from modules.rate_limit import MemoryBucketStore, SQLiteBucketStore, SQLiteLimitStorage, TokenBucketLimiter
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def small_quota(monkeypatch):
+    """Quota épuisé après trois extractions locales, quasiment pas de remplissage"""
+    quota = TokenBucketLimiter(capacity=3, refill_per_second=1 / 60, store=MemoryBucketStore())
+    monkeypatch.setattr(app_module, "quota", quota)
+    return quota
+
+
+class TestTokenBucket:
+    """Tests pour le seau à jetons"""
+
+    def test_debt_and_refill(self):
+        """Test admission tant que le solde est positif, dette, remplissage"""
+        now = [1000.0]
+        quota = TokenBucketLimiter(capacity=10, refill_per_second=2, store=MemoryBucketStore(),
+                                   clock=lambda: now[0])
+        assert quota.retry_after("a") == 0
+        assert quota.charge("a", 8) == 2
+        assert quota.retry_after("a") == 0
+        # Coût connu après coup: le solde devient négatif
+        assert quota.charge("a", 8) == -6
+        assert quota.retry_after("a") == 3
+        assert quota.retry_after("b") == 0
+
+        now[0] += 3.5
+        assert quota.retry_after("a") == 0
+        now[0] += 100
+        assert quota.store.balance("a", 10, 2, now[0]) == 10
+
+        stats = quota.stats()
+        assert stats["charges"] == 2 and stats["charged"] == 16
+        assert stats["rejected"] == 1
+
+    def test_admission_covers_estimated_cost(self):
+        """Test requête admise seulement si le solde couvre son coût estimé (borné à la capacité)"""
+        now = [1000.0]
+        quota = TokenBucketLimiter(capacity=10, refill_per_second=2, store=MemoryBucketStore(),
+                                   clock=lambda: now[0])
+        quota.charge("a", 5)
+        assert quota.retry_after("a", 5) == 0
+        assert quota.retry_after("a", 8) == 2
+        assert quota.retry_after("a") == 0
+        # Coût au-delà de la capacité: admis avec un seau plein
+        assert quota.retry_after("a", 50) == 3
+        now[0] += 3
+        assert quota.retry_after("a", 50) == 0
+        assert quota.stats()["rejected"] == 2
+
+    def test_free_requests_not_charged(self):
+        quota = TokenBucketLimiter(capacity=1, refill_per_second=0.01, store=MemoryBucketStore())
+        for _ in range(100):
+            quota.charge("a", 0)
+        assert quota.retry_after("a") == 0
+        assert quota.stats()["charges"] == 0
+
+    def test_sqlite_store_shared_between_workers(self, tmp_path):
+        """Test solde débité par une instance (un worker), vu par une autre"""
+        now = [1000.0]
+        path = str(tmp_path / "quota.db")
+        first = TokenBucketLimiter(5, 1, SQLiteBucketStore(path), clock=lambda: now[0])
+        second = TokenBucketLimiter(5, 1, SQLiteBucketStore(path), clock=lambda: now[0])
+
+        first.charge("10.0.0.1", 4)
+        assert second.charge("10.0.0.1", 4) == -3
+        assert first.retry_after("10.0.0.1") == 3
+        assert second.store.stats() == {"backend": "sqlite", "clients": 1}
+
+        now[0] += 10
+        first.store.prune(now[0] - 5)
+        assert second.store.stats()["clients"] == 0
+
+
+class TestLimitStorage:
+    """Tests pour le stockage SQLite des compteurs flask-limiter"""
+
+    def test_sqlite_limit_storage_shared_between_workers(self, tmp_path):
+        """Test compteurs flask-limiter (sqlite://) vus par deux instances, fenêtre expirée"""
+        uri = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+        first, second = storage_from_string(uri), storage_from_string(uri)
+        assert isinstance(first, SQLiteLimitStorage) and first.check()
+        limit = parse("3 per minute")
+        hits = [FixedWindowRateLimiter(storage).hit(limit, "10.0.0.1") for storage in (first, second, first, second)]
+        assert hits == [True, True, True, False]
+        assert FixedWindowRateLimiter(second).test(limit, "10.0.0.2")
+
+        assert first.incr("k", expiry=0.05) == 1
+        time.sleep(0.1)
+        assert second.get("k") == 0
+        assert second.incr("k", expiry=60) == 1
+        second.clear("k")
+        assert first.get("k") == 0
+        assert first.stats() == {"backend": "sqlite", "counters": 1}
+
+    def test_app_limiter_storage(self):
+        """Test compteurs de l'application dans la base SQLite partagée (RATELIMIT_STORAGE_URI)"""
+        assert isinstance(app_module.limiter.storage, SQLiteLimitStorage)
+
+
+class TestExtractionCost:
+    """Tests pour le coût d'une extraction"""
+
+    def test_cost_by_source(self):
+        assert extraction_cost({"source": "cache", "tokens": 0}) == 0
+        assert extraction_cost({}) == 0
+        assert extraction_cost({"source": "mock", "tokens": 0}) == QUOTA_COST_LOCAL
+        assert extraction_cost({"source": "gemini", "tokens": 2500}) == \
+            QUOTA_COST_MODEL_CALL + 2.5 * QUOTA_COST_PER_1K_TOKENS
+        assert extraction_cost({"source": "fallback", "tokens": 0}) == QUOTA_COST_MODEL_CALL
+
+    def test_extraction_usage_and_cache(self):
+        """Test travail rapporté par l'extraction, copie indépendante depuis le cache"""
+        description = "Je veux 4 serveurs AWS et une base postgresql (usage)"
+        usage = {}
+        first = extract_infrastructure(description, usage=usage)
+        assert usage["source"] == "mock"
+        assert is_extraction_cached("  Je veux 4 serveurs AWS et une base  postgresql (usage) ")
+        assert not is_extraction_cached(description, large_scale=True)
+
+        first["providers"].clear()
+        usage = {}
+        second = extract_infrastructure(description, usage=usage)
+        assert usage == {"source": "cache", "tokens": 0}
+        assert second["providers"]
+
+
+class TestQuotaAPI:
+    """Tests pour le quota sur /generate et /jobs (lots: test_batch.py)"""
+
+    def test_cache_hits_not_throttled(self, client, small_quota):
+        """Test quota épuisé par des extractions, descriptions en cache toujours servies"""
+        environ = {"REMOTE_ADDR": "10.0.4.1"}
+        descriptions = [f"Je veux {n} serveurs GCP avec une base mysql (quota)" for n in (1, 2, 3, 4)]
+        for description in descriptions[:3]:
+            assert client.post('/generate', json={"description": description},
+                               environ_base=environ).status_code == 200
+
+        response = client.post('/generate', json={"description": descriptions[3]}, environ_base=environ)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) == response.get_json()["retry_after"] >= 1
+
+        # Pas de limite en requêtes: bien plus de 10 succès du cache dans la minute
+        for _ in range(30):
+            response = client.post('/generate', json={"description": descriptions[0]}, environ_base=environ)
+            assert response.status_code == 200
+        assert small_quota.charged == 3
+
+        # Autre client: son propre seau
+        assert client.post('/generate', json={"description": descriptions[3]},
+                           environ_base={"REMOTE_ADDR": "10.0.4.2"}).status_code == 200
+        metrics = client.get('/api/metrics').get_json()
+        assert metrics["quota"]["rejected"] == 1
+        assert metrics["extraction_cache"]["hits"] >= 30
+
+    def test_jobs_charged_after_extraction(self, client, small_quota):
+        """Test job refusé quota épuisé, sauf description en cache"""
+        environ = {"REMOTE_ADDR": "10.0.4.3"}
+        small_quota.charge("10.0.4.3", 3)
+        response = client.post('/jobs', json={"description": "Je veux 2 serveurs Azure (quota jobs)"},
+                               environ_base=environ)
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+
+        cached = "Je veux 5 serveurs Azure (quota jobs)"
+        extract_infrastructure(cached)
+        assert client.post('/jobs', json={"description": cached}, environ_base=environ).status_code == 202
@@ -0,0 +1,68 @@
+"""
+Tests unitaires pour les agrégats des runs (/api/stats)
+"""
+import random
+
+from modules.run_stats import QuantileSketch, RunStats
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRunStats:
+    """Tests pour les compteurs, les quantiles approchés et les fenêtres de temps"""
+
+    def test_quantile_sketch_relative_error(self):
+        """Test quantiles à 1 % près, fusion équivalente à un résumé unique"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+        left, right, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for index, value in enumerate(values):
+            (left if index % 2 else right).add(value)
+            whole.add(value)
+        left.merge(right)
+
+        ordered = sorted(values)
+        for q in (0.5, 0.95, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            assert abs(whole.quantile(q) - exact) <= 0.011 * exact
+            assert left.quantile(q) == whole.quantile(q)
+        assert abs(whole.quantile(1.0) - max(values)) <= 0.011 * max(values)
+
+    def test_counters_and_means(self):
+        """Test mix de providers, taux de blocage, score moyen"""
+        stats = RunStats()
+        stats.record(["aws"], "OK", "GENERATED", 90, {"validation": 2.0})
+        stats.record(["aws", "gcp"], "OK", "GENERATED", 80, {"validation": 4.0})
+        stats.record(["azure"], "NOT_OK", "BLOCKED", 40)
+        snapshot = stats.snapshot()
+        assert snapshot["runs"] == 3
+        assert snapshot["providers"] == {"aws": 2, "gcp": 1, "azure": 1}
+        assert snapshot["block_rate"] == round(1 / 3, 4)
+        assert snapshot["security_score_mean"] == 70.0
+        assert snapshot["stages"]["validation"]["count"] == 2
+        assert snapshot["stages"]["validation"]["mean_ms"] == 3.0
+
+    def test_time_windows(self):
+        """Test fenêtre glissante: seules les tranches récentes sont fusionnées"""
+        clock = FakeClock()
+        stats = RunStats(bucket_seconds=60, buckets=10, clock=clock)
+        for minute in range(15):
+            for _ in range(minute + 1):
+                stats.record(["aws"], "OK", "GENERATED", 90, {"total": float(minute + 1)})
+            clock.now += 60
+        clock.now -= 60
+
+        assert stats.snapshot()["runs"] == sum(range(1, 16))
+        last = stats.snapshot(120)
+        assert last["runs"] == 14 + 15
+        assert last["window_seconds"] == 120
+        # Fenêtre bornée aux tranches conservées
+        assert stats.snapshot(3600)["runs"] == sum(range(6, 16))
+        timeline = stats.timeline(180)
+        assert [point["runs"] for point in timeline] == [13, 14, 15]
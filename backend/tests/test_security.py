@@ -2,8 +2,20 @@
 Tests unitaires pour le module Security
 """
 import pytest
-from modules.security import detect_dangerous_requests, validate_infrastructure
-from modules.security_rules import check_terraform_security
+from modules import security_rules
+from modules.compliance import compliance_table
+from modules.keywords import KeywordAutomaton
+from modules.metrics import LatencyHistogram, rule_metrics
+from modules.security import (
+    DANGEROUS_REQUEST_CATEGORIES, detect_dangerous_requests, validate_infrastructure, validate_infrastructure_stream,
+    verdict_cache,
+)
+from modules.security_rules import (
+    ANY_BLOCK, RULE_REGISTRY, SECURITY_POLICIES, block_cache, check_terraform_security,
+    check_terraform_security_incremental, check_terraform_security_sections, check_terraform_security_stream,
+    analyze_terraform, compile_rule_plan, parse_hcl_blocks, policy_fingerprint, shared_process_pool,
+)
+from modules.terraform_gen import generate_terraform, iter_terraform
 
 
 class TestSecurity:
@@ -29,7 +41,28 @@ class TestSecurity:
         """Test requête sécurisée"""
         warnings = detect_dangerous_requests("Je veux un serveur AWS privé")
         assert len(warnings) == 0
-    
+
+    def test_detect_multiple_categories(self):
+        """Test plusieurs catégories détectées en un passage, dans l'ordre des données"""
+        warnings = detect_dangerous_requests("DB publique unencrypted avec ssh 0.0.0.0")
+        assert [w["requested"] for w in warnings] == [
+            category["requested"] for category in DANGEROUS_REQUEST_CATEGORIES.values()
+        ]
+
+    @pytest.mark.parametrize("uses_automaton", [False, True])
+    def test_keyword_automaton(self, uses_automaton):
+        """Test automate et boucles `in`: occurrences chevauchantes identiques à `in`"""
+        automaton = KeywordAutomaton({"ssh": ["ssh public", "ssh"], "exposure": ["public", "publique"]})
+        assert automaton.uses_automaton is False
+        automaton.uses_automaton = uses_automaton
+        assert sorted(automaton.find_all("ssh public, db publique")) == [
+            (0, "ssh", "ssh"), (0, "ssh public", "ssh"), (4, "public", "exposure"), (15, "publique", "exposure")
+        ]
+        assert automaton.tags("ssh public") == {"ssh", "exposure"}
+        assert automaton.tags("base publique") == {"exposure"}
+        assert automaton.contains_any("db publique")
+        assert not automaton.contains_any("serveur prive")
+
     def test_check_terraform_security_aws(self):
         """Test vérification sécurité Terraform AWS"""
         terraform_code = """
@@ -59,3 +92,419 @@ class TestSecurity:
         """
         report = check_terraform_security(terraform_code, "azure")
         assert "security_score" in report
+    
+    def test_stream_check_matches_full_check(self):
+        """Test vérification en flux identique à la vérification du texte complet"""
+        for provider in ["aws", "azure", "gcp", "openstack"]:
+            for databases in [0, 1]:
+                infra = {
+                    "providers": [
+                        {"provider": provider, "servers": 2, "databases": databases, "database_type": "postgresql",
+                         "networks": 1, "load_balancers": 1, "security_groups": 1}
+                    ]
+                }
+                full = check_terraform_security_sections(generate_terraform(infra))
+                streamed = check_terraform_security_stream(iter_terraform(infra))
+                assert streamed == full
+
+        # Multi-cloud: mêmes sections en flux
+        infra = {"providers": [{"provider": p, "servers": 1, "databases": 1} for p in ["gcp", "aws", "openstack"]]}
+        assert check_terraform_security_stream(iter_terraform(infra)) == check_terraform_security_sections(generate_terraform(infra))
+    
+    def test_multi_cloud_sections(self):
+        """Test chaque section multi-cloud vérifiée avec les règles de son provider"""
+        infra = {
+            "providers": [
+                {"provider": provider, "servers": 2, "databases": 1, "database_type": "mysql",
+                 "networks": 1, "load_balancers": 1, "security_groups": 1}
+                for provider in ["aws", "azure", "gcp", "openstack"]
+            ]
+        }
+        terraform_code = generate_terraform(infra)
+        threads = check_terraform_security_sections(terraform_code, use_processes=False)
+        processes = check_terraform_security_sections(terraform_code, use_processes=True)
+        assert threads == processes
+        assert list(threads["by_provider"]) == ["aws", "azure", "gcp", "openstack"]
+        # Pas de violation croisée: les ressources d'une section relèvent de son provider
+        prefixes = {"aws": "aws_", "azure": "azurerm_", "gcp": "google_", "openstack": "openstack_"}
+        for provider, detail in threads["by_provider"].items():
+            for rule in detail["violations"]:
+                violation = next(v for v in threads["violations"] if v["rule"] == rule)
+                assert any(r.startswith(prefixes[provider]) for r in violation["resources"])
+        # Le verdict global expose le détail par provider
+        verdict = validate_infrastructure("infra multi-cloud", terraform_code)
+        assert set(verdict["by_provider"]) == set(prefixes)
+
+    def test_sections_pool(self, monkeypatch):
+        """Test pool de processus partagé (sans fork) et sections en série sur un seul CPU"""
+        infra = {"providers": [{"provider": p, "servers": 1, "databases": 1} for p in ["aws", "gcp"]]}
+        terraform_code = generate_terraform(infra)
+        pool = shared_process_pool()
+        assert pool is shared_process_pool()
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+        monkeypatch.setattr(security_rules.os, "cpu_count", lambda: 1)
+        monkeypatch.setattr(security_rules, "shared_process_pool", None)
+        monkeypatch.setattr(security_rules, "ThreadPoolExecutor", None)
+        assert set(check_terraform_security_sections(terraform_code)["by_provider"]) == {"aws", "gcp"}
+
+    def test_verdict_cache(self, monkeypatch):
+        """Test cache des verdicts: succès sur Terraform identique, invalidé si les politiques changent"""
+        terraform_code = generate_terraform({"providers": [{"provider": "gcp", "servers": 3, "databases": 1}]})
+        verdict_cache.clear()
+        first = validate_infrastructure("infra gcp", terraform_code)
+        hits = verdict_cache.hits
+        assert validate_infrastructure("infra gcp", terraform_code) == first
+        assert verdict_cache.hits == hits + 1
+        # La détection sur la description tourne toujours
+        assert validate_infrastructure("base de données publique", terraform_code)["status"] == "NOT_OK"
+
+        # Politique modifiée: nouvelle évaluation
+        monkeypatch.setitem(SECURITY_POLICIES, "monitoring_enabled",
+                            dict(SECURITY_POLICIES["monitoring_enabled"], severity="CRITICAL"))
+        misses = verdict_cache.misses
+        validate_infrastructure("infra gcp", terraform_code)
+        assert verdict_cache.misses == misses + 1
+
+        # Politique modifiée sur place (même dict): nouvelle évaluation aussi
+        monkeypatch.setitem(SECURITY_POLICIES["monitoring_enabled"], "severity", "LOW")
+        misses = verdict_cache.misses
+        report = validate_infrastructure("infra gcp", terraform_code)
+        assert verdict_cache.misses == misses + 1
+        assert validate_infrastructure("infra gcp", terraform_code) == report
+        assert verdict_cache.misses == misses + 1
+
+    def test_compliance_table_matches_full_scan(self):
+        """Test table de conformité: chaque clé précalculée = analyse complète"""
+        compliance_table.warm()
+        assert compliance_table.stats()["entries"] == 320
+        kinds = ["servers", "databases", "load_balancers", "networks", "security_groups"]
+        for (provider, database_type, present), entry in list(compliance_table._entries.items()):
+            assert entry is not None
+            config = {"provider": provider, "database_type": database_type or "mysql"}
+            config.update({kind: count if flag else 0 for kind, flag, count in zip(kinds, present, [3, 2, 4, 1, 2])})
+            infra = {"providers": [config]}
+            assert compliance_table.report(infra) == check_terraform_security_sections(generate_terraform(infra))
+
+        # Multi-cloud et adresses au-delà du plafond du rapport
+        infra = {"providers": [{"provider": p, "servers": 80, "databases": 60, "database_type": "postgresql",
+                                "load_balancers": 2} for p in ["openstack", "aws", "azure", "gcp"]]}
+        terraform_code = generate_terraform(infra)
+        assert compliance_table.report(infra) == check_terraform_security_sections(terraform_code)
+        assert validate_infrastructure("infra", terraform_code, infra=infra) == validate_infrastructure("infra", terraform_code)
+
+    def test_incremental_revalidation(self):
+        """Test cache par bloc: même rapport, seuls les blocs modifiés sont ré-évalués"""
+        infra = {"providers": [{"provider": "aws", "servers": 20, "databases": 2, "load_balancers": 1}]}
+        terraform_code = generate_terraform(infra)
+        assert check_terraform_security_incremental(terraform_code) == check_terraform_security(terraform_code)
+
+        edited = terraform_code.replace("monitoring = true", "monitoring = false", 1)
+        misses = block_cache.misses
+        report = check_terraform_security_incremental(edited)
+        assert block_cache.misses == misses + 1
+        assert report == check_terraform_security(edited)
+        monitoring = next(v for v in report["violations"] if v["rule"] == "monitoring_enabled")
+        assert monitoring["resources"] == ["aws_instance.server_1"]
+
+    def test_rule_plan_skips_irrelevant_rules(self):
+        """Test plan compilé: règles non applicables au provider ou au type de bloc ignorées"""
+        plan = compile_rule_plan("azure")
+        assert "encryption_at_rest" in plan.skipped
+        assert [policy_id for policy_id, _ in plan.rules_for("resource", "azurerm_virtual_network")] == [
+            "no_hardcoded_credentials"
+        ]
+        assert [policy_id for policy_id, _ in plan.rules_for("resource", "azurerm_mysql_server")] == [
+            "db_no_public_ip", "ssl_required", "monitoring_enabled", "backup_enabled", "no_hardcoded_credentials"
+        ]
+        # Règle ignorée par le plan: conforme d'office, comme avant
+        report = check_terraform_security('resource "azurerm_linux_virtual_machine" "vm" {\n}\n', "azure")
+        assert "encryption_at_rest" in report["passed_checks"]
+        assert compile_rule_plan("azure") is plan
+
+    def test_register_rule_plugin(self, monkeypatch):
+        """Test règle ajoutée par le registre: évaluée, et empreinte des politiques modifiée"""
+        fingerprint = policy_fingerprint()
+        monkeypatch.setitem(SECURITY_POLICIES, "no_default_vpc", {
+            "name": "Pas de VPC par defaut", "description": "VPC dedie", "severity": "MEDIUM", "category": "Network"
+        })
+        monkeypatch.setitem(RULE_REGISTRY, "no_default_vpc", {
+            "check": lambda block, provider: block.type != "aws_default_vpc",
+            "applies_to": {"aws": ("aws_default_vpc",)},
+            "cost": 1
+        })
+        assert policy_fingerprint() != fingerprint
+        report = check_terraform_security('resource "aws_default_vpc" "default" {\n}\n', "aws")
+        violation = next(v for v in report["violations"] if v["rule"] == "no_default_vpc")
+        assert violation["resources"] == ["aws_default_vpc.default"]
+        assert "no_default_vpc" in check_terraform_security('resource "aws_default_vpc" "d" {\n}\n', "gcp")["passed_checks"]
+
+    def test_fail_fast_same_verdict(self):
+        """Test fail-fast: arrêt dès que le score passe sous le seuil, verdict identique"""
+        terraform_code = """
+        provider "aws" {
+          region = "us-east-1"
+        }
+
+        resource "aws_db_instance" "db_1" {
+          publicly_accessible = true
+          password            = "secret123"
+        }
+        """
+        full = check_terraform_security(terraform_code)
+        fast = check_terraform_security(terraform_code, fail_fast=True)
+        assert full["security_score"] < 70 and fast["security_score"] < 70
+        assert fast["complete"] is False
+        # CRITICAL évaluée en premier, puis la première HIGH en violation décide
+        assert [v["rule"] for v in fast["violations"]] == ["db_no_public_ip", "no_hardcoded_credentials"]
+        assert set(fast["skipped_checks"]) == {"encryption_at_rest", "ssl_required", "monitoring_enabled", "backup_enabled"}
+        assert validate_infrastructure("infra", terraform_code, fail_fast=True)["complete"] is False
+
+        # Verdict non décidé avant la fin: rapport complet identique
+        infra = {"providers": [{"provider": "gcp", "servers": 2, "databases": 1}]}
+        terraform_code = generate_terraform(infra)
+        assert check_terraform_security_sections(terraform_code, fail_fast=True) == check_terraform_security_sections(terraform_code)
+
+    def test_verdict_cache_single_lookup_and_copies(self):
+        """Test une recherche par demande, rapport partiel remplacé par le complet, copies non partagées"""
+        terraform_code = """
+        provider "aws" {
+          region = "us-east-1"
+        }
+
+        resource "aws_db_instance" "db_1" {
+          publicly_accessible = true
+          password            = "secret123"
+        }
+        """
+        verdict_cache.clear()
+        hits, misses = verdict_cache.hits, verdict_cache.misses
+        assert validate_infrastructure("infra", terraform_code, fail_fast=True)["complete"] is False
+        assert validate_infrastructure("infra", terraform_code, fail_fast=True)["complete"] is False
+        assert (verdict_cache.hits, verdict_cache.misses) == (hits + 1, misses + 1)
+
+        # Rapport partiel refusé pour une demande complète: un seul échec, puis remplacé
+        full = validate_infrastructure("infra", terraform_code)
+        assert "complete" not in full
+        assert validate_infrastructure("infra", terraform_code, fail_fast=True) == full
+        assert (verdict_cache.hits, verdict_cache.misses) == (hits + 2, misses + 2)
+        assert len(verdict_cache) == 1
+
+        expected = [dict(violation, resources=list(violation["resources"])) for violation in full["violations"]]
+        full["violations"][0]["resources"].clear()
+        full["violations"].clear()
+        assert validate_infrastructure("infra", terraform_code)["violations"] == expected
+
+    def test_rule_metrics(self):
+        """Test latence par règle et provider: une observation par règle évaluée, détail en mode debug"""
+        rule_metrics.reset()
+        terraform_code = generate_terraform({"providers": [{"provider": "azure", "servers": 3, "databases": 1}]})
+        report = check_terraform_security(terraform_code, debug=True)
+        stats = rule_metrics.stats()
+        # encryption_at_rest ne s'applique pas à Azure: jamais évaluée
+        assert set(stats["rules"]) == set(report["rule_timings"]) == {
+            "db_no_public_ip", "ssl_required", "monitoring_enabled", "backup_enabled", "no_hardcoded_credentials"
+        }
+        monitoring = stats["rules"]["monitoring_enabled"]["azure"]
+        assert monitoring["count"] == 1
+        assert monitoring["blocks"] == report["rule_timings"]["monitoring_enabled"]["blocks"] == 4
+        assert stats["slowest"][0]["total_ms"] >= stats["slowest"][-1]["total_ms"]
+        # Sans debug, le rapport ne change pas
+        assert "rule_timings" not in check_terraform_security(terraform_code)
+
+        # Chemin incrémental: seuls les blocs ré-évalués sont mesurés
+        block_cache.clear()
+        check_terraform_security_incremental(terraform_code)
+        check_terraform_security_incremental(terraform_code)
+        assert rule_metrics.stats()["rules"]["monitoring_enabled"]["azure"]["count"] == 3
+
+    def test_latency_histogram(self):
+        """Test histogramme: quantiles à la borne du seau, maximum pour le dernier seau"""
+        histogram = LatencyHistogram()
+        for elapsed_ms in [0.02] * 90 + [3] * 9 + [5000]:
+            histogram.observe(elapsed_ms)
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 100
+        assert snapshot["p50_ms"] == 0.025
+        assert snapshot["p95_ms"] == 5
+        assert snapshot["p99_ms"] == 5
+        assert histogram.quantile(1.0) == 5000
+        assert snapshot["buckets_ms"] == {"0.025": 90, "5": 9, "+Inf": 1}
+
+    def test_stream_check_pattern_across_chunks(self):
+        """Test motif coupé entre deux morceaux du flux"""
+        chunks = ['resource "aws_instance" "s" {\n  root_block_device { encry', 'pted = true }\n  monitoring = true\n}\n']
+        report = check_terraform_security_stream(chunks, "aws")
+        assert "encryption_at_rest" in report["passed_checks"]
+    
+    def test_analysis_context(self):
+        """Test contexte d'analyse partagé: providers et index des ressources"""
+        terraform_code = """
+        provider "azurerm" {
+          features {}
+        }
+        
+        resource "azurerm_mysql_server" "db_1" {
+          public_network_access_enabled    = false
+          ssl_enforcement_enabled          = true
+          
+          tags = {
+            Environment = "production"
+          }
+        }
+        """
+        ctx = analyze_terraform(terraform_code)
+        assert ctx.provider == "azure"
+        assert ctx.resource_types == {"azurerm_mysql_server"}
+        db = ctx.resources["azurerm_mysql_server.db_1"]
+        # Espaces d'alignement normalisés, maps aplaties
+        assert db.values("public_network_access_enabled") == ["false"]
+        assert db.attributes["tags.environment"] == '"production"'
+        # Le même contexte sert à toutes les règles
+        report = check_terraform_security(ctx)
+        assert "db_no_public_ip" in report["passed_checks"]
+    
+    def test_violations_per_resource(self):
+        """Test une base conforme ne masque pas une base non conforme"""
+        terraform_code = """
+        provider "aws" {
+          region = "us-east-1"
+        }
+        
+        resource "aws_db_instance" "db_1" {
+          publicly_accessible     = false
+          storage_encrypted       = true
+          backup_retention_period = 7
+        }
+        
+        resource "aws_db_instance" "db_2" {
+          storage_encrypted = true
+          # Pas de sauvegarde: le mot "backup" ailleurs ne doit pas suffire
+        }
+        """
+        report = check_terraform_security(terraform_code)
+        violations = {v["rule"]: v["resources"] for v in report["violations"]}
+        assert violations["db_no_public_ip"] == ["aws_db_instance.db_2"]
+        assert violations["backup_enabled"] == ["aws_db_instance.db_2"]
+    
+    def test_parse_hcl_blocks(self):
+        """Test parseur HCL: heredoc, listes multi-lignes, commentaires, blocs sur une ligne"""
+        code = """
+        # commentaire { ignoré
+        resource "aws_instance" "web" {
+          user_data = <<-EOF
+            echo "} password = \"x\""
+          EOF
+          security_groups = [
+            "sg-1",
+            "sg-2",
+          ]
+          root_block_device { encrypted = true }
+          monitoring = true // commentaire
+        }
+        
+        variable "db_password" {
+          sensitive = true
+        }
+        """
+        blocks = parse_hcl_blocks(code.lower())
+        assert [b.address for b in blocks] == ["aws_instance.web", "var.db_password"]
+        web = blocks[0]
+        assert web.attributes["root_block_device.encrypted"] == "true"
+        assert web.values("monitoring") == ["true"]
+        assert web.values("password") == []
+        assert web.attributes["security_groups"].startswith("[")
+    
+    def test_hardcoded_credentials(self):
+        """Test détection de mot de passe en dur (valeur littérale uniquement)"""
+        report = check_terraform_security('resource "aws_db_instance" "db" {\n  password = "secret123"\n}\n', "aws")
+        assert any(v["rule"] == "no_hardcoded_credentials" for v in report["violations"])
+        report = check_terraform_security('resource "aws_db_instance" "db" {\n  password = var.db_password\n}\n', "aws")
+        assert "no_hardcoded_credentials" in report["passed_checks"]
+
+
+class TestGeneratorOutputCompliance:
+    """Régression: toute sortie du générateur passe les règles (verdict OK, aucune violation)"""
+
+    @staticmethod
+    def configs():
+        for provider in ("aws", "azure", "gcp", "openstack"):
+            for databases, database_type in ((0, "mysql"), (2, "mysql"), (2, "postgresql"),
+                                             (2, "mariadb"), (2, "mongodb")):
+                for load_balancers in (0, 1):
+                    yield [{"provider": provider, "servers": 2, "databases": databases,
+                            "database_type": database_type, "networks": 1,
+                            "load_balancers": load_balancers, "security_groups": 1}]
+        # Demande multi-cloud standard: 4 providers avec base de données
+        yield [{"provider": provider, "servers": 2, "databases": 1, "database_type": "postgresql",
+                "networks": 1, "load_balancers": 1, "security_groups": 1}
+               for provider in ("aws", "azure", "gcp", "openstack")]
+
+    def test_every_template_validates_ok(self):
+        for providers in self.configs():
+            infra = {"providers": providers}
+            terraform = generate_terraform(infra)
+            label = "+".join(f"{p['provider']}/{p['databases']}{p['database_type']}" for p in providers)
+            # Analyse du texte, table de conformité et mode flux
+            for verdict in (validate_infrastructure("Je veux une infrastructure", terraform),
+                            validate_infrastructure("Je veux une infrastructure", terraform, infra=infra),
+                            validate_infrastructure_stream("Je veux une infrastructure", iter_terraform(infra))):
+                assert verdict["status"] == "OK", (label, verdict)
+                assert verdict["score"] == 100, (label, verdict)
+
+    def test_generated_resources_use_provider_arguments(self):
+        """Test pas d'argument inventé pour satisfaire les règles; DocumentDB en cluster"""
+        openstack = generate_terraform({"providers": [{"provider": "openstack", "servers": 1, "databases": 1}]})
+        for argument in ("ssl_required", "logging_enabled", "backup_enabled"):
+            assert argument not in openstack
+        mongodb = generate_terraform({"providers": [{"provider": "aws", "servers": 1, "databases": 1,
+                                                     "database_type": "mongodb"}]})
+        assert 'resource "aws_docdb_cluster_parameter_group"' in mongodb
+        assert 'resource "aws_docdb_cluster"' in mongodb and "aws_db_instance" not in mongodb
+        assert 'family = "docdb5.0"' in mongodb and "aws_db_parameter_group" not in mongodb
+
+    def test_aws_tls_enforced_by_parameter_group(self):
+        """Test SSL/TLS AWS: valeur du paramètre du groupe vérifiée, pas le nom des ressources"""
+        def report(parameter: str, value: str, reference: str = "aws_db_parameter_group.db_tls.name"):
+            terraform = f"""
+provider "aws" {{
+  region = "us-east-1"
+}}
+
+resource "aws_db_parameter_group" "db_tls" {{
+  name   = "db-tls"
+  family = "postgres16"
+
+  parameter {{
+    name  = "{parameter}"
+    value = "{value}"
+  }}
+}}
+
+resource "aws_db_instance" "db_tls" {{
+  engine                  = "postgres"
+  storage_encrypted       = true
+  publicly_accessible     = false
+  parameter_group_name    = {reference}
+  backup_retention_period = 7
+  enabled_cloudwatch_logs_exports = ["postgresql"]
+  password                = var.db_password
+}}
+"""
+            violations = check_terraform_security(terraform, "aws")["violations"]
+            return next((v["resources"] for v in violations if v["rule"] == "ssl_required"), [])
+
+        assert report("rds.force_ssl", "1") == []
+        assert report("require_secure_transport", "ON") == []
+        assert report("rds.force_ssl", "0") == ["aws_db_parameter_group.db_tls"]
+        assert report("log_connections", "1") == ["aws_db_parameter_group.db_tls"]
+        # Groupe par défaut (non géré ici): TLS non imposé
+        assert report("rds.force_ssl", "1", '"default.postgres16"') == ["aws_db_instance.db_tls"]
+
+    def test_openstack_database_rules_not_applicable(self):
+        """Test OpenStack: SSL/TLS, journaux et sauvegardes non exprimables sur openstack_db_instance_v1"""
+        terraform = generate_terraform({"providers": [{"provider": "openstack", "servers": 1, "databases": 1}]})
+        plan = compile_rule_plan("openstack")
+        assert {"ssl_required", "backup_enabled"} <= set(plan.skipped)
+        report = check_terraform_security(terraform, "openstack")
+        assert report["violations"] == [] and report["security_score"] == 100
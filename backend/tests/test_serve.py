@@ -0,0 +1,115 @@
+"""
+Tests pour le serveur de production (serve.py, gunicorn prefork)
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from serve import main, post_fork, worker_exit
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post_generate(port: int, description: str) -> int:
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/generate",
+        data=json.dumps({"description": description}).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.status
+
+
+def start_server(tmp_path, *args, **environ) -> tuple:
+    port = free_port()
+    env = dict(os.environ, AI_MODE="mock", RATELIMIT_ENABLED="0",
+               HISTORY_DB=str(tmp_path / "history.db"), JOURNAL_DIR=str(tmp_path / "journal"))
+    env.update(environ)
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--bind", f"127.0.0.1:{port}", *args],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Serveur non demarre")
+
+
+def journal_lines(tmp_path) -> list:
+    lines = []
+    for path in sorted((tmp_path / "journal").glob("runs-*.jsonl")):
+        lines += path.read_text(encoding="utf-8").splitlines()
+    return lines
+
+
+class TestServerOptions:
+    """Tests pour la configuration gunicorn"""
+
+    def test_threads_select_worker_class(self, monkeypatch):
+        """Test workers gthread si plusieurs threads, sync sinon"""
+        captured = {}
+        monkeypatch.setattr("serve.ProductionServer.run", lambda self: captured.update(self.options))
+
+        main(["--workers", "3", "--threads", "8", "--max-requests", "500"])
+        assert captured["workers"] == 3
+        assert captured["worker_class"] == "gthread"
+        assert captured["max_requests"] == 500
+        assert captured["preload_app"] is True
+        assert captured["post_fork"] is post_fork and captured["worker_exit"] is worker_exit
+
+        main(["--threads", "1", "--no-preload"])
+        assert captured["worker_class"] == "sync"
+        assert captured["preload_app"] is False
+
+
+class TestPreforkServer:
+    """Tests d'intégration: workers forkés depuis un maître préchargé"""
+
+    def test_recycled_and_stopped_workers_flush_runs(self, tmp_path):
+        """Test runs écrits au recyclage d'un worker et à l'arrêt (SIGTERM)"""
+        process, port = start_server(tmp_path, "--workers", "1", "--threads", "2",
+                                     "--max-requests", "2", "--max-requests-jitter", "0")
+        try:
+            # 2 requêtes: le worker est recyclé, le suivant sert la 3e
+            for index in range(3):
+                for _ in range(50):
+                    try:
+                        assert post_generate(port, f"Je veux {index + 1} serveurs AWS") == 200
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+
+        runs = [json.loads(line) for line in journal_lines(tmp_path)]
+        assert [run["infra"]["providers"][0]["servers"] for run in runs] == [1, 2, 3]
+
+    def test_memory_history_workers(self, tmp_path):
+        """Test historique en mémoire (HISTORY_DB vide): workers démarrés, runs servis puis écrits à l'arrêt"""
+        process, port = start_server(tmp_path, "--workers", "1", "--threads", "2", HISTORY_DB="")
+        try:
+            assert post_generate(port, "Je veux 2 serveurs AWS") == 200
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/history", timeout=10) as response:
+                history = json.loads(response.read())
+            assert history["total"] == 1
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=30) == 0
+
+        assert len(journal_lines(tmp_path)) == 1
@@ -2,7 +2,10 @@
 Tests unitaires pour le module Terraform Generation
 """
 import pytest
-from modules.terraform_gen import generate_terraform
+import io
+import json
+import zipfile
+from modules.terraform_gen import generate_terraform, generate_terraform_sections, generate_terraform_archive, iter_terraform
 
 class TestTerraformGen:
     """Tests pour la génération Terraform"""
@@ -101,4 +104,46 @@ class TestTerraformGen:
         }
         code = generate_terraform(infra)
         assert "provider \"azurerm\"" in code
-        assert "azurerm_linux_virtual_machine" in code
\ No newline at end of file
+        assert "azurerm_linux_virtual_machine" in code
+    
+    def test_generate_sections_multi_provider(self):
+        """Test génération parallèle: une section par provider, ordre conservé"""
+        infra = {
+            "providers": [
+                {"provider": p, "servers": 2, "databases": 1, "networks": 1, "load_balancers": 0, "security_groups": 1}
+                for p in ["aws", "azure", "gcp", "openstack"]
+            ]
+        }
+        sections = generate_terraform_sections(infra)
+        assert [name for name, _ in sections] == ["01_aws", "02_azure", "03_gcp", "04_openstack"]
+        assert "provider \"aws\"" in sections[0][1]
+        assert "provider \"azurerm\"" in sections[1][1]
+        # Chaque section est identique à la génération mono-provider
+        for (_, code), provider_config in zip(sections, infra["providers"]):
+            assert code == generate_terraform({"providers": [provider_config]})
+    
+    def test_generate_archive(self):
+        """Test archive zip: manifest + un main.tf par provider"""
+        infra = {
+            "providers": [
+                {"provider": "aws", "servers": 1, "databases": 0, "networks": 1, "load_balancers": 0, "security_groups": 1},
+                {"provider": "gcp", "servers": 1, "databases": 0, "networks": 1, "load_balancers": 0, "security_groups": 1}
+            ]
+        }
+        archive = zipfile.ZipFile(io.BytesIO(generate_terraform_archive(infra)))
+        assert sorted(archive.namelist()) == ["01_aws/main.tf", "02_gcp/main.tf", "manifest.json"]
+        manifest = json.loads(archive.read("manifest.json"))
+        assert [s["provider"] for s in manifest["sections"]] == ["aws", "gcp"]
+        assert "google_compute_instance" in archive.read("02_gcp/main.tf").decode()
+    
+    def test_iter_terraform_matches_generate(self):
+        """Test génération en flux identique à la génération complète"""
+        infra = {
+            "providers": [
+                {"provider": p, "servers": 3, "databases": 2, "networks": 1, "load_balancers": 1, "security_groups": 1}
+                for p in ["aws", "gcp"]
+            ]
+        }
+        chunks = list(iter_terraform(infra))
+        assert len(chunks) > 10
+        assert "".join(chunks) == generate_terraform(infra)